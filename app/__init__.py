@@ -1,20 +1,28 @@
 """
 This module provides the app factory method.
 It adds all the blueprints to the app.
-This module also provides a reference to the database object, users, and the start time.
+This module also provides a reference to the database object and the start time.
+The database object's sessions may read from replicas (see 'replicas').
+
+Creating the app does not touch the database's tables.
+Startup ('start_app') checks the schema and warms the user cache.
+By default, it runs as part of 'create_app'.
+With "lazy_startup", it runs on the first request instead, so CLI commands (like "flask upgrade-db")
+can work on a database that the app could not start with yet.
 """
 
 # --------------------------------------------------------------------------------
 # Imports
 # --------------------------------------------------------------------------------
 
+import threading
 import time
 
+from .replicas import RoutingSession
 from config import config
 
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash
 
 
 # --------------------------------------------------------------------------------
@@ -23,21 +31,53 @@ from werkzeug.security import generate_password_hash
 
 START_TIME = time.time()
 
-db = SQLAlchemy()
-users = dict()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+startup_lock = threading.Lock()
 
 
 # --------------------------------------------------------------------------------
 # App Factory
 # --------------------------------------------------------------------------------
 
-def create_app(config_name):
+def start_app(app):
+  """Checks the schema and warms the user cache, once per app."""
+
+  # Checked before taking the lock, so started apps pay nothing per request
+  if app.extensions.get('registry_started'):
+    return
+
+  from .database import ensure_schema
+  from .users import warm_user_cache
+  with startup_lock, app.app_context():
+    if not app.extensions.get('registry_started'):
+      ensure_schema(app, db)
+      warm_user_cache()
+      app.extensions['registry_started'] = True
+
+
+def create_app(config_name, lazy_startup=False):
   app = Flask(__name__)
   app.config.from_object(config[config_name])
 
+  from .json import get_json_provider_class
+  app.json = get_json_provider_class(app.config['JSON_PROVIDER'])(app)
+
+  # Models must be imported before 'create_all' so their tables are known
+  from . import models
+
   db.init_app(app)
   with app.app_context():
-    db.create_all()
+    from .database import configure_engine
+    for engine in db.engines.values():
+      configure_engine(app, engine)
+
+    # The change feed, search, and stats add schema extensions, so they are set up before the schema is checked
+    from . import changes
+    from .search import init_search
+    from .stats import init_stats
+    init_search(app, db.engine)
+    init_stats(app, db.engine)
 
   from .errors import errors as error_blueprint
   app.register_blueprint(error_blueprint)
@@ -51,12 +91,51 @@ def create_app(config_name):
   from .devices import devices as devices_blueprint
   app.register_blueprint(devices_blueprint)
 
-  username1 = app.config['AUTH_USERNAME1']
-  password1 = generate_password_hash(app.config['AUTH_PASSWORD1'])
-  users[username1] = password1
+  if app.config['METRICS_ENABLED']:
+    from .metrics import init_metrics
+    with app.app_context():
+      init_metrics(app, db.engines.values())
+
+  from .cache import get_list_cache_backend
+  from .devices import list_cache
+  list_cache.configure(get_list_cache_backend(app.config))
+
+  from .replicas import init_replicas
+  init_replicas(app)
+
+  from .bulk import bulk as bulk_blueprint
+  app.register_blueprint(bulk_blueprint)
+
+  from .export import export as export_blueprint
+  app.register_blueprint(export_blueprint)
+
+  from .search import search as search_blueprint
+  app.register_blueprint(search_blueprint)
+
+  from .stats import stats as stats_blueprint
+  app.register_blueprint(stats_blueprint)
+
+  from .changes import changes as changes_blueprint
+  app.register_blueprint(changes_blueprint)
+
+  from .events import event_hub, events as events_blueprint, get_event_backend
+  app.register_blueprint(events_blueprint)
+  event_hub.configure(get_event_backend(app.config))
+
+  from .compression import init_compression
+  init_compression(app, list_cache)
+
+  from .auth import credential_cache, token_cache
+  credential_cache.configure(app.config['AUTH_CACHE_SIZE'], app.config['AUTH_CACHE_TTL'])
+  token_cache.configure(app.config['AUTH_TOKEN_CACHE_SIZE'], app.config['AUTH_TOKEN_EXPIRATION'])
+
+  # Config users are hashed and stored on their first login, not here
+  from .users import user_cache
+  user_cache.configure(app.config['AUTH_USER_CACHE_SIZE'], app.config['AUTH_USER_CACHE_TTL'])
 
-  username2 = app.config['AUTH_USERNAME2']
-  password2 = generate_password_hash(app.config['AUTH_PASSWORD2'])
-  users[username2] = password2
+  if lazy_startup:
+    app.before_request(lambda: start_app(app))
+  else:
+    start_app(app)
 
   return app
@@ -6,21 +6,30 @@ Authentication may be handled two ways:
 1. Basic HTTP authentication (username/password)
 2. Token authentication (Bearer)
 
-The username and password come from 'users', which gets values from the config.
-In a *real* app, the database should store users and passwords.
+Usernames and password hashes come from the user store (see 'users'), which is backed by the database.
 
 Call the "/authenticate/" resource to get an authentication token.
-Tokens expire after 1 hour (unless otherwise configured).
+Tokens expire after 1 hour (unless otherwise configured by AUTH_TOKEN_EXPIRATION).
+Decoded tokens are cached until they expire, so repeat requests skip signature checks.
+
+Password hashes are slow to check by design.
+Successful Basic auth verifications are cached for a short time (AUTH_CACHE_TTL),
+keyed by username and a keyed digest of the password (never the password itself).
+Cached entries are only valid while the user's stored password hash is unchanged.
 """
 
 # --------------------------------------------------------------------------------
 # Imports
 # --------------------------------------------------------------------------------
 
+import hmac
 import jwt
+import time
 
-from . import users
+from .cache import TTLCache, register_cache
 from .errors import unauthorized
+from .metrics import auth_latency, timed
+from .users import get_password_hash, rehash_if_needed
 
 from flask import Blueprint, current_app, jsonify
 from flask_httpauth import HTTPBasicAuth, HTTPTokenAuth, MultiAuth
@@ -44,24 +53,64 @@ token_auth = HTTPTokenAuth()
 multi_auth = MultiAuth(basic_auth, token_auth)
 
 
+# --------------------------------------------------------------------------------
+# Caches
+# --------------------------------------------------------------------------------
+
+credential_cache = register_cache('credentials', TTLCache())
+token_cache = register_cache('tokens', TTLCache())
+
+
 # --------------------------------------------------------------------------------
 # Authentication Token Functions
 # --------------------------------------------------------------------------------
 
 def serialize_token(username):
   secret_key = current_app.config['SECRET_KEY']
-  token = jwt.encode({"username": username}, secret_key, algorithm="HS256")
+  expiration = int(time.time()) + current_app.config['AUTH_TOKEN_EXPIRATION']
+  token = jwt.encode({"username": username, "exp": expiration}, secret_key, algorithm="HS256")
   return token
 
 
 def deserialize_token(token):
+  if username := token_cache.get(token):
+    return username
+
   try:
     secret_key = current_app.config['SECRET_KEY']
-    data = jwt.decode(token, secret_key, algorithms=["HS256"])
-  except:
+    data = jwt.decode(token, secret_key, algorithms=["HS256"], options={"require": ["exp"]})
+  except jwt.InvalidTokenError:
     return None
-  if 'username' in data:
-    return data['username']
+  
+  if username := data.get('username'):
+    # The entry must not outlive the token itself
+    token_cache.set(token, username, ttl=data['exp'] - time.time())
+    return username
+
+
+# --------------------------------------------------------------------------------
+# Credential Cache Functions
+# --------------------------------------------------------------------------------
+
+def digest_password(password):
+  secret_key = current_app.config['SECRET_KEY']
+  return hmac.new(secret_key.encode(), password.encode(), 'sha256').digest()
+
+
+def check_cached_password(username, password_hash, password):
+  key = (username, digest_password(password))
+
+  # The cached value is the hash that was checked, so a changed password misses
+  if (cached_hash := credential_cache.get(key)) == password_hash:
+    return True
+  elif cached_hash is not None:
+    credential_cache.pop(key)
+  
+  if check_password_hash(password_hash, password):
+    credential_cache.set(key, password_hash)
+    return True
+  
+  return False
 
 
 # --------------------------------------------------------------------------------
@@ -69,13 +118,16 @@ def deserialize_token(token):
 # --------------------------------------------------------------------------------
 
 @basic_auth.verify_password
+@timed(auth_latency, 'basic')
 def verify_password(username, password):
-  if username in users:
-      if check_password_hash(users.get(username), password):
-          return username
+  if password_hash := get_password_hash(username):
+    if check_cached_password(username, password_hash, password):
+      rehash_if_needed(username, password_hash, password)
+      return username
 
 
 @token_auth.verify_token
+@timed(auth_latency, 'token')
 def verify_token(token):
   if username := deserialize_token(token):
     return username
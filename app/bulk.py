@@ -0,0 +1,232 @@
+"""
+This module provides a blueprint for bulk device resources.
+Each resource takes a list of items and returns one result per item, in the same order.
+One bad item does not fail the whole request; its result holds the error instead.
+
+Request bodies may be JSON lists or NDJSON (one JSON value per line).
+For NDJSON, set the "Content-Type" header to "application/x-ndjson".
+Items are written in chunks (BULK_CHUNK_SIZE), with one transaction per chunk.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+from . import db
+from .auth import multi_auth
+from .devices import commit_device_changes, get_json_from_request
+from .errors import NotFoundError, UserUnauthorizedError, ValidationError
+from .models import Device
+
+from flask import Blueprint, current_app, jsonify, request
+
+
+# --------------------------------------------------------------------------------
+# Blueprint
+# --------------------------------------------------------------------------------
+
+bulk = Blueprint('bulk', __name__)
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def get_items_from_request(request):
+  if request.mimetype == 'application/x-ndjson':
+    try:
+      lines = request.get_data(as_text=True).splitlines()
+      items = [current_app.json.loads(line) for line in lines if line.strip()]
+    except ValueError:
+      raise ValidationError('request body is not valid NDJSON')
+  else:
+    items = get_json_from_request(request)
+
+  if not items:
+    raise ValidationError('request body is missing all items')
+  elif not isinstance(items, list):
+    raise ValidationError('request body must be a list of items')
+
+  max_items = current_app.config['BULK_MAX_ITEMS']
+  if len(items) > max_items:
+    raise ValidationError(f'request body has more than {max_items} items')
+
+  return items
+
+
+def get_item_id(item):
+  id = item.get('id') if isinstance(item, dict) else item
+  if not isinstance(id, int) or isinstance(id, bool):
+    raise ValidationError('item is missing an integer id')
+  return id
+
+
+def chunk(items):
+  size = current_app.config['BULK_CHUNK_SIZE']
+  for i in range(0, len(items), size):
+    yield items[i:i + size]
+
+
+def success_result(id, device=None):
+  result = {'id': id, 'status': 200}
+  if device:
+    result['device'] = device.to_json()
+  return result
+
+
+def error_result(e, id=None):
+  if isinstance(e, NotFoundError):
+    result = {'status': 404, 'error': 'not found'}
+  elif isinstance(e, UserUnauthorizedError):
+    result = {'status': 403, 'error': 'forbidden', 'message': str(e)}
+  else:
+    result = {'status': 400, 'error': 'bad request', 'message': str(e)}
+
+  if id is not None:
+    result['id'] = id
+  return result
+
+
+def find_missing_error(ids):
+  # Devices that exist but were not found for the owner belong to someone else
+  existing = {id for id, in db.session.query(Device.id).filter(Device.id.in_(ids))}
+  return {id: UserUnauthorizedError() if id in existing else NotFoundError() for id in ids}
+
+
+def query_owned_devices(ids, username):
+  query = Device.query.filter(Device.id.in_(ids), Device.owner == username)
+  return {device.id: device for device in query}
+
+
+# --------------------------------------------------------------------------------
+# Resources
+# --------------------------------------------------------------------------------
+
+@bulk.route('/devices/bulk', methods=['POST'])
+@multi_auth.login_required
+def devices_bulk_post():
+  """
+  Adds a list of new devices owned by the user.
+  Requires authentication.
+  """
+
+  username = multi_auth.current_user()
+  items = get_items_from_request(request)
+  results = [None] * len(items)
+
+  for indexed_items in chunk(list(enumerate(items))):
+    created = list()
+
+    for i, item in indexed_items:
+      try:
+        if not isinstance(item, dict):
+          raise ValidationError('item must be an object')
+        created.append((i, Device.from_json(item, username)))
+      except ValidationError as e:
+        results[i] = error_result(e)
+
+    # Serialize after the flush assigns IDs but before the commit expires every object
+    db.session.add_all([device for _, device in created])
+    db.session.flush()
+
+    for i, device in created:
+      results[i] = success_result(device.id, device)
+
+    # A chunk without writes leaves the owner's revision (and cached lists) alone
+    if created:
+      commit_device_changes(username, created=[device.id for _, device in created])
+
+  return jsonify({'results': results})
+
+
+@bulk.route('/devices/bulk', methods=['PATCH'])
+@multi_auth.login_required
+def devices_bulk_patch():
+  """
+  Patches a list of devices owned by the user.
+  Each item needs an "id" plus the fields to patch.
+  Requires authentication.
+  """
+
+  username = multi_auth.current_user()
+  items = get_items_from_request(request)
+  results = [None] * len(items)
+
+  for indexed_items in chunk(list(enumerate(items))):
+    ids = dict()
+
+    for i, item in indexed_items:
+      try:
+        if not isinstance(item, dict):
+          raise ValidationError('item must be an object')
+        ids[i] = get_item_id(item)
+      except ValidationError as e:
+        results[i] = error_result(e)
+
+    owned = query_owned_devices(list(ids.values()), username)
+    missing = find_missing_error([id for id in ids.values() if id not in owned])
+    patched = list()
+
+    for i, id in ids.items():
+      try:
+        if id in missing:
+          raise missing[id]
+        data = {key: value for key, value in items[i].items() if key != 'id'}
+        owned[id].patch_from_json(data)
+        patched.append((i, id))
+      except (NotFoundError, UserUnauthorizedError, ValidationError) as e:
+        results[i] = error_result(e, id)
+
+    # Serialize after the flush but before the commit expires every object
+    db.session.flush()
+
+    for i, id in patched:
+      results[i] = success_result(id, owned[id])
+
+    if patched:
+      commit_device_changes(username, changed=[id for _, id in patched])
+
+  return jsonify({'results': results})
+
+
+@bulk.route('/devices/bulk', methods=['DELETE'])
+@multi_auth.login_required
+def devices_bulk_delete():
+  """
+  Deletes a list of devices owned by the user.
+  Each item may be a device ID or an object with an "id".
+  Requires authentication.
+  """
+
+  username = multi_auth.current_user()
+  items = get_items_from_request(request)
+  results = [None] * len(items)
+
+  for indexed_items in chunk(list(enumerate(items))):
+    ids = dict()
+
+    for i, item in indexed_items:
+      try:
+        ids[i] = get_item_id(item)
+      except ValidationError as e:
+        results[i] = error_result(e)
+
+    owned = {id for id, in db.session.query(Device.id).filter(
+      Device.id.in_(list(ids.values())), Device.owner == username)}
+    missing = find_missing_error([id for id in ids.values() if id not in owned])
+
+    if owned:
+      Device.query.filter(Device.id.in_(list(owned)), Device.owner == username) \
+        .delete(synchronize_session=False)
+      commit_device_changes(username, deleted=list(owned))
+
+    # A repeated ID is deleted once, and later repeats are reported as not found
+    deleted = set()
+    for i, id in ids.items():
+      if id in owned and id not in deleted:
+        deleted.add(id)
+        results[i] = success_result(id)
+      else:
+        results[i] = error_result(missing.get(id, NotFoundError()), id)
+
+  return jsonify({'results': results})
@@ -0,0 +1,227 @@
+"""
+This module provides a small in-process cache for expensive lookups.
+Caches are bounded: once full, the least recently used entry is evicted.
+Entries also expire after a time-to-live (TTL), which may be set per entry.
+Each cache counts its hits and misses so its hit rate can be monitored.
+Caches registered by name in 'caches' have their stats reported by '/status/'.
+
+Device lists use a ListCache, which groups entries by owner so one owner's entries can be dropped at once.
+Its storage is pluggable (DEVICE_LIST_CACHE_BACKEND), so a shared backend could serve many workers.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import threading
+import time
+
+from collections import OrderedDict
+from werkzeug.utils import import_string
+
+
+# --------------------------------------------------------------------------------
+# Variables
+# --------------------------------------------------------------------------------
+
+caches = dict()
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def register_cache(name, cache):
+  caches[name] = cache
+  return cache
+
+
+def get_list_cache_backend(config):
+  # Other backends are named by import path, like "mypackage.caches.RedisListCacheBackend"
+  name = config['DEVICE_LIST_CACHE_BACKEND']
+  backend_class = MemoryListCacheBackend if name == 'memory' else import_string(name)
+  return backend_class(config['DEVICE_LIST_CACHE_SIZE'])
+
+
+# --------------------------------------------------------------------------------
+# Class: TTLCache
+# --------------------------------------------------------------------------------
+
+class TTLCache:
+
+  def __init__(self, maxsize=1024, ttl=300):
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self.hits = 0
+    self.misses = 0
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+
+
+  def configure(self, maxsize, ttl):
+    """Resizes the cache and changes the default TTL. Existing entries are dropped."""
+    with self._lock:
+      self.maxsize = maxsize
+      self.ttl = ttl
+      self._entries.clear()
+
+
+  def get(self, key, default=None):
+    with self._lock:
+      entry = self._entries.get(key)
+
+      if entry is None or entry[1] <= time.monotonic():
+        if entry is not None:
+          del self._entries[key]
+        self.misses += 1
+        return default
+
+      self._entries.move_to_end(key)
+      self.hits += 1
+      return entry[0]
+
+
+  def set(self, key, value, ttl=None):
+    if self.maxsize <= 0:
+      return
+
+    expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+    with self._lock:
+      self._entries[key] = (value, expires_at)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.maxsize:
+        self._entries.popitem(last=False)
+
+
+  def pop(self, key):
+    with self._lock:
+      entry = self._entries.pop(key, None)
+    return entry[0] if entry else None
+
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+
+
+  def stats(self):
+    lookups = self.hits + self.misses
+    return {
+      'size': len(self._entries),
+      'maxsize': self.maxsize,
+      'hits': self.hits,
+      'misses': self.misses,
+      'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+    }
+
+
+# --------------------------------------------------------------------------------
+# Class: MemoryListCacheBackend
+# --------------------------------------------------------------------------------
+
+class MemoryListCacheBackend:
+  """
+  Stores cached device lists in this process, with least-recently-used eviction.
+  Shared backends (like Redis) can replace it by providing the same methods.
+  """
+
+  def __init__(self, maxsize=1024):
+    self.maxsize = maxsize
+    self.hits = 0
+    self.misses = 0
+    self._entries = OrderedDict()
+    self._keys_by_owner = dict()
+    self._lock = threading.Lock()
+
+
+  def _remove(self, owner, key):
+    del self._entries[(owner, key)]
+    owner_keys = self._keys_by_owner[owner]
+    owner_keys.discard(key)
+    if not owner_keys:
+      del self._keys_by_owner[owner]
+
+
+  def get(self, owner, key):
+    with self._lock:
+      value = self._entries.get((owner, key))
+      if value is None:
+        self.misses += 1
+      else:
+        self._entries.move_to_end((owner, key))
+        self.hits += 1
+      return value
+
+
+  def set(self, owner, key, value):
+    if self.maxsize <= 0:
+      return
+
+    with self._lock:
+      self._entries[(owner, key)] = value
+      self._entries.move_to_end((owner, key))
+      self._keys_by_owner.setdefault(owner, set()).add(key)
+      while len(self._entries) > self.maxsize:
+        self._remove(*next(iter(self._entries)))
+
+
+  def invalidate(self, owner):
+    with self._lock:
+      for key in list(self._keys_by_owner.get(owner, [])):
+        self._remove(owner, key)
+
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self._keys_by_owner.clear()
+
+
+  def stats(self):
+    lookups = self.hits + self.misses
+    return {
+      'size': len(self._entries),
+      'maxsize': self.maxsize,
+      'hits': self.hits,
+      'misses': self.misses,
+      'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+    }
+
+
+# --------------------------------------------------------------------------------
+# Class: ListCache
+# --------------------------------------------------------------------------------
+
+class ListCache:
+  """
+  Caches serialized device lists per owner.
+  Writes must call 'invalidate' for the owner, so cached lists are never stale.
+  The backend does the storage and may be replaced by 'configure'.
+  """
+
+  def __init__(self, backend=None):
+    self.backend = backend or MemoryListCacheBackend(0)
+
+
+  def configure(self, backend):
+    self.backend = backend
+
+
+  def get(self, owner, key):
+    return self.backend.get(owner, key)
+
+
+  def set(self, owner, key, value):
+    self.backend.set(owner, key, value)
+
+
+  def invalidate(self, owner):
+    self.backend.invalidate(owner)
+
+
+  def clear(self):
+    self.backend.clear()
+
+
+  def stats(self):
+    return self.backend.stats()
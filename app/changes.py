@@ -0,0 +1,150 @@
+"""
+This module provides a change feed for incremental syncing of device lists.
+'/devices/changes?since=<seq>' returns the user's devices that changed after sequence number "since",
+plus the IDs of devices deleted after it ("tombstones").
+The response's "since" is the value for the next request, and "more" is true if more changes are waiting.
+A first sync starts from "since=0", which returns every device.
+Changes are paginated with "limit", and they support sparse fieldsets ("fields").
+
+The 'device_changes' table holds one row per device, with the sequence number of its latest change.
+A write replaces the device's row with a new one, so sequence numbers always increase,
+and the table never holds more than one row per device, however often devices change.
+Deleted devices keep their rows as tombstones, so syncing clients learn about the deletion.
+
+Writes record their changes through 'commit_device_changes' (see 'devices'),
+in the same transaction as the writes themselves.
+Sequence numbers are taken when rows are inserted, not when they commit.
+With concurrent write transactions (like on Postgres), a higher number could commit first,
+and a client syncing in between would skip the lower one for good.
+So writers for the same owner hold a lock on the owner's revision row from before they take numbers until they commit.
+Each owner's numbers then become visible in order, and a client's "since" never passes one still to come.
+The table is a schema extension, so existing devices are recorded when it is first created.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+from . import db
+from .auth import multi_auth
+from .database import register_schema_extension
+from .models import Device, OwnerRevision
+from .queries import JSON_FIELDS, get_int_arg, parse_fields, row_to_json
+
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import Boolean, Column, Index, Integer, MetaData, String, Table, delete, false, inspect, insert, select
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+
+# --------------------------------------------------------------------------------
+# Blueprint
+# --------------------------------------------------------------------------------
+
+changes = Blueprint('changes', __name__)
+
+
+# --------------------------------------------------------------------------------
+# Tables
+# --------------------------------------------------------------------------------
+
+changes_metadata = MetaData()
+
+# "AUTOINCREMENT" keeps SQLite from reusing the sequence numbers of replaced rows
+device_changes = Table(
+  'device_changes', changes_metadata,
+  Column('seq', Integer, primary_key=True),
+  Column('device_id', Integer, nullable=False, unique=True),
+  Column('owner', String(64), nullable=False),
+  Column('deleted', Boolean, nullable=False),
+  Index('ix_device_changes_owner_seq', 'owner', 'seq'),
+  sqlite_autoincrement=True)
+
+
+# --------------------------------------------------------------------------------
+# Class: DeviceChangesExtension
+# --------------------------------------------------------------------------------
+
+class DeviceChangesExtension:
+  """Creates the 'device_changes' table, with a row for every device that already exists."""
+
+  def ddl(self, dialect):
+    tables = [str(CreateTable(device_changes).compile(dialect=dialect))]
+    indexes = [str(CreateIndex(index).compile(dialect=dialect)) for index in device_changes.indexes]
+    return tables + indexes
+
+
+  def create(self, connection):
+    if not inspect(connection).has_table('device_changes'):
+      changes_metadata.create_all(connection)
+      existing = select(Device.id, Device.owner, false()).order_by(Device.id)
+      connection.execute(insert(device_changes).from_select(['device_id', 'owner', 'deleted'], existing))
+
+
+  def drop(self, connection):
+    changes_metadata.drop_all(connection)
+
+
+register_schema_extension('changes', DeviceChangesExtension())
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def record_changes(username, changed=(), deleted=()):
+  """Records changed and deleted device IDs as part of the current transaction."""
+
+  rows = [{'device_id': id, 'owner': username, 'deleted': False} for id in changed]
+  rows += [{'device_id': id, 'owner': username, 'deleted': True} for id in deleted]
+  if not rows:
+    return
+
+  # Held until the commit, so another writer for this owner cannot take a number in between
+  OwnerRevision.lock(username)
+
+  # Replacing each row gives it the next sequence number
+  connection = db.session.connection()
+  connection.execute(delete(device_changes).where(device_changes.c.device_id.in_([row['device_id'] for row in rows])))
+  connection.execute(insert(device_changes), rows)
+
+
+def query_changes(username, since, limit, fields):
+  columns = [getattr(Device, field) for field in fields]
+  statement = select(device_changes.c.seq, device_changes.c.device_id, device_changes.c.deleted, *columns) \
+    .select_from(device_changes.outerjoin(Device, Device.id == device_changes.c.device_id)) \
+    .where(device_changes.c.owner == username, device_changes.c.seq > since) \
+    .order_by(device_changes.c.seq) \
+    .limit(limit + 1)
+  return db.session.execute(statement).all()
+
+
+# --------------------------------------------------------------------------------
+# Resources
+# --------------------------------------------------------------------------------
+
+@changes.route('/devices/changes', methods=['GET'])
+@multi_auth.login_required
+def devices_changes_get():
+  """
+  Gets the devices owned by the user that changed after "since", and the IDs of deleted devices.
+  Supports sparse fieldsets ("fields") and pagination ("limit").
+  Requires authentication.
+  """
+
+  username = multi_auth.current_user()
+  since = get_int_arg(request.args, 'since', minimum=0) or 0
+  max_limit = current_app.config['DEVICES_MAX_PAGE_LIMIT']
+  limit = get_int_arg(request.args, 'limit', minimum=1, maximum=max_limit) or max_limit
+  fields = parse_fields(request.args) or JSON_FIELDS
+
+  # Fetch one extra row to learn if more changes follow
+  rows = query_changes(username, since, limit, fields)
+  page = rows[:limit]
+
+  response = {
+    'devices': [row_to_json(row[3:], fields) for row in page if not row.deleted],
+    'deleted': [row.device_id for row in page if row.deleted],
+    'since': page[-1].seq if page else since,
+    'more': len(rows) > limit
+  }
+  return jsonify(response)
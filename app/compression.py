@@ -0,0 +1,209 @@
+"""
+This module compresses responses with the encoding negotiated through "Accept-Encoding".
+Supported encodings are gzip (always), brotli ("br", if brotli is installed),
+and zstd (if zstandard is installed).
+COMPRESSION_ENCODINGS lists the encodings the app may use, in order of preference.
+When the client weighs encodings equally, the app's preference breaks the tie.
+
+Only text-like responses are compressed (JSON, NDJSON, and text).
+Event streams are not, because compressors hold back data that each event must deliver at once.
+Complete responses smaller than COMPRESSION_MIN_SIZE are sent as they are,
+because compressing them costs more time than it saves on the wire.
+Streamed responses (like "stream=true" device lists) are compressed as they are generated.
+The compressor is flushed after every STREAM_FLUSH_SIZE bytes of input,
+so clients can decode each part as it arrives, without flushing every tiny chunk.
+
+Cached device lists keep their compressed variants in the list cache (see 'devices'),
+so a cached list is compressed once per encoding rather than on every request.
+A response opts in with a 'cache_key' attribute: the (owner, key) pair of its body in the cache.
+Each variant is stored under the same owner and key, with the encoding appended,
+so invalidating the owner drops the variants along with the body.
+
+A compressed response's ETag becomes weak, since its bytes differ from the uncompressed response.
+Conditional requests compare ETags weakly, so they work the same with either variant.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import zlib
+
+from flask import request
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+try:
+  import zstandard
+except ImportError:
+  zstandard = None
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+COMPRESSIBLE_MIMETYPES = ['application/json', 'application/x-ndjson']
+
+# Levels favor speed, because every uncached response pays for compression
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+STREAM_FLUSH_SIZE = 64 * 1024
+
+
+# --------------------------------------------------------------------------------
+# Compressors
+# --------------------------------------------------------------------------------
+
+class GzipCompressor:
+
+  def __init__(self):
+    # 'wbits' of 16 + 15 writes a gzip header and trailer
+    self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+  def compress(self, data):
+    return self._compressor.compress(data)
+
+  def flush(self):
+    return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+  def finish(self):
+    return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+
+  def __init__(self):
+    self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+  def compress(self, data):
+    return self._compressor.process(data)
+
+  def flush(self):
+    return self._compressor.flush()
+
+  def finish(self):
+    return self._compressor.finish()
+
+
+class ZstdCompressor:
+
+  def __init__(self):
+    self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+  def compress(self, data):
+    return self._compressor.compress(data)
+
+  def flush(self):
+    return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+  def finish(self):
+    return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+COMPRESSORS = {'gzip': GzipCompressor}
+if brotli:
+  COMPRESSORS['br'] = BrotliCompressor
+if zstandard:
+  COMPRESSORS['zstd'] = ZstdCompressor
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def get_encodings(names):
+  """Returns the usable encodings among 'names' (a comma-separated string), in order."""
+  return [name.strip() for name in names.split(',') if name.strip() in COMPRESSORS]
+
+
+def choose_encoding(accept_encodings, encodings):
+  best, best_quality = None, 0
+  for encoding in encodings:
+    # Earlier encodings win ties, because only a higher quality replaces them
+    if (quality := accept_encodings[encoding]) > best_quality:
+      best, best_quality = encoding, quality
+  return best
+
+
+def compress(data, encoding):
+  compressor = COMPRESSORS[encoding]()
+  return compressor.compress(data) + compressor.finish()
+
+
+def compress_cached(data, encoding, cache, cache_key):
+  if cache is None or cache_key is None:
+    return compress(data, encoding)
+
+  owner, key = cache_key
+  variant_key = f'{key}:{encoding}'
+  if (compressed := cache.get(owner, variant_key)) is None:
+    compressed = compress(data, encoding)
+    cache.set(owner, variant_key, compressed)
+  return compressed
+
+
+def compress_stream(chunks, encoding):
+  compressor = COMPRESSORS[encoding]()
+  pending = 0
+
+  for chunk in chunks:
+    if isinstance(chunk, str):
+      chunk = chunk.encode()
+    compressed = compressor.compress(chunk)
+    pending += len(chunk)
+
+    if pending >= STREAM_FLUSH_SIZE:
+      compressed += compressor.flush()
+      pending = 0
+    if compressed:
+      yield compressed
+
+  yield compressor.finish()
+
+
+def is_compressible(response):
+  return (response.mimetype in COMPRESSIBLE_MIMETYPES or response.mimetype.startswith('text/')) \
+    and response.mimetype != 'text/event-stream' \
+    and 200 <= response.status_code < 300 and response.status_code != 204 \
+    and 'Content-Encoding' not in response.headers and not response.direct_passthrough
+
+
+def weaken_etag(response):
+  etag, weak = response.get_etag()
+  if etag and not weak:
+    response.set_etag(etag, weak=True)
+
+
+def init_compression(app, cache=None):
+  """Compresses the app's responses. 'cache' keeps the compressed variants of responses with a 'cache_key'."""
+
+  encodings = get_encodings(app.config['COMPRESSION_ENCODINGS'])
+  min_size = app.config['COMPRESSION_MIN_SIZE']
+
+  @app.after_request
+  def compress_response(response):
+    if not encodings or not is_compressible(response):
+      return response
+
+    response.vary.add('Accept-Encoding')
+    if not (encoding := choose_encoding(request.accept_encodings, encodings)):
+      return response
+
+    if response.is_streamed:
+      response.response = compress_stream(response.response, encoding)
+      response.headers.pop('Content-Length', None)
+    else:
+      data = response.get_data()
+      if len(data) < min_size:
+        return response
+      response.set_data(compress_cached(data, encoding, cache, getattr(response, 'cache_key', None)))
+
+    response.headers['Content-Encoding'] = encoding
+    weaken_etag(response)
+    return response
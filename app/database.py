@@ -0,0 +1,162 @@
+"""
+This module provides database engine and schema setup for the app.
+Engine pool options come from SQLALCHEMY_ENGINE_OPTIONS in the config.
+SQLite connections also get the pragmas in SQLITE_PRAGMAS when they connect.
+By default, these turn on write-ahead logging (WAL) so readers do not wait behind writers.
+
+At startup, DB_CREATE_SCHEMA decides whether to create missing tables:
+1. "auto" creates tables only if the schema changed since tables were last created.
+   The schema's fingerprint (a hash of its DDL) is stored in the 'schema_info' table,
+   so an up-to-date database costs one small query instead of checking every table.
+   Creating tables never changes existing ones, so if those still lack columns or indexes,
+   startup fails and asks for "flask upgrade-db" instead of storing a fingerprint that does not match.
+   (CLI commands do not start the app, so the command works on such a database.)
+2. "always" creates missing tables at every startup.
+3. "never" skips schema setup, for databases managed by "flask init-db" or "flask upgrade-db".
+
+Schema extensions add objects that the models' metadata cannot describe, like SQLite virtual tables and triggers.
+An extension provides 'ddl' (its statements, which count toward the fingerprint), 'create', and 'drop'.
+Extensions are registered by name before the schema is checked (see 'search').
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import hashlib
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, delete, event, insert, inspect, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+
+# --------------------------------------------------------------------------------
+# Tables
+# --------------------------------------------------------------------------------
+
+# The schema info table is kept out of the models' metadata, so it never changes their fingerprint
+schema_metadata = MetaData()
+
+schema_info = Table(
+  'schema_info', schema_metadata,
+  Column('id', Integer, primary_key=True),
+  Column('fingerprint', String(64), nullable=False))
+
+
+# --------------------------------------------------------------------------------
+# Variables
+# --------------------------------------------------------------------------------
+
+schema_extensions = dict()
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def register_schema_extension(name, extension):
+  schema_extensions[name] = extension
+  return extension
+
+
+def sqlite_pragma_listener(pragmas):
+  def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+      cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+  
+  return set_sqlite_pragmas
+
+
+def configure_engine(app, engine):
+  if engine.dialect.name == 'sqlite' and (pragmas := app.config['SQLITE_PRAGMAS']):
+    event.listen(engine, 'connect', sqlite_pragma_listener(pragmas))
+
+
+def schema_fingerprint(metadata, engine):
+  ddl = list()
+  for table in metadata.sorted_tables:
+    ddl.append(str(CreateTable(table).compile(dialect=engine.dialect)))
+    ddl += sorted(str(CreateIndex(index).compile(dialect=engine.dialect)) for index in table.indexes)
+  for name in sorted(schema_extensions):
+    ddl += schema_extensions[name].ddl(engine.dialect)
+  return hashlib.sha256('\n'.join(ddl).encode()).hexdigest()
+
+
+def get_stored_fingerprint(engine):
+  try:
+    with engine.connect() as connection:
+      return connection.execute(select(schema_info.c.fingerprint)).scalar()
+  except DBAPIError:
+    # The table does not exist until the schema is first created
+    return None
+
+
+def store_fingerprint(engine, fingerprint):
+  schema_metadata.create_all(engine)
+  with engine.begin() as connection:
+    connection.execute(delete(schema_info))
+    connection.execute(insert(schema_info), {'id': 1, 'fingerprint': fingerprint})
+
+
+def create_schema_extensions(engine):
+  with engine.begin() as connection:
+    for extension in schema_extensions.values():
+      extension.create(connection)
+
+
+def missing_schema_objects(metadata, engine):
+  """Returns the names of columns and indexes that the models have but the database lacks."""
+
+  inspector = inspect(engine)
+  missing = list()
+  for table in metadata.sorted_tables:
+    columns = {column['name'] for column in inspector.get_columns(table.name)}
+    indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+    missing += [f'{table.name}.{column.name}' for column in table.columns if column.name not in columns]
+    missing += [index.name for index in table.indexes if index.name not in indexes]
+  return missing
+
+
+def create_schema(db):
+  """Creates all tables and schema extensions, and records the schema's fingerprint."""
+  db.create_all()
+
+  # 'create_all' skips existing tables, so an older database may still lack new columns and indexes
+  if missing := missing_schema_objects(db.metadata, db.engine):
+    raise RuntimeError(f'The database schema is out of date (missing {", ".join(missing)}). Run "flask upgrade-db".')
+
+  create_schema_extensions(db.engine)
+  store_fingerprint(db.engine, schema_fingerprint(db.metadata, db.engine))
+
+
+def drop_schema(db):
+  """Drops all tables and schema extensions."""
+  with db.engine.begin() as connection:
+    for extension in schema_extensions.values():
+      extension.drop(connection)
+  db.drop_all()
+
+
+def copy_sqlite_database(source, target):
+  """Copies a SQLite database into another with SQLite's online backup API."""
+  source_connection, target_connection = source.raw_connection(), target.raw_connection()
+  try:
+    source_connection.dbapi_connection.backup(target_connection.dbapi_connection)
+  finally:
+    source_connection.close()
+    target_connection.close()
+
+
+def ensure_schema(app, db):
+  mode = app.config['DB_CREATE_SCHEMA']
+  if mode == 'never':
+    return
+
+  if mode == 'auto':
+    fingerprint = schema_fingerprint(db.metadata, db.engine)
+    if get_stored_fingerprint(db.engine) == fingerprint:
+      return
+
+  create_schema(db)
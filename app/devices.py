@@ -1,20 +1,61 @@
 """
 This module provides a blueprint for device resources.
 The resources cover basic CRUD operations.
+
+Device lists may be paginated with the "limit" and "after" query parameters.
+Pages are keyed by device ID (keyset pagination), so every page is an indexed range scan.
+The "next" value in a paginated response is the "after" value for the following page.
+Alternatively, the "stream" query parameter streams the whole list in chunks.
+Whole, paginated, and streamed lists are all in ID order, which the owner and ID index yields without sorting.
+Device lists may be filtered by field values, prefixes, and ID ranges (see 'queries').
+Lists and single devices may be narrowed to a sparse fieldset with the "fields" query parameter.
+With "fields", only those columns are selected, and rows are serialized without ORM objects.
+
+Responses carry entity tags (ETags) for conditional requests.
+A device's ETag comes from its version, which increments with every update.
+A device list's ETag comes from the owner's revision, which increments with every write.
+GET requests with a matching "If-None-Match" header yield "304 Not Modified" without a body.
+PUT and PATCH requests with a stale "If-Match" header yield "412 Precondition Failed".
+
+Single devices are looked up by ID and owner together, so a found device needs no further check.
+Only a miss runs a second, index-only query to tell "404 Not Found" from "403 Forbidden".
+PUT, PATCH, and DELETE write with one statement scoped to the ID, the owner,
+and the versions accepted by "If-Match", instead of loading, modifying, and flushing an ORM object.
+Updated rows come back through "RETURNING" where the database dialect supports it,
+or else through one indexed select in the same transaction.
+
+Serialized device lists are cached per owner, keyed by their ETags, along with their compressed variants.
+Every write must therefore go through 'commit_device_changes',
+which bumps the owner's revision and drops the owner's cached lists.
+Writes also pass the IDs of the devices they created, changed, or deleted,
+for the change feed (see 'changes') and for the events pushed to subscribers (see 'events').
+Other modules can follow the changes with 'register_change_listener' (see 'search').
+
+With read replicas configured, GET resources read from a replica (see 'replicas').
+A device that a replica does not have yet is looked up again on the primary.
+'commit_device_changes' pins the owner to the primary for a while, so users read their own writes.
 """
 
 # --------------------------------------------------------------------------------
 # Imports
 # --------------------------------------------------------------------------------
 
+import hashlib
 import io
 
 from . import db
 from .auth import multi_auth
-from .errors import NotFoundError, UserUnauthorizedError, ValidationError
-from .models import Device
-
-from flask import Blueprint, jsonify, request
+from .cache import ListCache, register_cache
+from .changes import record_changes
+from .errors import NotFoundError, PreconditionFailedError, UserUnauthorizedError, ValidationError
+from .events import event_hub
+from .models import Device, OwnerRevision
+from .queries import JSON_FIELDS, compile_device_filters, field_columns, get_int_arg, parse_fields, row_to_json
+from .replicas import replica_router
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm.exc import StaleDataError
 from werkzeug.utils import send_file
 
 
@@ -25,19 +66,224 @@ from werkzeug.utils import send_file
 devices = Blueprint('devices', __name__)
 
 
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+DEVICE_COLUMNS = [getattr(Device, field) for field in JSON_FIELDS] + [Device.version]
+
+
+# --------------------------------------------------------------------------------
+# Caches
+# --------------------------------------------------------------------------------
+
+list_cache = register_cache('device_lists', ListCache())
+
+
+# --------------------------------------------------------------------------------
+# Variables
+# --------------------------------------------------------------------------------
+
+change_listeners = list()
+
+
 # --------------------------------------------------------------------------------
 # Functions
 # --------------------------------------------------------------------------------
 
+def register_change_listener(listener):
+  """Calls 'listener(username, changed, deleted)' with the device IDs of every committed write."""
+  change_listeners.append(listener)
+  return listener
+
+
+def device_miss_error(id, username):
+  """Returns the error for a device that a lookup or write scoped to 'username' did not find."""
+
+  row = db.session.query(Device.owner).filter_by(id=id).first()
+
+  if not row:
+    return NotFoundError()
+  elif row.owner != username:
+    return UserUnauthorizedError()
+
+  # The device is the user's, so the write was scoped to versions it no longer has
+  return PreconditionFailedError()
+
+
+def check_device_owner(id, username):
+  """Raises "404 Not Found" or "403 Forbidden" unless device 'id' exists and is owned by 'username'."""
+
+  error = device_miss_error(id, username)
+  if not isinstance(error, PreconditionFailedError):
+    raise error
+
+
 def query_device(id, username):
-  device = Device.query.filter_by(id=id).first()
-  
-  if not device:
+  device = Device.query.filter_by(id=id, owner=username).first()
+
+  # A replica may lag behind, so misses are checked on the primary
+  if not device and replica_router.unroute(db.session):
+    return query_device(id, username)
+  elif not device:
+    raise device_miss_error(id, username)
+
+  return device
+
+
+def returning_supported():
+  dialect = db.engine.dialect
+  return getattr(dialect, 'update_returning', getattr(dialect, 'full_returning', False))
+
+
+def if_match_versions(request, id):
+  """Returns the versions of device 'id' that "If-Match" accepts, or None if it accepts any."""
+
+  if not request.if_match or request.if_match.star_tag:
+    return None
+
+  prefix = device_etag(id, '')
+  tags = request.if_match.as_set(include_weak=True)
+  return [int(tag[len(prefix):]) for tag in tags if tag.startswith(prefix) and tag[len(prefix):].isdigit()]
+
+
+def update_device(id, username, values, versions=None):
+  """Updates a device owned by 'username' with one statement and returns its new row."""
+
+  conditions = [Device.id == id, Device.owner == username]
+  if versions is not None:
+    conditions.append(Device.version.in_(versions))
+
+  # The ORM's version counter is bypassed, so the statement increments it
+  statement = update(Device).where(*conditions).values(**values, version=Device.version + 1)
+  connection = db.session.connection()
+
+  if returning_supported():
+    row = connection.execute(statement.returning(*DEVICE_COLUMNS)).first()
+  elif connection.execute(statement).rowcount:
+    row = connection.execute(select(*DEVICE_COLUMNS).where(Device.id == id)).first()
+  else:
+    row = None
+
+  if not row:
+    raise device_miss_error(id, username)
+
+  return row
+
+
+def delete_device(id, username):
+  """Deletes a device owned by 'username' with one statement."""
+
+  result = db.session.connection().execute(delete(Device).where(Device.id == id, Device.owner == username))
+
+  if not result.rowcount:
+    raise device_miss_error(id, username)
+
+
+def query_device_etag(id, username):
+  # Only reads the version, so an unchanged device never loads its full row
+  row = db.session.query(Device.owner, Device.version).filter_by(id=id).first()
+
+  if not row and replica_router.unroute(db.session):
+    return query_device_etag(id, username)
+  elif not row:
     raise NotFoundError()
-  elif device.owner != username:
+  elif row.owner != username:
     raise UserUnauthorizedError()
-  
-  return device
+
+  return device_etag(id, row.version)
+
+
+def query_device_fields(id, username, fields):
+  row = db.session.query(Device.owner, Device.version, *field_columns(fields)).filter_by(id=id).first()
+
+  if not row and replica_router.unroute(db.session):
+    return query_device_fields(id, username, fields)
+  elif not row:
+    raise NotFoundError()
+  elif row.owner != username:
+    raise UserUnauthorizedError()
+
+  return row
+
+
+def commit_device_changes(username, created=(), changed=(), deleted=()):
+  OwnerRevision.bump(username)
+  record_changes(username, [*created, *changed], deleted)
+
+  try:
+    db.session.commit()
+  except StaleDataError:
+    # Another request updated the same device first
+    db.session.rollback()
+    raise PreconditionFailedError()
+
+  list_cache.invalidate(username)
+  replica_router.pin(username)
+  for listener in change_listeners:
+    listener(username, [*created, *changed], deleted)
+
+  # Events are published only after the commit, so subscribers never see changes that were rolled back
+  event_hub.publish(username, 'create', created)
+  event_hub.publish(username, 'update', changed)
+  event_hub.publish(username, 'delete', deleted)
+
+
+def device_etag(id, version):
+  return f'{id}-{version}'
+
+
+def devices_etag(username, args):
+  revision = OwnerRevision.get(username)
+  query = sorted(args.items(multi=True))
+  return hashlib.sha1(f'{username}\n{revision}\n{query}'.encode()).hexdigest()
+
+
+def not_modified(etag):
+  response = current_app.response_class(status=304)
+  response.set_etag(etag)
+  return response
+
+
+def devices_response(body, etag, owner):
+  response = current_app.response_class(body, mimetype='application/json')
+  response.set_etag(etag)
+  # Lets compression cache the compressed body next to this one (see 'compression')
+  response.cache_key = (owner, etag)
+  return response
+
+
+def device_response(device):
+  response = jsonify(device.to_json())
+  response.set_etag(device_etag(device.id, device.version))
+  return response
+
+
+def device_row_response(row):
+  response = jsonify(row_to_json(row, JSON_FIELDS))
+  response.set_etag(device_etag(row.id, row.version))
+  return response
+
+
+def device_fields_response(id, row, fields):
+  # The owner and version lead the row, ahead of the requested fields
+  response = jsonify(row_to_json(row[2:], fields))
+  response.set_etag(device_etag(id, row.version))
+  return response
+
+
+def device_report(device):
+  """Builds the text report for a device (or a row with the same fields), encoded as UTF-8."""
+
+  return (
+    f'ID: {device.id}\n'
+    f'Name: {device.name}\n'
+    f'Location: {device.location}\n'
+    f'Type: {device.type}\n'
+    f'Model: {device.model}\n'
+    f'Serial Number: {device.serial_number}\n'
+    f'Owner: {device.owner}\n'
+  ).encode('utf-8')
 
 
 def get_json_from_request(request):
@@ -49,6 +295,31 @@ def get_json_from_request(request):
   return data
 
 
+def get_page(query, limit):
+  # Fetch one extra row to learn if another page follows
+  ds = query.order_by(Device.id).limit(limit + 1).all()
+  next_after = ds[limit - 1].id if len(ds) > limit else None
+  return ds[:limit], next_after
+
+
+def serializer(fields):
+  if fields is None:
+    return lambda device: device.to_json()
+  return lambda row: row_to_json(row, fields)
+
+
+def stream_devices(query, batch_size, to_json):
+  yield '{"devices": ['
+  
+  # 'yield_per' fetches rows from the cursor in batches instead of all at once
+  for i, device in enumerate(query.order_by(Device.id).yield_per(batch_size)):
+    if i > 0:
+      yield ', '
+    yield current_app.json.dumps(to_json(device))
+  
+  yield ']}\n'
+
+
 # --------------------------------------------------------------------------------
 # Resources
 # --------------------------------------------------------------------------------
@@ -58,19 +329,49 @@ def get_json_from_request(request):
 def devices_get():
   """
   Gets a list of all devices owned by the user.
+  Supports filters, sparse fieldsets ("fields"), keyset pagination ("limit" and "after"),
+  and streaming ("stream").
   Requires authentication.
   """
   
-  filter_args = dict()
-  filter_args['owner'] = multi_auth.current_user()
-
-  for field in ['id', 'name', 'location', 'type', 'model', 'serial_number']:
-    if value := request.args.get(field):
-      filter_args[field] = value
-
-  ds = Device.query.filter_by(**filter_args)
-  device_dict = {'devices': [device.to_json() for device in ds]}
-  return jsonify(device_dict)
+  username = multi_auth.current_user()
+  replica_router.route(db.session, username)
+  max_values = current_app.config['DEVICES_MAX_FILTER_VALUES']
+  filters = compile_device_filters(request.args, max_values)
+  fields = parse_fields(request.args)
+  to_json = serializer(fields)
+
+  ds = Device.query.filter(Device.owner == username, *filters)
+  if fields is not None:
+    ds = ds.with_entities(*field_columns(fields))
+  stream = request.args.get('stream', '').lower() in ['1', 'true']
+
+  if not stream:
+    etag = devices_etag(username, request.args)
+    if request.if_none_match.contains_weak(etag):
+      return not_modified(etag)
+    if (body := list_cache.get(username, etag)) is not None:
+      return devices_response(body, etag, username)
+
+  if (after := get_int_arg(request.args, 'after', minimum=0)) is not None:
+    ds = ds.filter(Device.id > after)
+
+  if stream:
+    batch_size = current_app.config['DEVICES_STREAM_BATCH_SIZE']
+    generator = stream_with_context(stream_devices(ds, batch_size, to_json))
+    return Response(generator, mimetype='application/json')
+
+  max_limit = current_app.config['DEVICES_MAX_PAGE_LIMIT']
+  if (limit := get_int_arg(request.args, 'limit', minimum=1, maximum=max_limit)) is not None:
+    page, next_after = get_page(ds, limit)
+    device_dict = {'devices': [to_json(device) for device in page], 'next': next_after}
+  else:
+    device_dict = {'devices': [to_json(device) for device in ds.order_by(Device.id)]}
+  
+  # The ETag covers the owner, the owner's revision, and the query, so it also keys the cache
+  body = current_app.json.response(device_dict).get_data()
+  list_cache.set(username, etag, body)
+  return devices_response(body, etag, username)
 
 
 @devices.route('/devices/', methods=['POST'])
@@ -85,8 +386,9 @@ def devices_post():
   data = get_json_from_request(request)
   device = Device.from_json(data, username)
   db.session.add(device)
-  db.session.commit()
-  return jsonify(device.to_json())
+  db.session.flush()
+  commit_device_changes(username, created=[device.id])
+  return device_response(device)
 
 
 @devices.route('/devices/<int:id>', methods=['GET'])
@@ -94,12 +396,27 @@ def devices_post():
 def device_id_get(id):
   """
   Gets a device owned by the user.
+  Supports sparse fieldsets ("fields").
   Requires authentication.
   """
 
   username = multi_auth.current_user()
+  replica_router.route(db.session, username)
+
+  if (fields := parse_fields(request.args)) is not None:
+    row = query_device_fields(id, username, fields)
+    etag = device_etag(id, row.version)
+    if request.if_none_match.contains_weak(etag):
+      return not_modified(etag)
+    return device_fields_response(id, row, fields)
+
+  if request.if_none_match:
+    etag = query_device_etag(id, username)
+    if request.if_none_match.contains_weak(etag):
+      return not_modified(etag)
+
   device = query_device(id, username)
-  return jsonify(device.to_json())
+  return device_response(device)
 
 
 @devices.route('/devices/<int:id>', methods=['PATCH', 'PUT'])
@@ -111,17 +428,21 @@ def device_id_patch_put(id):
   """
 
   username = multi_auth.current_user()
-  device = query_device(id, username)
-  data = get_json_from_request(request)
-  
-  if request.method == 'PATCH':
-    device.patch_from_json(data)
-  else:
-    device.update_from_json(data)
-  
-  db.session.add(device)
-  db.session.commit()
-  return jsonify(device.to_json())
+
+  try:
+    data = get_json_from_request(request)
+    if request.method == 'PATCH':
+      Device.validate_patch(data)
+    else:
+      Device.validate_full(data)
+  except ValidationError:
+    # A missing or unowned device is reported ahead of an invalid body, so only invalid bodies pay for the check
+    check_device_owner(id, username)
+    raise
+
+  row = update_device(id, username, data, if_match_versions(request, id))
+  commit_device_changes(username, changed=[id])
+  return device_row_response(row)
 
 
 @devices.route('/devices/<int:id>', methods=['DELETE'])
@@ -133,9 +454,8 @@ def device_id_delete(id):
   """
 
   username = multi_auth.current_user()
-  device = query_device(id, username)
-  db.session.delete(device)
-  db.session.commit()
+  delete_device(id, username)
+  commit_device_changes(username, deleted=[id])
   return jsonify(dict())
 
 
@@ -148,17 +468,9 @@ def devices_id_report_get(id):
   """
 
   username = multi_auth.current_user()
+  replica_router.route(db.session, username)
   device = query_device(id, username)
-
-  report = io.BytesIO()
-  report.write(bytes(f'ID: {device.id}\n', 'ascii'))
-  report.write(bytes(f'Name: {device.name}\n', 'ascii'))
-  report.write(bytes(f'Location: {device.location}\n', 'ascii'))
-  report.write(bytes(f'Type: {device.type}\n', 'ascii'))
-  report.write(bytes(f'Model: {device.model}\n', 'ascii'))
-  report.write(bytes(f'Serial Number: {device.serial_number}\n', 'ascii'))
-  report.write(bytes(f'Owner: {device.owner}\n', 'ascii'))
-  report.seek(0)
+  report = io.BytesIO(device_report(device))
 
   return send_file(
     report,
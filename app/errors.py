@@ -3,6 +3,7 @@ This module provides error handlers for this Flask app.
 Error handlers must be overridden to provide JSON responses.
 This module also provides a ValidationError exception class.
 Any ValidationError exceptions yield a "400 Bad Request" response.
+Any PreconditionFailedError exceptions yield a "412 Precondition Failed" response.
 """
 
 # --------------------------------------------------------------------------------
@@ -33,6 +34,11 @@ class UserUnauthorizedError(Exception):
     return 'current user is not authorized to access this resource'
 
 
+class PreconditionFailedError(Exception):
+  def __str__(self):
+    return 'resource has changed since it was last retrieved'
+
+
 class ValidationError(ValueError):
   pass
 
@@ -79,6 +85,14 @@ def method_not_allowed(e):
   return response
 
 
+@errors.app_errorhandler(412)
+@errors.app_errorhandler(PreconditionFailedError)
+def precondition_failed(e):
+  response = jsonify({'error': 'precondition failed', 'message': str(e)})
+  response.status_code = 412
+  return response
+
+
 @errors.app_errorhandler(500)
 def internal_server_error(e):
   response = jsonify({'error': 'internal server error'})
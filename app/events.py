@@ -0,0 +1,241 @@
+"""
+This module pushes device changes to clients as Server-Sent Events (SSE).
+'/devices/events' streams an event for every write to the user's devices:
+"create", "update", and "delete" events, each with the IDs of the devices involved.
+Clients can replace polling with one long-lived request,
+and fetch the devices (or use the change feed) when an event arrives.
+
+Writes publish their events through 'commit_device_changes' (see 'devices'), after they commit.
+The event hub delivers them to every subscriber for the owner.
+Its backend is pluggable (EVENTS_BACKEND), so a shared backend (like Redis pub/sub) could fan events out
+across many workers. The default "memory" backend only reaches subscribers in the same process.
+
+Each subscriber has a bounded queue (EVENTS_QUEUE_SIZE), so a slow client cannot hold back writers
+or grow memory without limit. If a client falls that far behind, its queue is dropped,
+and it gets an "overflow" event before its stream ends. It should then resync from the change feed.
+Idle streams get a comment line every EVENTS_HEARTBEAT seconds,
+which keeps proxies from closing them and detects clients that went away.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import json
+import queue
+import threading
+
+from .auth import multi_auth
+
+from flask import Blueprint, Response, current_app
+from werkzeug.utils import import_string
+
+
+# --------------------------------------------------------------------------------
+# Blueprint
+# --------------------------------------------------------------------------------
+
+events = Blueprint('events', __name__)
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+# Tells clients how long to wait before reconnecting, in milliseconds
+RETRY_MS = 3000
+
+# Marks a subscription whose queue overflowed
+OVERFLOW = object()
+
+
+# --------------------------------------------------------------------------------
+# Class: Subscription
+# --------------------------------------------------------------------------------
+
+class Subscription:
+  """A subscriber's bounded queue of events for one owner."""
+
+  def __init__(self, owner, maxsize):
+    self.owner = owner
+    self.overflowed = False
+    self._queue = queue.Queue(maxsize)
+    self._lock = threading.Lock()
+
+
+  def put(self, event):
+    """Queues an event without blocking. Returns False if the queue overflowed."""
+    with self._lock:
+      if self.overflowed:
+        return False
+
+      try:
+        self._queue.put_nowait(event)
+        return True
+      except queue.Full:
+        # Drop the backlog, so the overflow marker is the next thing the subscriber reads
+        self.overflowed = True
+        with self._queue.mutex:
+          self._queue.queue.clear()
+        self._queue.put_nowait(OVERFLOW)
+        return False
+
+
+  def get(self, timeout):
+    """Returns the next event, or None if none arrived within 'timeout' seconds."""
+    try:
+      return self._queue.get(timeout=timeout)
+    except queue.Empty:
+      return None
+
+
+# --------------------------------------------------------------------------------
+# Class: MemoryEventBackend
+# --------------------------------------------------------------------------------
+
+class MemoryEventBackend:
+  """
+  Delivers events to subscribers in this process.
+  Shared backends (like Redis pub/sub) can replace it by providing the same methods.
+  """
+
+  def __init__(self, queue_size=100):
+    self.queue_size = queue_size
+    self.published = 0
+    self.overflows = 0
+    self._subscriptions = dict()
+    self._lock = threading.Lock()
+
+
+  def subscribe(self, owner):
+    subscription = Subscription(owner, self.queue_size)
+    with self._lock:
+      self._subscriptions.setdefault(owner, set()).add(subscription)
+    return subscription
+
+
+  def unsubscribe(self, subscription):
+    with self._lock:
+      owner_subscriptions = self._subscriptions.get(subscription.owner, set())
+      owner_subscriptions.discard(subscription)
+      if not owner_subscriptions:
+        self._subscriptions.pop(subscription.owner, None)
+
+
+  def publish(self, owner, event):
+    with self._lock:
+      subscriptions = list(self._subscriptions.get(owner, ()))
+      self.published += 1
+
+    # Events are queued outside the lock, so a slow subscriber never holds up other owners
+    overflows = sum(not subscription.put(event) for subscription in subscriptions)
+    if overflows:
+      with self._lock:
+        self.overflows += overflows
+
+
+  def stats(self):
+    with self._lock:
+      return {
+        'subscribers': sum(len(subscriptions) for subscriptions in self._subscriptions.values()),
+        'published': self.published,
+        'overflows': self.overflows
+      }
+
+
+# --------------------------------------------------------------------------------
+# Class: EventHub
+# --------------------------------------------------------------------------------
+
+class EventHub:
+  """
+  Publishes device events per owner.
+  The backend does the delivery and may be replaced by 'configure'.
+  """
+
+  def __init__(self, backend=None):
+    self.backend = backend or MemoryEventBackend()
+
+
+  def configure(self, backend):
+    self.backend = backend
+
+
+  def subscribe(self, owner):
+    return self.backend.subscribe(owner)
+
+
+  def unsubscribe(self, subscription):
+    self.backend.unsubscribe(subscription)
+
+
+  def publish(self, owner, event_type, ids):
+    if ids:
+      self.backend.publish(owner, {'type': event_type, 'ids': list(ids)})
+
+
+  def stats(self):
+    return self.backend.stats()
+
+
+event_hub = EventHub()
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def get_event_backend(config):
+  # Other backends are named by import path, like "mypackage.events.RedisEventBackend"
+  name = config['EVENTS_BACKEND']
+  backend_class = MemoryEventBackend if name == 'memory' else import_string(name)
+  return backend_class(config['EVENTS_QUEUE_SIZE'])
+
+
+def format_event(event):
+  return f'event: {event["type"]}\ndata: {json.dumps({"ids": event["ids"]})}\n\n'
+
+
+def stream_events(subscription, heartbeat):
+  try:
+    yield f'retry: {RETRY_MS}\n\n'
+
+    while True:
+      event = subscription.get(heartbeat)
+      if event is None:
+        # A comment line, which clients ignore
+        yield ': heartbeat\n\n'
+      elif event is OVERFLOW:
+        yield 'event: overflow\ndata: {}\n\n'
+        return
+      else:
+        yield format_event(event)
+
+  finally:
+    # Runs when the stream ends or the client disconnects
+    event_hub.unsubscribe(subscription)
+
+
+# --------------------------------------------------------------------------------
+# Resources
+# --------------------------------------------------------------------------------
+
+@events.route('/devices/events', methods=['GET'])
+@multi_auth.login_required
+def devices_events_get():
+  """
+  Streams events for changes to devices owned by the user, as Server-Sent Events.
+  Requires authentication.
+  """
+
+  username = multi_auth.current_user()
+
+  # Subscribe before responding, so no write after the response starts is missed
+  subscription = event_hub.subscribe(username)
+  heartbeat = current_app.config['EVENTS_HEARTBEAT']
+
+  # The stream runs outside the request context, so it holds no database connection while it waits
+  response = Response(stream_events(subscription, heartbeat), mimetype='text/event-stream')
+  response.headers['Cache-Control'] = 'no-cache'
+  response.headers['X-Accel-Buffering'] = 'no'
+  return response
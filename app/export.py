@@ -0,0 +1,216 @@
+"""
+This module provides a blueprint for exporting device lists and reports.
+'/devices/export' streams all of the user's devices as CSV or NDJSON ("format" query parameter).
+It supports the same filters and sparse fieldsets ("fields") as '/devices/' (see 'queries').
+
+'/devices/reports' streams a zip archive with one text report per device.
+A GET request reports every device matching the filters.
+A POST request reports the devices whose IDs are listed in the body, like a '/devices/bulk' delete.
+Ownership of all listed IDs is checked up front, with one query per chunk of IDs (BULK_CHUNK_SIZE),
+so one unknown or unowned ID fails the whole request before anything is sent.
+The archive is written incrementally, one batch of reports at a time.
+
+Rows are read from a streaming database cursor in batches (DEVICES_STREAM_BATCH_SIZE),
+and each batch is written out before the next is fetched.
+Rows are plain column tuples, not ORM objects, so memory stays constant for any number of devices.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import csv
+import io
+import zipfile
+
+from . import db
+from .auth import multi_auth
+from .bulk import chunk, get_item_id, get_items_from_request
+from .devices import device_report
+from .errors import NotFoundError, UserUnauthorizedError, ValidationError
+from .models import Device
+from .queries import JSON_FIELDS, compile_device_filters, parse_fields, row_to_json
+
+from flask import Blueprint, Response, current_app, request, stream_with_context
+from sqlalchemy import select
+
+
+# --------------------------------------------------------------------------------
+# Blueprint
+# --------------------------------------------------------------------------------
+
+export = Blueprint('export', __name__)
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+EXPORT_MIMETYPES = {
+  'csv': 'text/csv',
+  'ndjson': 'application/x-ndjson',
+}
+
+REPORT_COLUMNS = [getattr(Device, field) for field in JSON_FIELDS]
+
+
+# --------------------------------------------------------------------------------
+# Class: ZipStream
+# --------------------------------------------------------------------------------
+
+class ZipStream:
+  """
+  A write-only file for 'zipfile' that holds written bytes until they are taken.
+  It has no 'seek' or 'tell', so 'zipfile' writes entries without going back to patch headers.
+  """
+
+  def __init__(self):
+    self._chunks = list()
+
+  def write(self, data):
+    self._chunks.append(bytes(data))
+    return len(data)
+
+  def flush(self):
+    pass
+
+  def take(self):
+    data = b''.join(self._chunks)
+    self._chunks.clear()
+    return data
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def query_batches(statement, batch_size):
+  # Core execution skips the ORM, which would fetch every row up front
+  # 'stream_results' keeps rows on the cursor until each batch is fetched
+  connection = db.session.connection().execution_options(stream_results=True, max_row_buffer=batch_size)
+  yield from connection.execute(statement).partitions(batch_size)
+
+
+def check_report_ids(ids, username):
+  # One query per chunk checks existence and ownership together
+  for id_chunk in chunk(ids):
+    owners = dict(db.session.execute(select(Device.id, Device.owner).where(Device.id.in_(id_chunk))).all())
+    if any(id not in owners for id in id_chunk):
+      raise NotFoundError()
+    if any(owners[id] != username for id in id_chunk):
+      raise UserUnauthorizedError()
+
+
+def report_batches(ids, username, batch_size):
+  for id_chunk in chunk(ids):
+    statement = select(*REPORT_COLUMNS) \
+      .where(Device.owner == username, Device.id.in_(id_chunk)) \
+      .order_by(Device.id)
+    yield from query_batches(statement, batch_size)
+
+
+def stream_reports(batches):
+  stream = ZipStream()
+
+  with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+    for rows in batches:
+      for row in rows:
+        archive.writestr(f'{row.id}.txt', device_report(row))
+      yield stream.take()
+
+  # Closing the archive writes its central directory
+  yield stream.take()
+
+
+def reports_response(batches):
+  response = Response(stream_with_context(stream_reports(batches)), mimetype='application/zip')
+  response.headers['Content-Disposition'] = 'attachment; filename=reports.zip'
+  return response
+
+
+def stream_csv(batches, fields):
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  writer.writerow(fields)
+
+  for rows in batches:
+    writer.writerows(rows)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+  yield buffer.getvalue()
+
+
+def stream_ndjson(batches, fields):
+  for rows in batches:
+    yield ''.join(current_app.json.dumps(row_to_json(row, fields)) + '\n' for row in rows)
+
+
+# --------------------------------------------------------------------------------
+# Resources
+# --------------------------------------------------------------------------------
+
+@export.route('/devices/export', methods=['GET'])
+@multi_auth.login_required
+def devices_export_get():
+  """
+  Exports all devices owned by the user as CSV or NDJSON, in ID order.
+  Supports filters and sparse fieldsets ("fields").
+  Requires authentication.
+  """
+
+  username = multi_auth.current_user()
+  export_format = request.args.get('format', 'csv').lower()
+  if export_format not in EXPORT_MIMETYPES:
+    raise ValidationError(f'query parameter format must be one of: {", ".join(EXPORT_MIMETYPES)}')
+
+  max_values = current_app.config['DEVICES_MAX_FILTER_VALUES']
+  filters = compile_device_filters(request.args, max_values)
+  fields = parse_fields(request.args) or JSON_FIELDS
+
+  statement = select(*[getattr(Device, field) for field in fields]) \
+    .where(Device.owner == username, *filters) \
+    .order_by(Device.id)
+  batches = query_batches(statement, current_app.config['DEVICES_STREAM_BATCH_SIZE'])
+
+  stream = stream_csv if export_format == 'csv' else stream_ndjson
+  response = Response(stream_with_context(stream(batches, fields)), mimetype=EXPORT_MIMETYPES[export_format])
+  response.headers['Content-Disposition'] = f'attachment; filename=devices.{export_format}'
+  return response
+
+
+@export.route('/devices/reports', methods=['GET'])
+@multi_auth.login_required
+def devices_reports_get():
+  """
+  Gets a zip archive of text reports for all devices owned by the user.
+  Supports filters.
+  Requires authentication.
+  """
+
+  username = multi_auth.current_user()
+  max_values = current_app.config['DEVICES_MAX_FILTER_VALUES']
+  filters = compile_device_filters(request.args, max_values)
+
+  statement = select(*REPORT_COLUMNS) \
+    .where(Device.owner == username, *filters) \
+    .order_by(Device.id)
+  return reports_response(query_batches(statement, current_app.config['DEVICES_STREAM_BATCH_SIZE']))
+
+
+@export.route('/devices/reports', methods=['POST'])
+@multi_auth.login_required
+def devices_reports_post():
+  """
+  Gets a zip archive of text reports for a list of devices owned by the user.
+  Each item may be a device ID or an object with an "id".
+  Requires authentication.
+  """
+
+  username = multi_auth.current_user()
+  ids = sorted({get_item_id(item) for item in get_items_from_request(request)})
+  check_report_ids(ids, username)
+
+  batch_size = current_app.config['DEVICES_STREAM_BATCH_SIZE']
+  return reports_response(report_batches(ids, username, batch_size))
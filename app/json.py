@@ -0,0 +1,126 @@
+"""
+This module provides JSON providers for the app.
+Flask serializes every JSON response through the app's JSON provider.
+
+OrjsonProvider uses orjson, which is much faster than the standard library's json module.
+Its responses match the default provider's output byte for byte: sorted keys, compact output (indented in debug mode),
+a trailing newline, "\\u" escapes for non-ASCII text, and the same handling for dates, decimals, and other special types.
+Values that orjson cannot write the same way fall back to the standard library:
+1. Non-ASCII text, which orjson writes as UTF-8.
+2. Floats that orjson formats differently, like 1e16 (1e+16) and 0.00001 (1e-05).
+   Those always have an exponent or four zeros after the point, so the output is searched for them.
+3. NaN and Infinity, which orjson writes as null.
+   Payloads whose output contains null are checked for them.
+4. Very large integers, which orjson rejects.
+
+orjson is optional. The JSON_PROVIDER config chooses the provider:
+1. "auto" uses orjson if it is installed, and otherwise Flask's default provider.
+2. "orjson" requires orjson.
+3. "default" always uses Flask's default provider.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import math
+import re
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+# Between them, these match every float that orjson and the standard library write differently.
+# They match some text too, which is harmless. Two searches are much faster than one for either.
+FLOAT_EXPONENT = re.compile(rb'e[-0-9]')
+FLOAT_ZEROS = b'.0000'
+
+
+# --------------------------------------------------------------------------------
+# Private Functions
+# --------------------------------------------------------------------------------
+
+def _has_non_finite_float(obj):
+  if isinstance(obj, float):
+    return not math.isfinite(obj)
+  elif isinstance(obj, dict):
+    return any(_has_non_finite_float(key) or _has_non_finite_float(value) for key, value in obj.items())
+  elif isinstance(obj, (list, tuple)):
+    return any(_has_non_finite_float(item) for item in obj)
+  return False
+
+
+# --------------------------------------------------------------------------------
+# Class: OrjsonProvider
+# --------------------------------------------------------------------------------
+
+class OrjsonProvider(DefaultJSONProvider):
+
+  def _options(self, indent=False):
+    # Let 'default' handle dates and dataclasses the same way as Flask does
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    if self.sort_keys:
+      options |= orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+    if indent:
+      options |= orjson.OPT_INDENT_2
+    return options
+
+
+  def _dump_bytes(self, obj, indent=False):
+    try:
+      data = orjson.dumps(obj, default=self.default, option=self._options(indent))
+    except (orjson.JSONEncodeError, TypeError):
+      # orjson rejects some values the standard library accepts, like very large integers
+      data = None
+    
+    # orjson writes non-ASCII text as UTF-8, but the default provider escapes it
+    if (data is None or not data.isascii() or FLOAT_ZEROS in data or FLOAT_EXPONENT.search(data)
+        or (b'null' in data and _has_non_finite_float(obj))):
+      layout = {'indent': 2} if indent else {'separators': (',', ':')}
+      data = super().dumps(obj, **layout).encode()
+    
+    return data
+
+
+  def dumps(self, obj, **kwargs):
+    # Callers asking for standard library options get the standard library
+    if kwargs:
+      return super().dumps(obj, **kwargs)
+    return self._dump_bytes(obj).decode()
+
+
+  def loads(self, s, **kwargs):
+    if kwargs:
+      return super().loads(s, **kwargs)
+    return orjson.loads(s)
+
+
+  def response(self, *args, **kwargs):
+    obj = self._prepare_response_obj(args, kwargs)
+    indent = self.compact is False or (self.compact is None and self._app.debug)
+    return self._app.response_class(
+      self._dump_bytes(obj, indent) + b'\n',
+      mimetype=self.mimetype)
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def get_json_provider_class(name):
+  if name == 'orjson' and orjson is None:
+    raise RuntimeError('JSON_PROVIDER is "orjson", but orjson is not installed')
+  elif name in ['auto', 'orjson'] and orjson is not None:
+    return OrjsonProvider
+  elif name in ['auto', 'default']:
+    return DefaultJSONProvider
+  else:
+    raise ValueError(f'JSON_PROVIDER "{name}" is not supported')
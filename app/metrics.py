@@ -0,0 +1,208 @@
+"""
+This module provides request timing and hot-path instrumentation.
+Metrics are opt-in: set METRICS_ENABLED to turn them on.
+When enabled, '/status/metrics' reports them in the Prometheus text format.
+
+The following histograms are recorded:
+1. Request latency per endpoint, method, and status code
+2. Time spent verifying credentials, per authentication scheme
+3. Time spent in database queries, per SQL operation (via SQLAlchemy engine events)
+4. Time spent serializing JSON responses
+
+Observations only take a timer read and a short lock, so they are cheap enough for production.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import bisect
+import functools
+import threading
+import time
+
+from . import START_TIME
+from .cache import caches
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# --------------------------------------------------------------------------------
+# Class: Histogram
+# --------------------------------------------------------------------------------
+
+class Histogram:
+
+  def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    self.name = name
+    self.help = help
+    self.labels = labels
+    self.buckets = buckets
+    self._series = dict()
+    self._lock = threading.Lock()
+
+
+  def observe(self, value, *label_values):
+    index = bisect.bisect_left(self.buckets, value)
+    with self._lock:
+      if (series := self._series.get(label_values)) is None:
+        series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+      if index < len(self.buckets):
+        series[0][index] += 1
+      series[1] += value
+      series[2] += 1
+
+
+  def clear(self):
+    with self._lock:
+      self._series.clear()
+
+
+  def render(self):
+    lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+
+    with self._lock:
+      series = sorted((key, [list(counts), total, count]) for key, (counts, total, count) in self._series.items())
+
+    for label_values, (counts, total, count) in series:
+      labels = [f'{name}="{value}"' for name, value in zip(self.labels, label_values)]
+      cumulative = 0
+      for bound, bucket_count in zip(self.buckets, counts):
+        cumulative += bucket_count
+        bucket_labels = format_labels(labels + [f'le="{bound}"'])
+        lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+      bucket_labels = format_labels(labels + ['le="+Inf"'])
+      lines.append(f'{self.name}_bucket{bucket_labels} {count}')
+      lines.append(f'{self.name}_sum{format_labels(labels)} {total:.6f}')
+      lines.append(f'{self.name}_count{format_labels(labels)} {count}')
+
+    return lines
+
+
+# --------------------------------------------------------------------------------
+# Variables
+# --------------------------------------------------------------------------------
+
+enabled = False
+
+request_latency = Histogram(
+  'registry_request_duration_seconds', 'Request latency.', ('endpoint', 'method', 'status'))
+auth_latency = Histogram(
+  'registry_auth_duration_seconds', 'Time spent verifying credentials.', ('scheme',))
+db_latency = Histogram(
+  'registry_db_query_duration_seconds', 'Time spent in database queries.', ('operation',))
+serialization_latency = Histogram(
+  'registry_serialization_duration_seconds', 'Time spent serializing JSON responses.', ('endpoint',))
+
+histograms = [request_latency, auth_latency, db_latency, serialization_latency]
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def format_labels(labels):
+  return '{' + ','.join(labels) + '}' if labels else ''
+
+
+def timed(histogram, *label_values):
+  """Records the decorated function's run time in 'histogram' when metrics are enabled."""
+
+  def decorator(function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+      if not enabled:
+        return function(*args, **kwargs)
+
+      start = time.perf_counter()
+      try:
+        return function(*args, **kwargs)
+      finally:
+        histogram.observe(time.perf_counter() - start, *label_values)
+
+    return wrapper
+  return decorator
+
+
+def render_metrics():
+  lines = list()
+  for histogram in histograms:
+    lines += histogram.render()
+
+  lines += ['# HELP registry_uptime_seconds Time since the app started.', '# TYPE registry_uptime_seconds gauge']
+  lines.append(f'registry_uptime_seconds {time.time() - START_TIME:.3f}')
+
+  for stat, kind in [('hits', 'counter'), ('misses', 'counter'), ('size', 'gauge')]:
+    name = f'registry_cache_{stat}' + ('_total' if kind == 'counter' else '')
+    lines += [f'# HELP {name} Cache {stat}.', f'# TYPE {name} {kind}']
+    for cache_name, cache in caches.items():
+      lines.append(f'{name}{{cache="{cache_name}"}} {cache.stats()[stat]}')
+
+  return '\n'.join(lines) + '\n'
+
+
+# --------------------------------------------------------------------------------
+# Hooks
+# --------------------------------------------------------------------------------
+
+def start_request_timer():
+  g.metrics_start = time.perf_counter()
+
+
+def record_request(response):
+  if (start := g.pop('metrics_start', None)) is not None:
+    endpoint = request.endpoint or 'unmatched'
+    request_latency.observe(time.perf_counter() - start, endpoint, request.method, response.status_code)
+  return response
+
+
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+  conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def record_query(conn, cursor, statement, parameters, context, executemany):
+  start = conn.info['metrics_query_start'].pop()
+  operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'UNKNOWN'
+  db_latency.observe(time.perf_counter() - start, operation)
+
+
+def discard_query_timer(exception_context):
+  # Failed queries never reach 'after_cursor_execute'
+  if exception_context.connection is not None:
+    if starts := exception_context.connection.info.get('metrics_query_start'):
+      starts.pop()
+
+
+def time_json_responses(provider):
+  response = provider.response
+
+  @functools.wraps(response)
+  def timed_response(*args, **kwargs):
+    start = time.perf_counter()
+    result = response(*args, **kwargs)
+    endpoint = (request.endpoint if has_request_context() else None) or 'unmatched'
+    serialization_latency.observe(time.perf_counter() - start, endpoint)
+    return result
+
+  provider.response = timed_response
+
+
+def init_metrics(app, engines):
+  global enabled
+  enabled = True
+
+  app.before_request(start_request_timer)
+  app.after_request(record_request)
+  for engine in engines:
+    event.listen(engine, 'before_cursor_execute', start_query_timer)
+    event.listen(engine, 'after_cursor_execute', record_query)
+    event.listen(engine, 'handle_error', discard_query_timer)
+  time_json_responses(app.json)
@@ -16,6 +16,17 @@ from .errors import ValidationError
 
 class Device(db.Model):
   __tablename__ = 'devices'
+  __table_args__ = (
+    # Every device query is scoped to one owner, so each index leads with 'owner'
+    # 'owner' + 'id' also serves keyset pagination in ID order
+    db.Index('ix_devices_owner_id', 'owner', 'id'),
+    db.Index('ix_devices_owner_name', 'owner', 'name'),
+    db.Index('ix_devices_owner_location', 'owner', 'location'),
+    db.Index('ix_devices_owner_type', 'owner', 'type'),
+    db.Index('ix_devices_owner_model', 'owner', 'model'),
+    db.Index('ix_devices_owner_serial_number', 'owner', 'serial_number'),
+  )
+
   id = db.Column(db.Integer, primary_key=True)
   name = db.Column(db.String(64))
   location = db.Column(db.String(64))
@@ -23,6 +34,10 @@ class Device(db.Model):
   model = db.Column(db.String(64))
   serial_number = db.Column(db.String(16))
   owner = db.Column(db.String(64))
+  version = db.Column(db.Integer, nullable=False, server_default='1')
+
+  # SQLAlchemy increments 'version' on every update and rejects updates to stale rows
+  __mapper_args__ = {'version_id_col': version}
 
   @staticmethod
   def validate_full(json_data):
@@ -67,8 +82,10 @@ class Device(db.Model):
     self.model = json_data['model']
     self.serial_number = json_data['serial_number']
 
-  def patch_from_json(self, json_data):
-    """Patches this Device object's 'name' and 'location' fields from 'json_data'."""
+  @staticmethod
+  def validate_patch(json_data):
+    """Raises a ValidationError if 'json_data' cannot patch a Device object."""
+
     if not json_data:
         raise ValidationError(f'request body is missing all fields')
 
@@ -76,6 +93,10 @@ class Device(db.Model):
     if invalid_keys:
       raise ValidationError(f'request body has invalid fields: {", ".join(invalid_keys)}')
 
+  def patch_from_json(self, json_data):
+    """Patches this Device object's 'name' and 'location' fields from 'json_data'."""
+    Device.validate_patch(json_data)
+
     if 'name' in json_data:
       self.name = json_data['name']
     if 'location' in json_data:
@@ -83,3 +104,46 @@ class Device(db.Model):
 
   def __repr__(self):
     return f'<Device {self.name}>'
+
+
+class OwnerRevision(db.Model):
+  """Counts every change to an owner's devices, so unchanged device lists can be detected cheaply."""
+
+  __tablename__ = 'owner_revisions'
+  owner = db.Column(db.String(64), primary_key=True)
+  revision = db.Column(db.Integer, nullable=False, server_default='0')
+
+  @staticmethod
+  def get(owner):
+    """Gets the current revision number for 'owner'."""
+    revision = db.session.query(OwnerRevision.revision).filter_by(owner=owner).scalar()
+    return revision or 0
+
+  @staticmethod
+  def bump(owner):
+    """Increments the revision number for 'owner' as part of the current transaction."""
+    query = OwnerRevision.query.filter_by(owner=owner)
+    if not query.update({'revision': OwnerRevision.revision + 1}, synchronize_session=False):
+      # The new row is flushed right away, so it can be locked like an updated one (see 'lock')
+      db.session.add(OwnerRevision(owner=owner, revision=1))
+      db.session.flush()
+
+  @staticmethod
+  def lock(owner):
+    """
+    Locks the row for 'owner' until the current transaction ends, so writers for one owner take turns.
+    SQLite has no row locks, but it runs one write transaction at a time anyway.
+    """
+    db.session.query(OwnerRevision.owner).filter_by(owner=owner).with_for_update().scalar()
+
+
+class User(db.Model):
+  """Stores a user's password hash. Usernames are unique and indexed for login lookups."""
+
+  __tablename__ = 'users'
+  id = db.Column(db.Integer, primary_key=True)
+  username = db.Column(db.String(64), nullable=False, unique=True, index=True)
+  password_hash = db.Column(db.String(256), nullable=False)
+
+  def __repr__(self):
+    return f'<User {self.username}>'
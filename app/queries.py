@@ -0,0 +1,182 @@
+"""
+This module compiles device query parameters into SQL filters and column lists.
+Every filter becomes a predicate that an owner-leading index can serve.
+
+The query grammar supports:
+1. "field=value": exact match; a repeated parameter matches any of its values
+2. "field__in=a,b,c": matches any of the comma-separated values
+3. "field__prefix=value": matches values starting with the prefix
+4. "id__gt", "id__gte", "id__lt", and "id__lte": ranges of device IDs
+
+Filters on different parameters must all match.
+On SQLite, prefixes are compiled to ranges ("value" <= field < "valuf") rather than LIKE,
+because SQLite only uses indexes for LIKE under special settings.
+The range is only exact because SQLite compares text by code point (its default BINARY collation).
+Other databases may use collations that order text differently, so they get LIKE "value%".
+Fields, operators, and value lengths are validated against the Device columns,
+and invalid filters raise a ValidationError.
+
+The "fields" parameter (like "fields=id,name") selects a sparse fieldset:
+only the named columns are loaded and serialized.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import sys
+
+from . import db
+from .errors import ValidationError
+from .models import Device
+
+from sqlalchemy import Integer, String, or_
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+FILTER_FIELDS = ['id', 'name', 'location', 'type', 'model', 'serial_number']
+JSON_FIELDS = ['id', 'name', 'location', 'type', 'model', 'serial_number', 'owner']
+
+RANGE_OPERATORS = {
+  'gt': lambda column, value: column > value,
+  'gte': lambda column, value: column >= value,
+  'lt': lambda column, value: column < value,
+  'lte': lambda column, value: column <= value,
+}
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def prefix_upper_bound(prefix):
+  # The smallest string greater than every string starting with 'prefix'
+  # Characters at the maximum code point cannot be incremented, so they are dropped
+  stripped = prefix.rstrip(chr(sys.maxunicode))
+  if not stripped:
+    return None
+  return stripped[:-1] + chr(ord(stripped[-1]) + 1)
+
+
+def prefix_predicate(column, prefix):
+  if db.engine.dialect.name != 'sqlite':
+    return column.startswith(prefix, autoescape=True)
+
+  upper = prefix_upper_bound(prefix)
+  return column >= prefix if upper is None else (column >= prefix) & (column < upper)
+
+
+def parse_value(column, name, value):
+  if isinstance(column.type, Integer):
+    try:
+      return int(value)
+    except ValueError:
+      raise ValidationError(f'query parameter {name} must be an integer')
+
+  if isinstance(column.type, String) and column.type.length and len(value) > column.type.length:
+    raise ValidationError(f'query parameter {name} must be at most {column.type.length} characters')
+  return value
+
+
+def parse_values(column, name, values, max_values):
+  values = [value for value in values if value]
+  if len(values) > max_values:
+    raise ValidationError(f'query parameter {name} has more than {max_values} values')
+  return [parse_value(column, name, value) for value in values]
+
+
+def compile_filter(name, values, max_values):
+  field, _, operator = name.partition('__')
+  if field not in FILTER_FIELDS:
+    raise ValidationError(f'query parameter {name} does not name a device field')
+
+  column = getattr(Device, field)
+
+  if not operator or operator == 'in':
+    if operator == 'in':
+      values = [value for joined in values for value in joined.split(',')]
+    values = parse_values(column, name, values, max_values)
+    if not values:
+      return None
+    return column == values[0] if len(values) == 1 else column.in_(values)
+
+  elif operator == 'prefix':
+    if not isinstance(column.type, String):
+      raise ValidationError(f'query parameter {name} is not supported for a non-text field')
+    predicates = [prefix_predicate(column, prefix) for prefix in parse_values(column, name, values, max_values)]
+    return or_(*predicates) if predicates else None
+
+  elif operator in RANGE_OPERATORS:
+    if not isinstance(column.type, Integer):
+      raise ValidationError(f'query parameter {name} is not supported for a text field')
+    if len(values) > 1:
+      raise ValidationError(f'query parameter {name} must not be repeated')
+    values = parse_values(column, name, values, 1)
+    return RANGE_OPERATORS[operator](column, values[0]) if values else None
+
+  raise ValidationError(f'query parameter {name} has an unknown operator: {operator}')
+
+
+def compile_device_filters(args, max_values):
+  """
+  Compiles the device filters in 'args' (a MultiDict of query parameters) into SQL predicates.
+  Parameters that are not filters, like "limit", are skipped.
+  """
+
+  filters = list()
+  for name in args:
+    if name in FILTER_FIELDS or '__' in name:
+      if (predicate := compile_filter(name, args.getlist(name), max_values)) is not None:
+        filters.append(predicate)
+  return filters
+
+
+def get_int_arg(args, name, minimum=None, maximum=None):
+  value = args.get(name)
+  if value is None:
+    return None
+
+  try:
+    number = int(value)
+  except ValueError:
+    raise ValidationError(f'query parameter {name} must be an integer')
+
+  if minimum is not None and number < minimum:
+    raise ValidationError(f'query parameter {name} must be at least {minimum}')
+  if maximum is not None and number > maximum:
+    raise ValidationError(f'query parameter {name} must be at most {maximum}')
+
+  return number
+
+
+def parse_fields(args):
+  """
+  Parses the "fields" query parameter into a list of device fields, in 'JSON_FIELDS' order.
+  Returns None if all fields are wanted.
+  """
+
+  names = {name.strip() for joined in args.getlist('fields') for name in joined.split(',')}
+  names.discard('')
+  if not names:
+    return None
+
+  if invalid := sorted(names.difference(JSON_FIELDS)):
+    raise ValidationError(f'query parameter fields has invalid fields: {", ".join(invalid)}')
+
+  return [field for field in JSON_FIELDS if field in names]
+
+
+def field_columns(fields):
+  # The ID is always loaded, because pagination and ordering need it
+  columns = [getattr(Device, field) for field in fields]
+  if 'id' not in fields:
+    columns.append(Device.id)
+  return columns
+
+
+def row_to_json(row, fields):
+  # Rows hold the requested fields first, so any extra columns are cut off by 'zip'
+  return dict(zip(fields, row))
@@ -0,0 +1,126 @@
+"""
+This module routes reads to read replicas, so read-heavy traffic does not compete with writes on the primary.
+DB_REPLICA_URLS lists the replicas' database URIs. Each becomes a Flask-SQLAlchemy bind ("replica1", "replica2", ...).
+Without replicas, every query goes to the primary.
+
+GET resources opt in by calling 'replica_router.route' (see 'devices').
+It points the request's session at the next replica in turn,
+and the session then sends its queries there instead of to the primary.
+Writes always go to the primary, since nothing else routes the session, and flushes never use a replica.
+A lookup that misses on a replica can be retried on the primary after 'replica_router.unroute',
+since the row may be too new to have reached the replica.
+
+Replicas lag behind the primary, so a user who just wrote might read the data from before the write.
+To give users read-your-writes consistency, every write pins its owner to the primary
+for DB_REPLICA_PIN_SECONDS (see 'commit_device_changes'). It should exceed the replicas' usual lag.
+Pins are kept in process, like the caches, so with several workers,
+clients should keep their connections (or be routed to workers by user) to read their writes.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import itertools
+
+from .cache import TTLCache, register_cache
+
+from flask_sqlalchemy.session import Session
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+# The key for the replica's bind key in 'Session.info'
+REPLICA_INFO_KEY = 'replica'
+
+# Pins are tiny, so the cache can hold every owner who wrote within the pin window
+PIN_CACHE_SIZE = 100000
+
+
+# --------------------------------------------------------------------------------
+# Caches
+# --------------------------------------------------------------------------------
+
+replica_pins = register_cache('replica_pins', TTLCache(PIN_CACHE_SIZE))
+
+
+# --------------------------------------------------------------------------------
+# Class: RoutingSession
+# --------------------------------------------------------------------------------
+
+class RoutingSession(Session):
+  """A session that sends its queries to a replica, once the router picked one."""
+
+  def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+    key = self.info.get(REPLICA_INFO_KEY)
+    if key is not None and bind is None and not self._flushing:
+      return self._db.engines[key]
+
+    return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+# --------------------------------------------------------------------------------
+# Class: ReplicaRouter
+# --------------------------------------------------------------------------------
+
+class ReplicaRouter:
+  """Picks replicas in turn for reads, unless the owner is pinned to the primary."""
+
+  def __init__(self):
+    self.keys = list()
+    self.pin_seconds = 0
+    self.primary_reads = 0
+    self.replica_reads = 0
+    self._turns = itertools.count()
+
+
+  def configure(self, keys, pin_seconds):
+    self.keys = list(keys)
+    self.pin_seconds = pin_seconds
+    replica_pins.configure(PIN_CACHE_SIZE, pin_seconds)
+
+
+  def pin(self, owner):
+    if self.keys:
+      replica_pins.set(owner, True)
+
+
+  def route(self, session, owner):
+    """Routes the session's reads to a replica and returns its bind key, or None for the primary."""
+
+    if not self.keys or replica_pins.get(owner):
+      self.primary_reads += 1
+      return None
+
+    key = self.keys[next(self._turns) % len(self.keys)]
+    session.info[REPLICA_INFO_KEY] = key
+    self.replica_reads += 1
+    return key
+
+
+  def unroute(self, session):
+    """Sends the session's further reads to the primary. Returns True if they went to a replica."""
+    return session.info.pop(REPLICA_INFO_KEY, None) is not None
+
+
+  def stats(self):
+    return {
+      'replicas': len(self.keys),
+      'pin_seconds': self.pin_seconds,
+      'primary_reads': self.primary_reads,
+      'replica_reads': self.replica_reads
+    }
+
+
+replica_router = ReplicaRouter()
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def init_replicas(app):
+  keys = [key for key in app.config['SQLALCHEMY_BINDS'] if key.startswith('replica')]
+  replica_router.configure(keys, app.config['DB_REPLICA_PIN_SECONDS'])
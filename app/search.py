@@ -0,0 +1,375 @@
+"""
+This module provides a blueprint for searching devices.
+'/devices/search' finds the user's devices whose name, location, model, or serial number
+contains every term in the "q" query parameter, matching case-insensitively anywhere in a value.
+Results are ranked, with name matches ahead of model and serial number matches, then location matches.
+They are paginated with "limit" and "offset", and "next" is the offset of the following page.
+Results support sparse fieldsets ("fields"), like '/devices/'.
+
+Searches are served by one of two indexes (SEARCH_BACKEND):
+1. "fts5" is an SQLite FTS5 table with the trigram tokenizer (SQLite 3.34 or later).
+   Triggers on 'devices' keep it in sync with every write, and BM25 ranks the results.
+   The owner is indexed too, so a query only reads postings for the user's devices.
+2. "trigram" is an in-process trigram index.
+   Each owner's index is built on first use and cached (SEARCH_INDEX_CACHE_SIZE owners).
+   Writes in this process update the cached index in place (see 'commit_device_changes').
+   An index is rebuilt when the owner's revision changed otherwise, like after a write in another process.
+"auto" (the default) picks "trigram".
+FTS5 reads the postings of every owner's devices that match a term, so common terms get slow in large tables
+(hundreds of milliseconds at a million devices), while the trigram index only holds the owner's devices.
+FTS5 suits owners with so many devices that their indexes would take too long to build or too much memory.
+
+Trigrams cannot match terms shorter than three characters, so those are rejected.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import threading
+
+from . import db
+from .auth import multi_auth
+from .cache import TTLCache, register_cache
+from .database import register_schema_extension
+from .devices import register_change_listener
+from .errors import ValidationError
+from .export import query_batches
+from .models import Device, OwnerRevision
+from .queries import JSON_FIELDS, get_int_arg, parse_fields, row_to_json
+
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import select, text
+
+
+# --------------------------------------------------------------------------------
+# Blueprint
+# --------------------------------------------------------------------------------
+
+search = Blueprint('search', __name__)
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+SEARCH_FIELDS = ['name', 'location', 'model', 'serial_number']
+SEARCH_WEIGHTS = [4.0, 1.0, 2.0, 2.0]
+
+DEFAULT_LIMIT = 50
+MAX_TERMS = 8
+MIN_TERM_LENGTH = 3
+
+FTS5_TABLE = 'devices_search'
+FTS5_COLUMNS = ', '.join(SEARCH_FIELDS + ['owner'])
+FTS5_NEW_VALUES = ', '.join(f'new.{field}' for field in SEARCH_FIELDS + ['owner'])
+FTS5_OLD_VALUES = ', '.join(f'old.{field}' for field in SEARCH_FIELDS + ['owner'])
+
+# Deleting from an external-content table takes the old values, so their postings can be removed
+FTS5_TRIGGERS = [
+  f'CREATE TRIGGER IF NOT EXISTS {FTS5_TABLE}_insert AFTER INSERT ON devices BEGIN '
+  f'INSERT INTO {FTS5_TABLE}(rowid, {FTS5_COLUMNS}) VALUES (new.id, {FTS5_NEW_VALUES}); END',
+
+  f'CREATE TRIGGER IF NOT EXISTS {FTS5_TABLE}_delete AFTER DELETE ON devices BEGIN '
+  f'INSERT INTO {FTS5_TABLE}({FTS5_TABLE}, rowid, {FTS5_COLUMNS}) VALUES (\'delete\', old.id, {FTS5_OLD_VALUES}); END',
+
+  f'CREATE TRIGGER IF NOT EXISTS {FTS5_TABLE}_update AFTER UPDATE OF {FTS5_COLUMNS} ON devices BEGIN '
+  f'INSERT INTO {FTS5_TABLE}({FTS5_TABLE}, rowid, {FTS5_COLUMNS}) VALUES (\'delete\', old.id, {FTS5_OLD_VALUES}); '
+  f'INSERT INTO {FTS5_TABLE}(rowid, {FTS5_COLUMNS}) VALUES (new.id, {FTS5_NEW_VALUES}); END',
+]
+
+FTS5_CREATE_TABLE = \
+  f'CREATE VIRTUAL TABLE {FTS5_TABLE} USING fts5({FTS5_COLUMNS}, ' \
+  f'content=\'devices\', content_rowid=\'id\', tokenize=\'trigram\')'
+
+# The owner column weighs nothing, because every result matches it
+FTS5_RANK = f'bm25({FTS5_TABLE}, {", ".join(map(str, SEARCH_WEIGHTS))}, 0.0)'
+
+
+# --------------------------------------------------------------------------------
+# Variables
+# --------------------------------------------------------------------------------
+
+search_index = None
+
+
+# --------------------------------------------------------------------------------
+# Class: FTS5SearchIndex
+# --------------------------------------------------------------------------------
+
+class FTS5SearchIndex:
+  """
+  Searches an SQLite FTS5 table that indexes the 'devices' table's values ("external content").
+  It is a schema extension, so it is created with the other tables.
+  """
+
+  name = 'fts5'
+
+  @staticmethod
+  def supported(engine):
+    if engine.dialect.name != 'sqlite' or engine.dialect.dbapi.sqlite_version_info < (3, 34, 0):
+      return False
+    with engine.connect() as connection:
+      return bool(connection.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+
+
+  def ddl(self, dialect):
+    return [FTS5_CREATE_TABLE] + FTS5_TRIGGERS
+
+
+  def create(self, connection):
+    exists = connection.exec_driver_sql(
+      'SELECT 1 FROM sqlite_master WHERE type = \'table\' AND name = ?', (FTS5_TABLE,)).scalar()
+
+    if not exists:
+      connection.exec_driver_sql(FTS5_CREATE_TABLE)
+      # Index the devices that existed before the table
+      connection.exec_driver_sql(f'INSERT INTO {FTS5_TABLE}({FTS5_TABLE}) VALUES (\'rebuild\')')
+
+    # Triggers are dropped along with the 'devices' table, so they are created separately
+    for trigger in FTS5_TRIGGERS:
+      connection.exec_driver_sql(trigger)
+
+
+  def drop(self, connection):
+    connection.exec_driver_sql(f'DROP TABLE IF EXISTS {FTS5_TABLE}')
+
+
+  def match(self, username, terms):
+    phrases = [f'{{{" ".join(SEARCH_FIELDS)}}} : {quote_phrase(term)}' for term in terms]
+    if len(username) >= MIN_TERM_LENGTH:
+      # Owners are matched exactly by the query, but their postings narrow the candidates first
+      phrases.insert(0, f'owner : {quote_phrase(username)}')
+    return ' AND '.join(phrases)
+
+
+  def statement(self, fields):
+    return text(
+      f'SELECT {", ".join("devices." + field for field in fields)} '
+      f'FROM {FTS5_TABLE} JOIN devices ON devices.id = {FTS5_TABLE}.rowid '
+      f'WHERE {FTS5_TABLE} MATCH :match AND devices.owner = :owner '
+      f'ORDER BY {FTS5_RANK}, devices.id LIMIT :limit OFFSET :offset')
+
+
+  def search(self, username, terms, fields, limit, offset):
+    parameters = {'match': self.match(username, terms), 'owner': username, 'limit': limit, 'offset': offset}
+    return db.session.execute(self.statement(fields), parameters).all()
+
+
+# --------------------------------------------------------------------------------
+# Class: TrigramIndex
+# --------------------------------------------------------------------------------
+
+class TrigramIndex:
+  """
+  Maps every trigram in one owner's device values to the IDs of the devices that contain it.
+  'revision' is the owner's revision when the index was built.
+  """
+
+  def __init__(self, revision):
+    self.revision = revision
+    self.lock = threading.Lock()
+    self._values = dict()
+    self._postings = dict()
+
+
+  def add(self, id, values):
+    values = tuple('' if value is None else str(value).lower() for value in values)
+    self._values[id] = values
+    for value in values:
+      for trigram in trigrams(value):
+        self._postings.setdefault(trigram, set()).add(id)
+
+
+  def remove(self, id):
+    for value in self._values.pop(id, ()):
+      for trigram in trigrams(value):
+        posting = self._postings.get(trigram)
+        if posting is not None:
+          posting.discard(id)
+          if not posting:
+            del self._postings[trigram]
+
+
+  def search(self, terms):
+    """Returns the IDs of devices that contain every term, best matches first."""
+
+    with self.lock:
+      return self._search(terms)
+
+
+  def _search(self, terms):
+    candidates = None
+    for term in terms:
+      # Start from the rarest trigram, so each intersection is as small as possible
+      postings = sorted((self._postings.get(trigram, set()) for trigram in trigrams(term)), key=len)
+      candidates = set(postings[0]) if candidates is None else candidates & postings[0]
+      for posting in postings[1:]:
+        candidates &= posting
+
+    # Sharing all trigrams does not mean containing the term, so every candidate is checked
+    ranked = list()
+    for id in candidates or ():
+      values = self._values[id]
+      matches = [[weight for weight, value in zip(SEARCH_WEIGHTS, values) if term in value] for term in terms]
+      if all(matches):
+        ranked.append((-sum(map(sum, matches)), id))
+
+    return [id for _, id in sorted(ranked)]
+
+
+# --------------------------------------------------------------------------------
+# Class: TrigramSearchIndex
+# --------------------------------------------------------------------------------
+
+class TrigramSearchIndex:
+  """
+  Searches in-process trigram indexes, one per owner.
+  An owner's index is rebuilt when their revision changes, which every write does,
+  unless 'apply_changes' brought it up to date with the write.
+  """
+
+  name = 'trigram'
+
+  def __init__(self, cache):
+    self.cache = cache
+
+
+  def get_index(self, username):
+    revision = OwnerRevision.get(username)
+    index = self.cache.get(username)
+
+    if index is None or index.revision != revision:
+      # The revision is read first, so a write during the build only causes another build
+      index = TrigramIndex(revision)
+      statement = select(Device.id, *[getattr(Device, field) for field in SEARCH_FIELDS]) \
+        .where(Device.owner == username)
+      for rows in query_batches(statement, current_app.config['DEVICES_STREAM_BATCH_SIZE']):
+        for row in rows:
+          index.add(row[0], row[1:])
+      self.cache.set(username, index)
+
+    return index
+
+
+  def apply_changes(self, username, changed, deleted):
+    """Applies a committed write to the owner's cached index, if the index was current before it."""
+
+    index = self.cache.get(username)
+    if index is None:
+      return
+
+    # A write in another process in between would leave the index a revision behind, so it is rebuilt instead
+    revision = OwnerRevision.get(username)
+    statement = select(Device.id, *[getattr(Device, field) for field in SEARCH_FIELDS]) \
+      .where(Device.owner == username, Device.id.in_(changed))
+    rows = db.session.execute(statement).all() if changed else []
+
+    with index.lock:
+      if index.revision != revision - 1:
+        return
+      for id in [*changed, *deleted]:
+        index.remove(id)
+      for row in rows:
+        index.add(row[0], row[1:])
+      index.revision = revision
+
+
+  def search(self, username, terms, fields, limit, offset):
+    ids = self.get_index(username).search(terms)[offset:offset + limit]
+    if not ids:
+      return []
+
+    statement = select(*[getattr(Device, field) for field in fields], Device.id) \
+      .where(Device.owner == username, Device.id.in_(ids))
+    rows = {row.id: row for row in db.session.execute(statement)}
+    return [rows[id] for id in ids if id in rows]
+
+
+# --------------------------------------------------------------------------------
+# Caches
+# --------------------------------------------------------------------------------
+
+index_cache = register_cache('search_indexes', TTLCache())
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def trigrams(value):
+  return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def quote_phrase(term):
+  # An FTS5 string escapes double quotes by doubling them
+  return '"' + term.replace('"', '""') + '"'
+
+
+def parse_terms(args):
+  query = args.get('q', '')
+  terms = list(dict.fromkeys(query.lower().split()))
+
+  if not terms:
+    raise ValidationError('query parameter q is required')
+  if len(terms) > MAX_TERMS:
+    raise ValidationError(f'query parameter q must have at most {MAX_TERMS} terms')
+  if any(len(term) < MIN_TERM_LENGTH for term in terms):
+    raise ValidationError(f'query parameter q must have terms of at least {MIN_TERM_LENGTH} characters')
+
+  return terms
+
+
+@register_change_listener
+def apply_device_changes(username, changed, deleted):
+  # Triggers keep the FTS5 table in sync, so only the trigram index needs the changes
+  if isinstance(search_index, TrigramSearchIndex):
+    search_index.apply_changes(username, changed, deleted)
+
+
+def init_search(app, engine):
+  """Chooses the search index for SEARCH_BACKEND. It must run before the schema is checked."""
+
+  global search_index
+
+  backend = app.config['SEARCH_BACKEND']
+  if backend == 'auto':
+    backend = 'trigram'
+
+  if backend == 'fts5':
+    if not FTS5SearchIndex.supported(engine):
+      raise RuntimeError('SEARCH_BACKEND is "fts5", but the database does not support FTS5')
+    search_index = register_schema_extension('search', FTS5SearchIndex())
+  elif backend == 'trigram':
+    index_cache.configure(app.config['SEARCH_INDEX_CACHE_SIZE'], app.config['SEARCH_INDEX_CACHE_TTL'])
+    search_index = TrigramSearchIndex(index_cache)
+  else:
+    raise ValueError(f'SEARCH_BACKEND must be auto, fts5, or trigram, not {backend}')
+
+
+# --------------------------------------------------------------------------------
+# Resources
+# --------------------------------------------------------------------------------
+
+@search.route('/devices/search', methods=['GET'])
+@multi_auth.login_required
+def devices_search_get():
+  """
+  Searches the devices owned by the user for the terms in "q", best matches first.
+  Supports sparse fieldsets ("fields") and pagination ("limit" and "offset").
+  Requires authentication.
+  """
+
+  username = multi_auth.current_user()
+  terms = parse_terms(request.args)
+  fields = parse_fields(request.args) or JSON_FIELDS
+
+  max_limit = current_app.config['DEVICES_MAX_PAGE_LIMIT']
+  limit = get_int_arg(request.args, 'limit', minimum=1, maximum=max_limit) or DEFAULT_LIMIT
+  offset = get_int_arg(request.args, 'offset', minimum=0) or 0
+
+  # Fetch one extra row to learn if another page follows
+  rows = search_index.search(username, terms, fields, limit + 1, offset)
+  next_offset = offset + limit if len(rows) > limit else None
+
+  return jsonify({'devices': [row_to_json(row, fields) for row in rows[:limit]], 'next': next_offset})
@@ -0,0 +1,212 @@
+"""
+This module provides a blueprint for device statistics.
+'/devices/stats' counts the user's devices, grouped by any of type, location, and model ("group_by").
+Groups are ordered by count, largest first, and the response also has the total count.
+Stats support the same filters as '/devices/' (see 'queries').
+Like device lists, stats carry an ETag from the owner's revision for conditional requests.
+
+Counts come from one of two sources (STATS_BACKEND):
+1. "counters" reads the 'device_counts' table, which holds one count per owner, type, location, and model.
+   Triggers on 'devices' keep the counts up to date with every write (SQLite only).
+   Unfiltered stats then read one row per group instead of one row per device.
+   Filtered stats still aggregate the devices, since the counts cannot apply arbitrary filters.
+2. "query" always aggregates the devices with "GROUP BY", using the owner indexes.
+"auto" (the default) picks "counters" for SQLite databases, or else "query".
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+from . import db
+from .auth import multi_auth
+from .database import register_schema_extension
+from .devices import devices_etag, not_modified
+from .errors import ValidationError
+from .models import Device
+from .queries import compile_device_filters
+
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import Column, Index, Integer, MetaData, String, Table, func, inspect, select
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+
+# --------------------------------------------------------------------------------
+# Blueprint
+# --------------------------------------------------------------------------------
+
+stats = Blueprint('stats', __name__)
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+GROUP_FIELDS = ['type', 'location', 'model']
+COUNT_KEYS = ['owner'] + GROUP_FIELDS
+
+
+# --------------------------------------------------------------------------------
+# Tables
+# --------------------------------------------------------------------------------
+
+# The counts table belongs to the extension, not the models, because only its triggers keep it correct
+stats_metadata = MetaData()
+
+device_counts = Table(
+  'device_counts', stats_metadata,
+  Column('owner', String(64)),
+  Column('type', String(64)),
+  Column('location', String(64)),
+  Column('model', String(64)),
+  Column('count', Integer, nullable=False),
+  Index('ix_device_counts_owner', *COUNT_KEYS))
+
+
+# --------------------------------------------------------------------------------
+# Variables
+# --------------------------------------------------------------------------------
+
+counters_enabled = False
+
+
+# --------------------------------------------------------------------------------
+# Class: DeviceCountsExtension
+# --------------------------------------------------------------------------------
+
+class DeviceCountsExtension:
+  """
+  Creates the 'device_counts' table and the triggers that maintain it.
+  Keys may be NULL, so rows are matched with "IS" instead of a unique constraint and an upsert.
+  """
+
+  @staticmethod
+  def match(prefix):
+    return ' AND '.join(f'{key} IS {prefix}.{key}' for key in COUNT_KEYS)
+
+
+  @staticmethod
+  def increment(prefix):
+    return (
+      f'UPDATE device_counts SET count = count + 1 WHERE {DeviceCountsExtension.match(prefix)}; '
+      f'INSERT INTO device_counts ({", ".join(COUNT_KEYS)}, count) '
+      f'SELECT {", ".join(f"{prefix}.{key}" for key in COUNT_KEYS)}, 1 '
+      f'WHERE NOT EXISTS (SELECT 1 FROM device_counts WHERE {DeviceCountsExtension.match(prefix)});')
+
+
+  @staticmethod
+  def decrement(prefix):
+    return (
+      f'UPDATE device_counts SET count = count - 1 WHERE {DeviceCountsExtension.match(prefix)}; '
+      f'DELETE FROM device_counts WHERE {DeviceCountsExtension.match(prefix)} AND count <= 0;')
+
+
+  def triggers(self):
+    changed = ' OR '.join(f'old.{key} IS NOT new.{key}' for key in COUNT_KEYS)
+    return [
+      f'CREATE TRIGGER IF NOT EXISTS device_counts_insert AFTER INSERT ON devices '
+      f'BEGIN {self.increment("new")} END',
+
+      f'CREATE TRIGGER IF NOT EXISTS device_counts_delete AFTER DELETE ON devices '
+      f'BEGIN {self.decrement("old")} END',
+
+      f'CREATE TRIGGER IF NOT EXISTS device_counts_update AFTER UPDATE OF {", ".join(COUNT_KEYS)} ON devices '
+      f'WHEN {changed} BEGIN {self.decrement("old")} {self.increment("new")} END',
+    ]
+
+
+  def ddl(self, dialect):
+    tables = [str(CreateTable(device_counts).compile(dialect=dialect))]
+    indexes = [str(CreateIndex(index).compile(dialect=dialect)) for index in device_counts.indexes]
+    return tables + indexes + self.triggers()
+
+
+  def create(self, connection):
+    if not inspect(connection).has_table('device_counts'):
+      stats_metadata.create_all(connection)
+      # Count the devices that existed before the table
+      keys = [getattr(Device, key) for key in COUNT_KEYS]
+      connection.execute(device_counts.insert().from_select(
+        COUNT_KEYS + ['count'], select(*keys, func.count()).group_by(*keys)))
+
+    # Triggers are dropped along with the 'devices' table, so they are created separately
+    for trigger in self.triggers():
+      connection.exec_driver_sql(trigger)
+
+
+  def drop(self, connection):
+    stats_metadata.drop_all(connection)
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def parse_group_by(args):
+  value = args.get('group_by', 'type')
+  fields = [field.strip() for field in value.split(',') if field.strip()]
+
+  invalid_fields = [field for field in fields if field not in GROUP_FIELDS]
+  if not fields or invalid_fields:
+    raise ValidationError(f'query parameter group_by must list fields from: {", ".join(GROUP_FIELDS)}')
+
+  return [field for field in GROUP_FIELDS if field in fields]
+
+
+def count_devices(username, group_by, filters):
+  if counters_enabled and not filters:
+    keys = [device_counts.c[field] for field in group_by]
+    statement = select(*keys, func.sum(device_counts.c.count)).where(device_counts.c.owner == username)
+  else:
+    keys = [getattr(Device, field) for field in group_by]
+    statement = select(*keys, func.count()).where(Device.owner == username, *filters)
+
+  return db.session.execute(statement.group_by(*keys)).all()
+
+
+def init_stats(app, engine):
+  """Chooses the stats source for STATS_BACKEND. It must run before the schema is checked."""
+
+  global counters_enabled
+
+  backend = app.config['STATS_BACKEND']
+  if backend == 'auto':
+    backend = 'counters' if engine.dialect.name == 'sqlite' else 'query'
+
+  if backend not in ['counters', 'query']:
+    raise ValueError(f'STATS_BACKEND must be auto, counters, or query, not {backend}')
+
+  counters_enabled = backend == 'counters'
+  if counters_enabled:
+    register_schema_extension('stats', DeviceCountsExtension())
+
+
+# --------------------------------------------------------------------------------
+# Resources
+# --------------------------------------------------------------------------------
+
+@stats.route('/devices/stats', methods=['GET'])
+@multi_auth.login_required
+def devices_stats_get():
+  """
+  Counts the devices owned by the user, grouped by the fields in "group_by" (by default, "type").
+  Supports filters.
+  Requires authentication.
+  """
+
+  username = multi_auth.current_user()
+  group_by = parse_group_by(request.args)
+  max_values = current_app.config['DEVICES_MAX_FILTER_VALUES']
+  filters = compile_device_filters(request.args, max_values)
+
+  etag = devices_etag(username, request.args)
+  if request.if_none_match.contains_weak(etag):
+    return not_modified(etag)
+
+  rows = count_devices(username, group_by, filters)
+  groups = [{**dict(zip(group_by, row)), 'count': row[-1]} for row in rows]
+  groups.sort(key=lambda group: (-group['count'], [str(group[field]) for field in group_by]))
+
+  response = jsonify({'total': sum(group['count'] for group in groups), 'groups': groups})
+  response.set_etag(etag)
+  return response
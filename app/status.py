@@ -1,5 +1,6 @@
 """
 This module provides a blueprint for status-related resources.
+When metrics are enabled, '/status/metrics' reports them in the Prometheus text format.
 """
 
 # --------------------------------------------------------------------------------
@@ -9,7 +10,12 @@ This module provides a blueprint for status-related resources.
 import time
 
 from . import START_TIME
-from flask import Blueprint, jsonify, redirect
+from .cache import caches
+from .errors import NotFoundError
+from .events import event_hub
+from .metrics import render_metrics
+from .replicas import replica_router
+from flask import Blueprint, Response, current_app, jsonify, redirect
 
 
 # --------------------------------------------------------------------------------
@@ -36,10 +42,28 @@ def index():
 def status_get():
   """
   Provides uptime information about the web service.
+  Also provides hit rates for the in-process caches, event stream subscriber counts,
+  and how many reads went to the primary and to read replicas.
   """
   
   response = {
     'online': True,
-    'uptime': round(time.time() - START_TIME, 3)
+    'uptime': round(time.time() - START_TIME, 3),
+    'caches': {name: cache.stats() for name, cache in caches.items()},
+    'events': event_hub.stats(),
+    'replicas': replica_router.stats()
   }
-  return jsonify(response)
\ No newline at end of file
+  return jsonify(response)
+
+
+@status.route('/status/metrics', methods=['GET'])
+def status_metrics_get():
+  """
+  Provides request, authentication, database, and serialization timings.
+  Yields "404 Not Found" unless METRICS_ENABLED is set.
+  """
+
+  if not current_app.config['METRICS_ENABLED']:
+    raise NotFoundError()
+
+  return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
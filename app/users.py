@@ -0,0 +1,126 @@
+"""
+This module provides the user store for authentication.
+Users and their password hashes live in the database ('User' model).
+A cache (AUTH_USER_CACHE_SIZE and AUTH_USER_CACHE_TTL) keeps recent password hashes in memory,
+so most logins never query the database. Unknown usernames are cached too, but only briefly (UNKNOWN_USER_TTL),
+so users added by "flask add-user" can log in right away.
+A password changed by "flask add-user" reaches running workers once their cached hash expires (AUTH_USER_CACHE_TTL).
+The cache is warmed at startup with one query, which needs no hashing.
+It is skipped if the 'users' table does not exist yet.
+
+The users from the config (AUTH_USERNAME1 and AUTH_USERNAME2) are added to the database lazily:
+each one is hashed and stored the first time someone tries to log in as that user.
+So, startup time does not depend on password hashing.
+
+New hashes use AUTH_PASSWORD_HASH_METHOD.
+When that method changes, existing hashes are not touched until their users log in:
+after a successful login, an outdated hash is replaced with a new one for the same password.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+from . import db
+from .cache import TTLCache, register_cache
+from .models import User
+
+from flask import current_app
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+# The time in seconds that an unknown username stays cached
+UNKNOWN_USER_TTL = 5
+
+
+# --------------------------------------------------------------------------------
+# Caches
+# --------------------------------------------------------------------------------
+
+# Unknown users are cached as '', because a missing entry means "not looked up yet"
+user_cache = register_cache('users', TTLCache())
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def hash_password(password):
+  return generate_password_hash(password, method=current_app.config['AUTH_PASSWORD_HASH_METHOD'])
+
+
+def hash_method(method):
+  # Hashes record their full method, like "pbkdf2:sha256:260000", even if the iterations were left out
+  if method.startswith('pbkdf2:') and method.count(':') == 1:
+    return f'{method}:{DEFAULT_PBKDF2_ITERATIONS}'
+  return method
+
+
+def needs_rehash(password_hash):
+  method = hash_method(current_app.config['AUTH_PASSWORD_HASH_METHOD'])
+  return password_hash.split('$', 1)[0] != method
+
+
+def config_users():
+  config = current_app.config
+  return {config['AUTH_USERNAME1']: config['AUTH_PASSWORD1'], config['AUTH_USERNAME2']: config['AUTH_PASSWORD2']}
+
+
+def warm_user_cache():
+  """Loads password hashes into the cache, up to its size, with one query."""
+
+  # A database from before the user store has no users to load
+  if not inspect(db.engine).has_table(User.__tablename__):
+    return
+
+  rows = db.session.query(User.username, User.password_hash).limit(user_cache.maxsize)
+  for username, password_hash in rows:
+    user_cache.set(username, password_hash)
+
+
+def add_user(username, password):
+  """Adds a user, or changes an existing user's password, and returns the new password hash."""
+
+  password_hash = hash_password(password)
+  if not db.session.query(User).filter_by(username=username).update({'password_hash': password_hash}):
+    db.session.add(User(username=username, password_hash=password_hash))
+
+  try:
+    db.session.commit()
+  except IntegrityError:
+    # Another request added the same user first
+    db.session.rollback()
+    return get_password_hash(username, cached=False)
+
+  user_cache.set(username, password_hash)
+  return password_hash
+
+
+def get_password_hash(username, cached=True):
+  """Gets the user's password hash, or None for an unknown user."""
+
+  if cached and (password_hash := user_cache.get(username)) is not None:
+    return password_hash or None
+
+  password_hash = db.session.query(User.password_hash).filter_by(username=username).scalar()
+  if password_hash is None and (password := config_users().get(username)) is not None:
+    return add_user(username, password)
+
+  if password_hash:
+    user_cache.set(username, password_hash)
+  else:
+    user_cache.set(username, '', ttl=min(UNKNOWN_USER_TTL, user_cache.ttl))
+  return password_hash
+
+
+def rehash_if_needed(username, password_hash, password):
+  """Replaces an outdated password hash after 'password' was verified against it."""
+
+  if needs_rehash(password_hash):
+    add_user(username, password)
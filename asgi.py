@@ -0,0 +1,34 @@
+"""
+This module is the ASGI entry point for running this Flask app.
+It serves the same app as "registry.py" (same config, blueprints, and database),
+so both serving modes behave the same.
+
+To run this app with an ASGI server like uvicorn:
+1. Run "pip install a2wsgi uvicorn".
+2. Run "uvicorn asgi:app".
+
+Change the target config by setting the "FLASK_CONFIG" environment variable, as for "flask run".
+The server's event loop accepts connections and reads request bodies,
+while requests run in a fixed pool of worker threads (ASGI_THREADS).
+So, many idle or slow clients cost one connection each, not one thread each.
+The handlers and the database engine stay synchronous, so no async database driver is needed.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+from a2wsgi import WSGIMiddleware
+
+from app import start_app
+from registry import app as flask_app
+
+
+# --------------------------------------------------------------------------------
+# App Creation
+# --------------------------------------------------------------------------------
+
+# Start now, so a server with an outdated schema fails at boot instead of on its first request
+start_app(flask_app)
+
+app = WSGIMiddleware(flask_app, workers=flask_app.config['ASGI_THREADS'])
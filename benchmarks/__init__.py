@@ -0,0 +1,6 @@
+"""
+This package contains benchmarks for the Device Registry Service.
+Each module is a script meant to be run from the project root, like this:
+
+  python -m benchmarks.<module> --help
+"""
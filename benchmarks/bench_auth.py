@@ -0,0 +1,60 @@
+"""
+This module benchmarks Basic auth throughput with and without the credential cache.
+It sends authenticated requests to '/authenticate/' through Flask's test client,
+so the numbers measure the app itself rather than the network or a web server.
+
+To run it from the project root:
+
+  python -m benchmarks.bench_auth --requests 200
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import argparse
+import time
+
+from app import create_app
+from app.auth import credential_cache
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def measure(client, auth, count):
+  start = time.perf_counter()
+  for _ in range(count):
+    response = client.get('/authenticate/', auth=auth)
+    assert response.status_code == 200
+  return count / (time.perf_counter() - start)
+
+
+# --------------------------------------------------------------------------------
+# Main
+# --------------------------------------------------------------------------------
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark Basic auth with and without the credential cache.')
+  parser.add_argument('--requests', type=int, default=200)
+  args = parser.parse_args()
+
+  app = create_app('testing')
+  client = app.test_client()
+  auth = (app.config['AUTH_USERNAME1'], app.config['AUTH_PASSWORD1'])
+
+  credential_cache.configure(0, 0)
+  uncached = measure(client, auth, args.requests)
+
+  credential_cache.configure(app.config['AUTH_CACHE_SIZE'], app.config['AUTH_CACHE_TTL'])
+  cached = measure(client, auth, args.requests)
+
+  print(f'{"mode":<10}{"requests/s":>14}')
+  print(f'{"uncached":<10}{uncached:>14.1f}')
+  print(f'{"cached":<10}{cached:>14.1f}')
+  print(f'speedup: {cached / uncached:.1f}x')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,70 @@
+"""
+This module benchmarks response compression for device lists.
+It compresses device list bodies of typical sizes with every available encoding
+(gzip, plus brotli and zstd if installed), using the same compressors as the app.
+For each size and encoding, it reports the CPU time per response against the bytes saved.
+
+To run it from the project root:
+
+  python -m benchmarks.bench_compression --sizes 1 10 100 1000 10000
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import argparse
+import json
+import time
+
+from app.compression import COMPRESSORS, compress
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def build_body(size):
+  devices = [
+    {
+      'id': i,
+      'location': ['Living Room', 'Kitchen', 'Garage', 'Office'][i % 4],
+      'model': f'ThermoBest {i % 7}G',
+      'name': f'Device {i}',
+      'owner': 'pythonista',
+      'serial_number': f'TB3G-{i:05d}',
+      'type': ['Thermostat', 'Light Switch', 'Refrigerator'][i % 3]
+    }
+    for i in range(size)]
+  return (json.dumps({'devices': devices}, separators=(',', ':'), sort_keys=True) + '\n').encode()
+
+
+def measure(body, encoding, repeat):
+  start = time.perf_counter()
+  for _ in range(repeat):
+    compressed = compress(body, encoding)
+  return (time.perf_counter() - start) / repeat * 1000, len(compressed)
+
+
+# --------------------------------------------------------------------------------
+# Main
+# --------------------------------------------------------------------------------
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark the CPU cost and savings of response compression.')
+  parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+  parser.add_argument('--repeat', type=int, default=50)
+  args = parser.parse_args()
+
+  print(f'{"devices":>8}{"encoding":>10}{"bytes":>10}{"compressed":>12}{"saved":>8}{"ms":>10}{"KB saved/ms":>13}')
+  for size in args.sizes:
+    body = build_body(size)
+    for encoding in COMPRESSORS:
+      elapsed, compressed_size = measure(body, encoding, args.repeat)
+      saved = len(body) - compressed_size
+      print(f'{size:>8}{encoding:>10}{len(body):>10}{compressed_size:>12}{saved / len(body):>8.0%}'
+            f'{elapsed:>10.3f}{saved / 1024 / elapsed:>13.1f}')
+
+
+if __name__ == '__main__':
+  main()
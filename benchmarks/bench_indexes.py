@@ -0,0 +1,125 @@
+"""
+This module benchmarks device list queries with and without the Device indexes.
+For each table size, it fills a temporary SQLite database with devices spread across many owners.
+Then, it times the queries used by '/devices/' before and after creating the indexes.
+
+To run it from the project root:
+
+  python -m benchmarks.bench_indexes --sizes 10000 100000 1000000
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from app.models import Device
+
+from sqlalchemy import create_engine, insert, select, text
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+DEVICES_PER_OWNER = 1000
+INSERT_CHUNK_SIZE = 10000
+TYPES = ['Light Switch', 'Thermostat', 'Refrigerator', 'Router', 'Speaker', 'Camera', 'Doorbell', 'Lock']
+LOCATIONS = ['Kitchen', 'Living Room', 'Front Porch', 'Garage', 'Office', 'Basement', 'Attic', 'Bedroom']
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def build_rows(size):
+  for i in range(size):
+    yield {
+      'name': f'Device {i}',
+      'location': LOCATIONS[i % len(LOCATIONS)],
+      'type': TYPES[i % len(TYPES)],
+      'model': f'Model {i % 50}',
+      'serial_number': f'SN-{i:010d}',
+      'owner': f'owner{i // DEVICES_PER_OWNER}'
+    }
+
+
+def fill_table(engine, size):
+  table = Device.__table__
+  table.create(engine)
+  for index in table.indexes:
+    index.drop(engine)
+
+  rows = build_rows(size)
+  with engine.begin() as connection:
+    while chunk := [row for _, row in zip(range(INSERT_CHUNK_SIZE), rows)]:
+      connection.execute(insert(table), chunk)
+
+
+def build_queries(size):
+  owner = f'owner{(size - 1) // DEVICES_PER_OWNER // 2}'
+  return {
+    'owner': select(Device.__table__).where(Device.owner == owner),
+    'owner+type': select(Device.__table__).where(Device.owner == owner, Device.type == TYPES[3]),
+    'owner+serial': select(Device.__table__).where(Device.owner == owner, Device.serial_number == 'SN-0000000042'),
+    'owner page': select(Device.__table__).where(Device.owner == owner).order_by(Device.id).limit(100),
+  }
+
+
+def time_queries(engine, queries, repeat):
+  results = dict()
+  with engine.connect() as connection:
+    for name, query in queries.items():
+      timings = list()
+      for _ in range(repeat):
+        start = time.perf_counter()
+        connection.execute(query).fetchall()
+        timings.append(time.perf_counter() - start)
+      results[name] = statistics.median(timings) * 1000
+  return results
+
+
+def run(size, repeat):
+  with tempfile.TemporaryDirectory() as tempdir:
+    engine = create_engine('sqlite:///' + os.path.join(tempdir, 'bench.sqlite'))
+    fill_table(engine, size)
+    queries = build_queries(size)
+
+    without = time_queries(engine, queries, repeat)
+
+    for index in Device.__table__.indexes:
+      index.create(engine)
+    with engine.begin() as connection:
+      connection.execute(text('ANALYZE'))
+    
+    with_indexes = time_queries(engine, queries, repeat)
+    engine.dispose()
+
+  return without, with_indexes
+
+
+# --------------------------------------------------------------------------------
+# Main
+# --------------------------------------------------------------------------------
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark device queries with and without indexes.')
+  parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+  parser.add_argument('--repeat', type=int, default=20)
+  args = parser.parse_args()
+
+  print(f'{"rows":>10}  {"query":<14}{"no index (ms)":>16}{"indexed (ms)":>16}{"speedup":>10}')
+  for size in args.sizes:
+    without, with_indexes = run(size, args.repeat)
+    for name in without:
+      speedup = without[name] / with_indexes[name]
+      print(f'{size:>10}  {name:<14}{without[name]:>16.3f}{with_indexes[name]:>16.3f}{speedup:>9.1f}x')
+
+
+if __name__ == '__main__':
+  main()
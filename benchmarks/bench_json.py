@@ -0,0 +1,74 @@
+"""
+This module benchmarks JSON serialization of device lists.
+It builds device list responses the same way as '/devices/',
+using Flask's default JSON provider and the orjson provider (if orjson is installed).
+
+To run it from the project root:
+
+  python -m benchmarks.bench_json --sizes 1 100 1000 10000
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import argparse
+import time
+
+from app import create_app
+from app.json import OrjsonProvider, orjson
+from app.models import Device
+
+from flask.json.provider import DefaultJSONProvider
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def build_payload(size):
+  devices = [
+    Device(
+      id=i,
+      name=f'Device {i}',
+      location='Living Room',
+      type='Thermostat',
+      model='ThermoBest 3G',
+      serial_number=f'TB3G-{i:05d}',
+      owner='pythonista')
+    for i in range(size)]
+  return {'devices': [device.to_json() for device in devices]}
+
+
+def measure(provider, payload, repeat):
+  start = time.perf_counter()
+  for _ in range(repeat):
+    provider.response(payload).get_data()
+  return (time.perf_counter() - start) / repeat * 1000
+
+
+# --------------------------------------------------------------------------------
+# Main
+# --------------------------------------------------------------------------------
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark JSON serialization of device lists.')
+  parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 1000, 10000])
+  parser.add_argument('--repeat', type=int, default=50)
+  args = parser.parse_args()
+
+  app = create_app('testing')
+  providers = {'default': DefaultJSONProvider(app)}
+  if orjson:
+    providers['orjson'] = OrjsonProvider(app)
+
+  print(f'{"devices":>10}' + ''.join(f'{name + " (ms)":>16}' for name in providers))
+  with app.app_context():
+    for size in args.sizes:
+      payload = build_payload(size)
+      timings = [measure(provider, payload, args.repeat) for provider in providers.values()]
+      print(f'{size:>10}' + ''.join(f'{timing:>16.3f}' for timing in timings))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,116 @@
+"""
+This module benchmarks '/devices/search' queries with both search indexes.
+For each table size, it fills a temporary SQLite database with devices spread across many owners,
+with the FTS5 table and its triggers in place, as the app creates them.
+Then, it times searches for one owner with the FTS5 table, with an in-process trigram index,
+and with a plain "LIKE" scan of the owner's devices for comparison.
+
+To run it from the project root:
+
+  python -m benchmarks.bench_search --sizes 10000 100000 1000000
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from app.models import Device
+from app.search import SEARCH_FIELDS, FTS5SearchIndex, TrigramIndex
+from benchmarks.bench_indexes import build_rows, DEVICES_PER_OWNER, INSERT_CHUNK_SIZE
+
+from sqlalchemy import and_, create_engine, insert, or_, select
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+SEARCHES = ['kitchen', 'device 123', 'sn-0000', 'model kitchen', 'nothing']
+LIMIT = 50
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def fill_tables(engine, index, size):
+  Device.__table__.create(engine)
+  with engine.begin() as connection:
+    index.create(connection)
+    rows = build_rows(size)
+    while chunk := [row for _, row in zip(range(INSERT_CHUNK_SIZE), rows)]:
+      connection.execute(insert(Device.__table__), chunk)
+
+
+def like_statement(owner, terms):
+  columns = [getattr(Device, field) for field in SEARCH_FIELDS]
+  matches = [or_(*[column.ilike(f'%{term}%') for column in columns]) for term in terms]
+  return select(Device.__table__).where(Device.owner == owner, and_(*matches)).order_by(Device.id).limit(LIMIT)
+
+
+def median_ms(function, repeat):
+  timings = list()
+  for _ in range(repeat):
+    start = time.perf_counter()
+    function()
+    timings.append(time.perf_counter() - start)
+  return statistics.median(timings) * 1000
+
+
+def run(size, repeat):
+  index = FTS5SearchIndex()
+  owner = f'owner{(size - 1) // DEVICES_PER_OWNER // 2}'
+  fields = ['id', 'name', 'location', 'type', 'model', 'serial_number', 'owner']
+  results = dict()
+
+  with tempfile.TemporaryDirectory() as tempdir:
+    engine = create_engine('sqlite:///' + os.path.join(tempdir, 'bench.sqlite'))
+    fill_tables(engine, index, size)
+
+    with engine.connect() as connection:
+      start = time.perf_counter()
+      trigram_index = TrigramIndex(1)
+      columns = [Device.id] + [getattr(Device, field) for field in SEARCH_FIELDS]
+      for row in connection.execute(select(*columns).where(Device.owner == owner)):
+        trigram_index.add(row[0], row[1:])
+      build_ms = (time.perf_counter() - start) * 1000
+
+      for search in SEARCHES:
+        terms = search.split()
+        parameters = {'match': index.match(owner, terms), 'owner': owner, 'limit': LIMIT, 'offset': 0}
+        results[search] = (
+          median_ms(lambda: connection.execute(index.statement(fields), parameters).all(), repeat),
+          median_ms(lambda: trigram_index.search(terms)[:LIMIT], repeat),
+          median_ms(lambda: connection.execute(like_statement(owner, terms)).all(), repeat))
+
+    engine.dispose()
+
+  return build_ms, results
+
+
+# --------------------------------------------------------------------------------
+# Main
+# --------------------------------------------------------------------------------
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark device searches with each search index.')
+  parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+  parser.add_argument('--repeat', type=int, default=20)
+  args = parser.parse_args()
+
+  print(f'{"rows":>10}  {"search":<12}{"fts5 (ms)":>12}{"trigram (ms)":>14}{"like (ms)":>12}')
+  for size in args.sizes:
+    build_ms, results = run(size, args.repeat)
+    for search, (fts5, trigram, like) in results.items():
+      print(f'{size:>10}  {search:<12}{fts5:>12.3f}{trigram:>14.3f}{like:>12.3f}')
+    print(f'{size:>10}  trigram index built per owner in {build_ms:.1f} ms')
+
+
+if __name__ == '__main__':
+  main()
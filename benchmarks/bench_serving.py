@@ -0,0 +1,119 @@
+"""
+This module benchmarks the two serving modes: WSGI ("flask run") and ASGI ("uvicorn asgi:app").
+Each mode runs as a server process with its own SQLite database file,
+and the load harness from 'benchmarks.load' drives it at increasing concurrency.
+Results include throughput, p95 latency, and errors, plus the server's peak resident memory,
+so modes can be compared by throughput per megabyte as well as raw throughput.
+
+Memory is read from '/proc', so this benchmark runs on Linux only.
+ASGI mode needs a2wsgi and uvicorn ("pip install a2wsgi uvicorn").
+
+To run it from the project root:
+
+  python -m benchmarks.bench_serving --workload mixed --concurrency 8 32 64 --seconds 10
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from benchmarks.load import Target, WORKLOADS, load_users, run_load
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+MODES = {
+  'wsgi': ['-m', 'flask', 'run', '--with-threads', '--port', '{port}'],
+  'asgi': ['-m', 'uvicorn', 'asgi:app', '--port', '{port}', '--log-level', 'warning'],
+}
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def start_server(mode, port, database_path):
+  env = dict(os.environ)
+  env.update({
+    'FLASK_APP': 'registry',
+    'FLASK_CONFIG': 'testing',
+    'METRICS_ENABLED': 'false',
+    'TEST_DATABASE_URL': 'sqlite:///' + database_path
+  })
+  args = [arg.format(port=port) for arg in MODES[mode]]
+  server = subprocess.Popen(
+    [sys.executable] + args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+  # Wait until the server answers
+  url = f'http://127.0.0.1:{port}'
+  for _ in range(100):
+    try:
+      requests.get(url + '/status/', timeout=1)
+      return server, url
+    except requests.ConnectionError:
+      if server.poll() is not None:
+        raise RuntimeError(f'the {mode} server exited with status {server.returncode}')
+      time.sleep(0.1)
+
+  server.kill()
+  raise RuntimeError(f'the {mode} server did not start')
+
+
+def peak_memory_mb(pid):
+  with open(f'/proc/{pid}/status') as status:
+    for line in status:
+      if line.startswith('VmHWM:'):
+        return int(line.split()[1]) / 1024
+  return 0.0
+
+
+def run(mode, port, users, workload, concurrency, seconds, seed_count):
+  with tempfile.TemporaryDirectory() as tempdir:
+    server, url = start_server(mode, port, os.path.join(tempdir, 'serving.sqlite'))
+    try:
+      results = run_load(Target(url), users, workload, concurrency, seconds, seed_count)
+      results['memory_mb'] = peak_memory_mb(server.pid)
+    finally:
+      server.terminate()
+      server.wait()
+
+  return results
+
+
+# --------------------------------------------------------------------------------
+# Main
+# --------------------------------------------------------------------------------
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark WSGI and ASGI serving modes under concurrent load.')
+  parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+  parser.add_argument('--workload', choices=list(WORKLOADS), default='mixed')
+  parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 32, 64])
+  parser.add_argument('--seconds', type=float, default=10)
+  parser.add_argument('--seed-devices', type=int, default=5, help='devices each worker creates before the run')
+  parser.add_argument('--port', type=int, default=5050)
+  args = parser.parse_args()
+
+  users = load_users(None)
+  print(f'{"mode":<8}{"clients":>8}{"req/s":>10}{"p95 ms":>10}{"errors":>8}{"peak MB":>10}{"req/s/MB":>10}')
+  for concurrency in args.concurrency:
+    for mode in args.modes:
+      results = run(mode, args.port, users, args.workload, concurrency, args.seconds, args.seed_devices)
+      per_mb = results['throughput'] / results['memory_mb'] if results['memory_mb'] else 0.0
+      print(f'{mode:<8}{concurrency:>8}{results["throughput"]:>10.1f}{results["latency_ms"]["p95"]:>10.3f}'
+            f'{results["errors"]:>8}{results["memory_mb"]:>10.1f}{per_mb:>10.2f}')
+
+
+if __name__ == '__main__':
+  main()
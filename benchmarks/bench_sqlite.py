@@ -0,0 +1,125 @@
+"""
+This module benchmarks concurrent reads and writes on a SQLite database file.
+It compares SQLite's defaults (rollback journal) with the pragmas from SQLITE_PRAGMAS (WAL).
+Reader threads list one owner's devices while writer threads add devices, for a fixed duration.
+
+To run it from the project root:
+
+  python -m benchmarks.bench_sqlite --readers 4 --writers 2 --seconds 5
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from app.database import sqlite_pragma_listener
+from app.models import Device
+from config import Config
+
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.exc import OperationalError
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+INITIAL_DEVICES = 10000
+OWNERS = 10
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def device_row(i):
+  return {
+    'name': f'Device {i}',
+    'location': 'Kitchen',
+    'type': 'Thermostat',
+    'model': 'ThermoBest 3G',
+    'serial_number': f'SN-{i:010d}',
+    'owner': f'owner{i % OWNERS}'
+  }
+
+
+def build_engine(path, pragmas):
+  engine = create_engine('sqlite:///' + path)
+  if pragmas:
+    event.listen(engine, 'connect', sqlite_pragma_listener(pragmas))
+
+  Device.__table__.create(engine)
+  with engine.begin() as connection:
+    connection.execute(insert(Device.__table__), [device_row(i) for i in range(INITIAL_DEVICES)])
+  return engine
+
+
+def reader(engine, stop, counts):
+  query = select(Device.__table__).where(Device.owner == 'owner0').limit(100)
+  with engine.connect() as connection:
+    while not stop.is_set():
+      try:
+        connection.execute(query).fetchall()
+        counts['reads'] += 1
+      except OperationalError:
+        counts['errors'] += 1
+
+
+def writer(engine, stop, counts):
+  i = INITIAL_DEVICES
+  while not stop.is_set():
+    try:
+      with engine.begin() as connection:
+        connection.execute(insert(Device.__table__), device_row(i))
+      counts['writes'] += 1
+    except OperationalError:
+      counts['errors'] += 1
+    i += 1
+
+
+def run(pragmas, readers, writers, seconds):
+  with tempfile.TemporaryDirectory() as tempdir:
+    engine = build_engine(os.path.join(tempdir, 'bench.sqlite'), pragmas)
+    stop = threading.Event()
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+
+    threads = [threading.Thread(target=reader, args=(engine, stop, counts)) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(engine, stop, counts)) for _ in range(writers)]
+    for thread in threads:
+      thread.start()
+    
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+      thread.join()
+    
+    engine.dispose()
+
+  return {key: value / seconds for key, value in counts.items()}
+
+
+# --------------------------------------------------------------------------------
+# Main
+# --------------------------------------------------------------------------------
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark concurrent SQLite reads and writes with and without WAL.')
+  parser.add_argument('--readers', type=int, default=4)
+  parser.add_argument('--writers', type=int, default=2)
+  parser.add_argument('--seconds', type=float, default=5)
+  args = parser.parse_args()
+
+  print(f'{"mode":<10}{"reads/s":>12}{"writes/s":>12}{"errors/s":>12}')
+  for mode, pragmas in [('default', None), ('tuned', Config.SQLITE_PRAGMAS)]:
+    result = run(pragmas, args.readers, args.writers, args.seconds)
+    print(f'{mode:<10}{result["reads"]:>12.1f}{result["writes"]:>12.1f}{result["errors"]:>12.1f}')
+
+
+if __name__ == '__main__':
+  main()
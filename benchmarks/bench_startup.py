@@ -0,0 +1,115 @@
+"""
+This module benchmarks app startup, the way a new worker process starts.
+Each run is a fresh Python process that:
+1. Imports the app package (Flask, SQLAlchemy, and the app's modules)
+2. Imports "registry", which creates the app
+3. Serves its first request ('/status/'), which starts the app (checking the schema and warming the user cache),
+   and its first authenticated request ('/devices/')
+
+Runs share one SQLite database file, which a warm-up run creates first,
+so the results show a worker joining an existing deployment.
+Each DB_CREATE_SCHEMA mode is measured ("always" and "auto" by default).
+Use "--output" to save the medians as JSON, so startup time can be tracked over time.
+
+To run it from the project root:
+
+  python -m benchmarks.bench_startup --runs 10 --output startup.json
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+PHASES = ['import', 'create', 'first_request', 'first_login', 'total']
+
+# Runs in the child process and prints its timings as JSON
+CHILD_SCRIPT = '''
+import base64, json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+import registry
+created = time.perf_counter()
+client = registry.app.test_client()
+client.get('/status/')
+requested = time.perf_counter()
+config = registry.app.config
+credentials = base64.b64encode(f"{config['AUTH_USERNAME1']}:{config['AUTH_PASSWORD1']}".encode()).decode()
+assert client.get('/devices/', headers={'Authorization': 'Basic ' + credentials}).status_code == 200
+logged_in = time.perf_counter()
+print(json.dumps({
+  'import': imported - start,
+  'create': created - imported,
+  'first_request': requested - created,
+  'first_login': logged_in - requested,
+  'total': logged_in - start
+}))
+'''
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def run_child(database_path, mode):
+  env = dict(os.environ)
+  env.update({
+    'FLASK_CONFIG': 'testing',
+    'METRICS_ENABLED': 'false',
+    'DB_CREATE_SCHEMA': mode,
+    'TEST_DATABASE_URL': 'sqlite:///' + database_path
+  })
+  output = subprocess.run(
+    [sys.executable, '-c', CHILD_SCRIPT], env=env, check=True, capture_output=True, text=True).stdout
+  return json.loads(output.splitlines()[-1])
+
+
+def run(mode, runs):
+  with tempfile.TemporaryDirectory() as tempdir:
+    database_path = os.path.join(tempdir, 'startup.sqlite')
+    run_child(database_path, 'always')
+
+    samples = [run_child(database_path, mode) for _ in range(runs)]
+    return {phase: round(statistics.median(sample[phase] for sample in samples) * 1000, 2) for phase in PHASES}
+
+
+# --------------------------------------------------------------------------------
+# Main
+# --------------------------------------------------------------------------------
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark app startup and first requests in fresh processes.')
+  parser.add_argument('--modes', nargs='+', choices=['always', 'auto', 'never'], default=['always', 'auto'])
+  parser.add_argument('--runs', type=int, default=10)
+  parser.add_argument('--label', default='', help='a name for this run, like a version number')
+  parser.add_argument('--output', help='a path for writing median timings as JSON')
+  args = parser.parse_args()
+
+  results = dict()
+  print(f'{"mode":<8}' + ''.join(f'{phase + " ms":>18}' for phase in PHASES))
+  for mode in args.modes:
+    results[mode] = run(mode, args.runs)
+    print(f'{mode:<8}' + ''.join(f'{results[mode][phase]:>18.2f}' for phase in PHASES))
+
+  if args.output:
+    with open(args.output, 'w') as output_json:
+      output = {'label': args.label, 'runs': args.runs, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+      json.dump({**output, 'medians_ms': results}, output_json, indent=2)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,113 @@
+"""
+This module benchmarks '/devices/stats' queries with and without the device counts table.
+For each owner size, it fills a temporary SQLite database with one owner's devices
+(plus devices for other owners), with the counts table and its triggers in place, as the app creates them.
+Then, it times the grouped counts read from the counts table and aggregated from the devices.
+It also times inserts with and without the triggers, since every write pays to maintain the counts.
+
+To run it from the project root:
+
+  python -m benchmarks.bench_stats --sizes 1000 100000 1000000
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from app.models import Device
+from app.stats import DeviceCountsExtension, device_counts
+from benchmarks.bench_indexes import INSERT_CHUNK_SIZE, LOCATIONS, TYPES
+
+from sqlalchemy import create_engine, func, insert, select
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+OWNER = 'owner'
+OTHER_DEVICES = 10000
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def build_rows(size, owner):
+  for i in range(size):
+    yield {
+      'name': f'Device {i}',
+      'location': LOCATIONS[i % len(LOCATIONS)],
+      'type': TYPES[i % len(TYPES)],
+      'model': f'Model {i % 50}',
+      'serial_number': f'SN-{i:010d}',
+      'owner': owner
+    }
+
+
+def insert_rows(engine, rows):
+  start = time.perf_counter()
+  with engine.begin() as connection:
+    while chunk := [row for _, row in zip(range(INSERT_CHUNK_SIZE), rows)]:
+      connection.execute(insert(Device.__table__), chunk)
+  return time.perf_counter() - start
+
+
+def time_query(connection, statement, repeat):
+  timings = list()
+  for _ in range(repeat):
+    start = time.perf_counter()
+    connection.execute(statement).all()
+    timings.append(time.perf_counter() - start)
+  return statistics.median(timings) * 1000
+
+
+def run(size, repeat):
+  with tempfile.TemporaryDirectory() as tempdir:
+    # Insert the same rows without and then with the triggers, to price their upkeep
+    plain_engine = create_engine('sqlite:///' + os.path.join(tempdir, 'plain.sqlite'))
+    Device.__table__.create(plain_engine)
+    plain_insert = insert_rows(plain_engine, build_rows(size, OWNER))
+    plain_engine.dispose()
+
+    engine = create_engine('sqlite:///' + os.path.join(tempdir, 'bench.sqlite'))
+    Device.__table__.create(engine)
+    with engine.begin() as connection:
+      DeviceCountsExtension().create(connection)
+    insert_rows(engine, build_rows(OTHER_DEVICES, 'other'))
+    counted_insert = insert_rows(engine, build_rows(size, OWNER))
+
+    with engine.connect() as connection:
+      counters = select(device_counts.c.type, func.sum(device_counts.c.count)) \
+        .where(device_counts.c.owner == OWNER).group_by(device_counts.c.type)
+      aggregate = select(Device.type, func.count()).where(Device.owner == OWNER).group_by(Device.type)
+      results = (time_query(connection, counters, repeat), time_query(connection, aggregate, repeat))
+    engine.dispose()
+
+  return results, plain_insert / size * 1e6, counted_insert / size * 1e6
+
+
+# --------------------------------------------------------------------------------
+# Main
+# --------------------------------------------------------------------------------
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark device stats with and without the counts table.')
+  parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+  parser.add_argument('--repeat', type=int, default=20)
+  args = parser.parse_args()
+
+  print(f'{"devices":>10}{"counters (ms)":>16}{"group by (ms)":>16}{"insert (us)":>14}{"counted insert (us)":>22}')
+  for size in args.sizes:
+    (counters, aggregate), plain_insert, counted_insert = run(size, args.repeat)
+    print(f'{size:>10}{counters:>16.3f}{aggregate:>16.3f}{plain_insert:>14.2f}{counted_insert:>22.2f}')
+
+
+if __name__ == '__main__':
+  main()
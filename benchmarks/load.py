@@ -0,0 +1,354 @@
+"""
+This module is a load-testing harness for the Device Registry Service.
+It drives concurrent workloads through the same helpers as the integration tests:
+'BaseUrl' and 'User' build requests, 'DeviceCreator' creates and cleans up devices,
+and 'verify_devices' checks that every worker's devices survived the run.
+
+Workloads mix these operations with different weights:
+1. "list": mostly device lists, plus single device lookups
+2. "auth": Basic auth token requests and token-authenticated requests
+3. "write": device creates, patches, and deletes
+4. "mixed": mostly reads, with some writes
+
+The target is either "app" (an in-process app with a temporary SQLite database file)
+or the base URL of a running server, like "http://127.0.0.1:5000".
+A server under load should use a database file (for example, set TEST_DATABASE_URL),
+because the default in-memory database shares one connection between all server threads.
+Results include throughput, p50/p95/p99 latency, and error rates, overall and per operation.
+Use "--output" to save them as JSON, and "--baseline" to compare them with saved results.
+With "--baseline", the script exits with status 1 if any metric regressed beyond "--tolerance".
+
+To run it from the project root:
+
+  python -m benchmarks.load --workload mixed --concurrency 8 --seconds 10 --output results.json
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from testlib.api import AppSession, BaseUrl, User
+from testlib.devices import DeviceCreator, verify_devices
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+WORKLOADS = {
+  'list': {'list': 9, 'get': 1},
+  'auth': {'authenticate': 1, 'token': 1},
+  'write': {'create': 5, 'patch': 3, 'delete': 2},
+  'mixed': {'list': 6, 'get': 2, 'create': 1, 'patch': 0.5, 'delete': 0.5},
+}
+
+TYPES = ['Light Switch', 'Thermostat', 'Refrigerator', 'Router', 'Speaker']
+LOCATIONS = ['Kitchen', 'Living Room', 'Front Porch', 'Garage', 'Office']
+
+
+# --------------------------------------------------------------------------------
+# Class: Target
+# --------------------------------------------------------------------------------
+
+class Target:
+  """Builds sessions for either an in-process app or a running server."""
+
+  def __init__(self, target):
+    self.app = None
+    self.tempdir = None
+
+    if target == 'app':
+      # The config reads the database URL when it is first imported
+      self.tempdir = tempfile.TemporaryDirectory()
+      os.environ['TEST_DATABASE_URL'] = 'sqlite:///' + os.path.join(self.tempdir.name, 'load.sqlite')
+      from app import create_app
+      self.app = create_app('testing')
+      self.base_url = BaseUrl('')
+    else:
+      self.base_url = BaseUrl(target.rstrip('/'))
+
+  def session(self, user=None):
+    auth = (user.username, user.password) if user else None
+    if self.app:
+      return AppSession(self.app, auth)
+
+    import requests
+    session = requests.Session()
+    session.auth = auth
+    return session
+
+  def close(self):
+    if self.tempdir:
+      self.tempdir.cleanup()
+
+
+# --------------------------------------------------------------------------------
+# Operations
+# --------------------------------------------------------------------------------
+
+def device_data(rng):
+  return {
+    'name': f'Load Device {rng.randrange(1000000)}',
+    'location': rng.choice(LOCATIONS),
+    'type': rng.choice(TYPES),
+    'model': f'Model {rng.randrange(100)}',
+    'serial_number': f'LD-{rng.randrange(10 ** 10):010d}'
+  }
+
+
+def op_list(worker):
+  return worker.session.get(worker.base_url.concat('/devices/')).status_code == 200
+
+
+def op_get(worker):
+  id = worker.rng.choice(list(worker.creator.created))
+  return worker.session.get(worker.base_url.concat(f'/devices/{id}')).status_code == 200
+
+
+def op_authenticate(worker):
+  response = worker.session.get(worker.base_url.concat('/authenticate/'))
+  if ok := response.status_code == 200:
+    worker.token = response.json()['token']
+  return ok
+
+
+def op_token(worker):
+  headers = {'Authorization': f'Bearer {worker.token}'}
+  url = worker.base_url.concat('/devices/')
+  return worker.token_session.get(url, params={'limit': 10}, headers=headers).status_code == 200
+
+
+def op_create(worker):
+  worker.devices.append(worker.creator.create(worker.session, device_data(worker.rng)))
+  return True
+
+
+def op_patch(worker):
+  device = worker.rng.choice(worker.devices)
+  patch_data = {'location': worker.rng.choice(LOCATIONS)}
+  response = worker.session.patch(worker.base_url.concat(f'/devices/{device["id"]}'), json=patch_data)
+  if ok := response.status_code == 200:
+    device.update(patch_data)
+  return ok
+
+
+def op_delete(worker):
+  device = worker.devices.pop(worker.rng.randrange(len(worker.devices)))
+  response = worker.session.delete(worker.base_url.concat(f'/devices/{device["id"]}'))
+  worker.creator.remove(device['id'])
+  return response.status_code == 200
+
+
+OPERATIONS = {
+  'list': op_list,
+  'get': op_get,
+  'authenticate': op_authenticate,
+  'token': op_token,
+  'create': op_create,
+  'patch': op_patch,
+  'delete': op_delete,
+}
+
+
+# --------------------------------------------------------------------------------
+# Class: Worker
+# --------------------------------------------------------------------------------
+
+class Worker:
+
+  def __init__(self, target, user, workload, seed_count, seed):
+    self.base_url = target.base_url
+    self.session = target.session(user)
+    self.token_session = target.session()
+    self.creator = DeviceCreator(target.base_url)
+    self.rng = random.Random(seed)
+    self.operations = list(WORKLOADS[workload])
+    self.weights = list(WORKLOADS[workload].values())
+    self.seed_count = seed_count
+    self.devices = list()
+    self.samples = list()
+    self.token = None
+
+  def setup(self):
+    for _ in range(self.seed_count):
+      op_create(self)
+    op_authenticate(self)
+
+  def run(self, start, stop):
+    start.wait()
+    while not stop.is_set():
+      operation = self.rng.choices(self.operations, self.weights)[0]
+
+      # Operations on existing devices need at least one device
+      if operation in ['get', 'patch', 'delete'] and len(self.devices) < 2:
+        operation = 'create'
+
+      began = time.perf_counter()
+      try:
+        ok = OPERATIONS[operation](self)
+      except Exception:
+        ok = False
+      self.samples.append((operation, time.perf_counter() - began, ok))
+
+  def verify(self):
+    response = self.session.get(self.base_url.concat('/devices/'))
+    verify_devices(response.json()['devices'], self.devices)
+
+  def cleanup(self):
+    self.creator.cleanup()
+
+
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def summarize(samples, seconds):
+  latencies = sorted(elapsed * 1000 for _, elapsed, _ in samples)
+  errors = sum(1 for _, _, ok in samples if not ok)
+  quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+
+  return {
+    'requests': len(samples),
+    'errors': errors,
+    'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+    'throughput': round(len(samples) / seconds, 2),
+    'latency_ms': {
+      'mean': round(statistics.fmean(latencies), 3) if latencies else 0.0,
+      'p50': round(quantiles[49], 3) if latencies else 0.0,
+      'p95': round(quantiles[94], 3) if latencies else 0.0,
+      'p99': round(quantiles[98], 3) if latencies else 0.0,
+      'max': round(latencies[-1], 3) if latencies else 0.0
+    }
+  }
+
+
+def run_load(target, users, workload, concurrency, seconds, seed_count):
+  workers = [Worker(target, users[i % len(users)], workload, seed_count, i) for i in range(concurrency)]
+  for worker in workers:
+    worker.setup()
+
+  start = threading.Event()
+  stop = threading.Event()
+  threads = [threading.Thread(target=worker.run, args=(start, stop)) for worker in workers]
+  for thread in threads:
+    thread.start()
+
+  start.set()
+  time.sleep(seconds)
+  stop.set()
+  for thread in threads:
+    thread.join()
+
+  try:
+    for worker in workers:
+      worker.verify()
+  finally:
+    for worker in workers:
+      worker.cleanup()
+
+  samples = [sample for worker in workers for sample in worker.samples]
+  results = summarize(samples, seconds)
+  results['operations'] = {
+    operation: summarize([sample for sample in samples if sample[0] == operation], seconds)
+    for operation in sorted({sample[0] for sample in samples})}
+  return results
+
+
+def find_regressions(results, baseline, tolerance):
+  regressions = list()
+
+  if results['throughput'] < baseline['throughput'] * (1 - tolerance):
+    regressions.append(f'throughput fell from {baseline["throughput"]} to {results["throughput"]} requests/s')
+
+  for percentile in ['p50', 'p95', 'p99']:
+    old, new = baseline['latency_ms'][percentile], results['latency_ms'][percentile]
+    if new > old * (1 + tolerance):
+      regressions.append(f'{percentile} latency rose from {old} to {new} ms')
+
+  if results['error_rate'] > baseline['error_rate'] + tolerance / 10:
+    regressions.append(f'error rate rose from {baseline["error_rate"]} to {results["error_rate"]}')
+
+  return regressions
+
+
+def load_users(inputs_path):
+  if inputs_path:
+    with open(inputs_path) as inputs_json:
+      inputs = json.load(inputs_json)
+    return [User(user['username'], user['password']) for user in inputs['users']]
+
+  from config import Config
+  return [
+    User(Config.AUTH_USERNAME1, Config.AUTH_PASSWORD1),
+    User(Config.AUTH_USERNAME2, Config.AUTH_PASSWORD2)]
+
+
+def print_results(results):
+  print(f'{"operation":<14}{"requests":>10}{"errors":>8}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}')
+  rows = list(results['operations'].items()) + [('total', results)]
+  for name, summary in rows:
+    latency = summary['latency_ms']
+    print(f'{name:<14}{summary["requests"]:>10}{summary["errors"]:>8}{summary["throughput"]:>10.1f}'
+          f'{latency["p50"]:>10.3f}{latency["p95"]:>10.3f}{latency["p99"]:>10.3f}')
+
+
+# --------------------------------------------------------------------------------
+# Main
+# --------------------------------------------------------------------------------
+
+def main():
+  parser = argparse.ArgumentParser(description='Run a concurrent workload against the Device Registry Service.')
+  parser.add_argument('--target', default='app', help='"app" for in-process, or a server base URL')
+  parser.add_argument('--workload', choices=list(WORKLOADS), default='mixed')
+  parser.add_argument('--concurrency', type=int, default=4)
+  parser.add_argument('--seconds', type=float, default=10)
+  parser.add_argument('--seed-devices', type=int, default=20, help='devices each worker creates before the run')
+  parser.add_argument('--inputs', help='an inputs.json file with users, like the integration tests use')
+  parser.add_argument('--label', default='', help='a name for this run, like a version number')
+  parser.add_argument('--output', help='a path for writing results as JSON')
+  parser.add_argument('--baseline', help='a path to earlier JSON results to compare against')
+  parser.add_argument('--tolerance', type=float, default=0.1, help='allowed regression as a fraction')
+  args = parser.parse_args()
+
+  target = Target(args.target)
+  try:
+    results = run_load(
+      target, load_users(args.inputs), args.workload, args.concurrency, args.seconds, args.seed_devices)
+  finally:
+    target.close()
+
+  results.update({
+    'label': args.label,
+    'target': args.target,
+    'workload': args.workload,
+    'concurrency': args.concurrency,
+    'seconds': args.seconds,
+    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z')
+  })
+  print_results(results)
+
+  if args.output:
+    with open(args.output, 'w') as output_json:
+      json.dump(results, output_json, indent=2)
+
+  if args.baseline:
+    with open(args.baseline) as baseline_json:
+      regressions = find_regressions(results, json.load(baseline_json), args.tolerance)
+    for regression in regressions:
+      print(f'REGRESSION: {regression}')
+    if regressions:
+      sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
@@ -2,6 +2,10 @@
 This module provides app configurations as classes.
 Each config sets Flask settings like SECRET_KEY.
 Many settings can be overridden using environment variables.
+
+Engine pool settings apply to server databases (like Postgres) through SQLALCHEMY_ENGINE_OPTIONS.
+SQLite databases do not use them, but they get the connection pragmas in SQLITE_PRAGMAS.
+Read replicas (DB_REPLICA_URLS) become Flask-SQLAlchemy binds, with the same settings for their kind of database.
 """
 
 # --------------------------------------------------------------------------------
@@ -18,30 +22,97 @@ import os
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 
+# --------------------------------------------------------------------------------
+# Functions
+# --------------------------------------------------------------------------------
+
+def engine_options(database_uri):
+  # SQLite uses its own pools, which do not accept these options
+  if database_uri.startswith('sqlite'):
+    return dict()
+  
+  return {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE') or 10),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW') or 20),
+    'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE') or 1800),
+    'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT') or 30),
+    'pool_pre_ping': True
+  }
+
+
+def replica_binds(urls):
+  # The URIs are comma-separated, and each gets a bind key like "replica1"
+  urls = [url.strip() for url in urls.split(',') if url.strip()]
+  return {f'replica{i}': {'url': url, **engine_options(url)} for i, url in enumerate(urls, start=1)}
+
+
 # --------------------------------------------------------------------------------
 # Configuration Objects
 # --------------------------------------------------------------------------------
 
 class Config:
+  ASGI_THREADS = int(os.environ.get('ASGI_THREADS') or 16)
+  AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE') or 1024)
+  AUTH_CACHE_TTL = int(os.environ.get('AUTH_CACHE_TTL') or 300)
   AUTH_PASSWORD1 = os.environ.get('AUTH_PASSWORD1') or 'I<3testing'
   AUTH_PASSWORD2 = os.environ.get('AUTH_PASSWORD2') or 'Muh5devices'
+  AUTH_PASSWORD_HASH_METHOD = os.environ.get('AUTH_PASSWORD_HASH_METHOD') or 'pbkdf2:sha256'
+  AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE') or 4096)
   AUTH_TOKEN_EXPIRATION = int(os.environ.get('AUTH_TOKEN_EXPIRATION') or 3600)
   AUTH_USERNAME1 = os.environ.get('AUTH_USERNAME1') or 'pythonista'
   AUTH_USERNAME2 = os.environ.get('AUTH_USERNAME2') or 'engineer'
+  AUTH_USER_CACHE_SIZE = int(os.environ.get('AUTH_USER_CACHE_SIZE') or 4096)
+  AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL') or 300)
+  BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE') or 500)
+  BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS') or 100000)
+  COMPRESSION_ENCODINGS = os.environ.get('COMPRESSION_ENCODINGS') or 'zstd,br,gzip'
+  COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE') or 1024)
+  DB_CREATE_SCHEMA = os.environ.get('DB_CREATE_SCHEMA') or 'auto'
+  DB_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS') or 5)
+  DB_REPLICA_URLS = os.environ.get('DB_REPLICA_URLS') or ''
+  DEVICE_LIST_CACHE_BACKEND = os.environ.get('DEVICE_LIST_CACHE_BACKEND') or 'memory'
+  DEVICE_LIST_CACHE_SIZE = int(os.environ.get('DEVICE_LIST_CACHE_SIZE') or 1024)
+  DEVICES_MAX_FILTER_VALUES = int(os.environ.get('DEVICES_MAX_FILTER_VALUES') or 100)
+  DEVICES_MAX_PAGE_LIMIT = int(os.environ.get('DEVICES_MAX_PAGE_LIMIT') or 1000)
+  DEVICES_STREAM_BATCH_SIZE = int(os.environ.get('DEVICES_STREAM_BATCH_SIZE') or 500)
+  EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND') or 'memory'
+  EVENTS_HEARTBEAT = int(os.environ.get('EVENTS_HEARTBEAT') or 15)
+  EVENTS_QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE') or 100)
+  JSON_PROVIDER = os.environ.get('JSON_PROVIDER') or 'auto'
+  METRICS_ENABLED = (os.environ.get('METRICS_ENABLED') or 'false').lower() == 'true'
+  SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND') or 'auto'
+  SEARCH_INDEX_CACHE_SIZE = int(os.environ.get('SEARCH_INDEX_CACHE_SIZE') or 64)
+  SEARCH_INDEX_CACHE_TTL = int(os.environ.get('SEARCH_INDEX_CACHE_TTL') or 3600)
   SECRET_KEY = os.environ.get('SECRET_KEY') or 'Pandas are awesome!'
+  SQLALCHEMY_BINDS = replica_binds(DB_REPLICA_URLS)
   SQLALCHEMY_TRACK_MODIFICATIONS = False
+  SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL',
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL',
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE') or 268435456),
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE') or -65536)
+  }
+  STATS_BACKEND = os.environ.get('STATS_BACKEND') or 'auto'
 
 
 class DevelopmentConfig(Config):
   DEBUG = True
   SQLALCHEMY_DATABASE_URI = os.environ.get('DEV_DATABASE_URL') or \
     'sqlite:///' + os.path.join(basedir, 'registry_data.sqlite')
+  SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
 
 
 class TestingConfig(Config):
   TESTING = True
   SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or \
     'sqlite://'
+  SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+
+class ProductionConfig(Config):
+  SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
+    'sqlite:///' + os.path.join(basedir, 'registry_data.sqlite')
+  SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
 
 
 # --------------------------------------------------------------------------------
@@ -51,6 +122,7 @@ class TestingConfig(Config):
 config = {
     'development': DevelopmentConfig,
     'testing': TestingConfig,
+    'production': ProductionConfig,
 
     'default': TestingConfig
 }
\ No newline at end of file
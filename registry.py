@@ -1,7 +1,12 @@
 """
 This module is the "entry point" for running this Flask app.
 It creates the app using the "create_app" factory function.
+The app starts lazily (see 'start_app'), so CLI commands run without checking the schema or warming caches,
+and "flask run" starts it on its first request.
 It also creates a CLI command "init-db" for creating the app's SQLite database.
+The CLI command "upgrade-db" adds missing tables, columns, and indexes to an existing database.
+The CLI command "add-user" adds a user (or changes a user's password) in the database.
+The CLI command "sync-replicas" copies a SQLite database to the SQLite files standing in for its read replicas.
 
 To run this app:
 1. Set the "FLASK_APP" environment variable to "registry".
@@ -19,14 +24,22 @@ import click
 import os
 
 from app import create_app, db
+from app.database import copy_sqlite_database, create_schema, create_schema_extensions, drop_schema
+from app.database import schema_fingerprint, store_fingerprint
+from app.devices import commit_device_changes
 from app.models import Device
+from app.replicas import replica_router
+from app.users import add_user
+
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
 
 
 # --------------------------------------------------------------------------------
 # App Creation
 # --------------------------------------------------------------------------------
 
-app = create_app(os.getenv('FLASK_CONFIG') or 'default')
+app = create_app(os.getenv('FLASK_CONFIG') or 'default', lazy_startup=True)
 
 
 # --------------------------------------------------------------------------------
@@ -37,8 +50,8 @@ app = create_app(os.getenv('FLASK_CONFIG') or 'default')
 def init_db():
     """Initializes the database with devices."""
 
-    db.drop_all()
-    db.create_all()
+    drop_schema(db)
+    create_schema(db)
 
     light = Device(
       name='Front Porch Light',
@@ -67,6 +80,60 @@ def init_db():
     db.session.add(light)
     db.session.add(thermostat)
     db.session.add(fridge)
-    db.session.commit()
+    db.session.flush()
+
+    # Record the devices like any other write, so they appear in the change feed
+    for owner in ['pythonista', 'engineer']:
+      ids = [device.id for device in [light, thermostat, fridge] if device.owner == owner]
+      commit_device_changes(owner, created=ids)
     
     click.echo('Initialized the database with fresh data.')
+
+
+@app.cli.command('upgrade-db')
+def upgrade_db():
+    """Adds missing tables, columns, and indexes to an existing database without dropping data."""
+
+    db.create_all()
+
+    # New columns need server defaults so that existing rows get values
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+      existing = {column['name'] for column in inspector.get_columns(table.name)}
+      for column in table.columns:
+        if column.name not in existing:
+          column_ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+          with db.engine.begin() as connection:
+            connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column_ddl}')
+
+    # 'create_all' skips existing tables, including any indexes added to them later
+    for table in db.metadata.sorted_tables:
+      for index in table.indexes:
+        index.create(db.engine, checkfirst=True)
+
+    create_schema_extensions(db.engine)
+    store_fingerprint(db.engine, schema_fingerprint(db.metadata, db.engine))
+    click.echo('Upgraded the database schema.')
+
+
+@app.cli.command('add-user')
+@click.argument('username')
+@click.password_option()
+def add_user_command(username, password):
+    """Adds a user, or changes an existing user's password."""
+
+    add_user(username, password)
+    click.echo(f'Saved user {username}.')
+
+
+@app.cli.command('sync-replicas')
+def sync_replicas():
+    """Copies the SQLite database to the SQLite files standing in for read replicas, for local testing."""
+
+    engines = [db.engines[key] for key in replica_router.keys]
+    if any(engine.dialect.name != 'sqlite' for engine in [db.engine, *engines]):
+      raise click.ClickException('Only SQLite replicas can be synced. Other databases replicate themselves.')
+
+    for key, engine in zip(replica_router.keys, engines):
+      copy_sqlite_database(db.engine, engine)
+      click.echo(f'Synced {key}.')
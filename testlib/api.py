@@ -35,3 +35,62 @@ class TokenHolder:
   def __init__(self, token, start_time):
     self.token = token
     self.start_time = start_time
+
+
+# --------------------------------------------------------------------------------
+# Class: AppResponse
+# --------------------------------------------------------------------------------
+
+class AppResponse:
+
+  def __init__(self, response):
+    self.response = response
+    self.status_code = response.status_code
+    self.headers = response.headers
+    self.text = response.get_data(as_text=True)
+  
+  def json(self):
+    return self.response.get_json()
+
+
+# --------------------------------------------------------------------------------
+# Class: AppSession
+# --------------------------------------------------------------------------------
+
+class AppSession:
+  """
+  Sends requests to a Flask app in the same process, through the app's test client.
+  It mimics the parts of 'requests.Session' that tests use,
+  so helpers like DeviceCreator work the same way with or without a live server.
+  Use it with a BaseUrl of '' because requests go straight to resource paths.
+  """
+
+  def __init__(self, app, auth=None):
+    self.client = app.test_client()
+    self.auth = auth
+  
+  def request(self, method, url, params=None, json=None, data=None, headers=None, auth=None):
+    response = self.client.open(
+      url,
+      method=method,
+      query_string=params,
+      json=json,
+      data=data,
+      headers=headers,
+      auth=auth or self.auth)
+    return AppResponse(response)
+  
+  def get(self, url, **kwargs):
+    return self.request('GET', url, **kwargs)
+  
+  def post(self, url, **kwargs):
+    return self.request('POST', url, **kwargs)
+  
+  def put(self, url, **kwargs):
+    return self.request('PUT', url, **kwargs)
+  
+  def patch(self, url, **kwargs):
+    return self.request('PATCH', url, **kwargs)
+  
+  def delete(self, url, **kwargs):
+    return self.request('DELETE', url, **kwargs)
@@ -83,6 +83,10 @@ class DeviceCreator:
       warnings.warn(UserWarning(f'Deleting device with id={id} failed'))
   
 
+  def add(self, session, id):
+    self.created[id] = session
+
+
   def remove(self, id):
     del self.created[id]
   
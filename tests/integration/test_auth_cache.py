@@ -0,0 +1,109 @@
+"""
+This module contains tests for the Basic auth credential cache.
+Passwords and hash methods cannot be changed through the REST API,
+so these tests call the auth functions in process, on an app built with the *Testing* config.
+They use their own usernames, so they never touch the users that other tests log in as.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import pytest
+import time
+
+from app import create_app
+from app.auth import credential_cache, digest_password, verify_password
+from app import db
+from app.models import User
+from app.users import add_user, get_password_hash, hash_password
+
+
+# --------------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------------
+
+@pytest.fixture(scope='module')
+def app():
+  return create_app('testing')
+
+
+@pytest.fixture
+def app_context(app):
+  # A fast hash method keeps the tests quick
+  app.config['AUTH_PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+  with app.app_context():
+    yield app
+
+
+# --------------------------------------------------------------------------------
+# Helpers
+# --------------------------------------------------------------------------------
+
+def cached_hash(username, password):
+  return credential_cache.get((username, digest_password(password)))
+
+
+# --------------------------------------------------------------------------------
+# Tests for the Credential Cache
+# --------------------------------------------------------------------------------
+
+def test_credential_cache_misses_after_password_change(app_context):
+
+  # Log in, so the credential is cached
+  add_user('cache-user-1', 'first-password')
+  assert verify_password('cache-user-1', 'first-password') == 'cache-user-1'
+  assert cached_hash('cache-user-1', 'first-password') is not None
+
+  # Change the password
+  add_user('cache-user-1', 'second-password')
+
+  # Verify the old password no longer logs in, and its entry is dropped
+  assert verify_password('cache-user-1', 'first-password') is None
+  assert cached_hash('cache-user-1', 'first-password') is None
+  assert verify_password('cache-user-1', 'second-password') == 'cache-user-1'
+
+
+def test_credential_cache_misses_after_hash_method_change(app_context):
+
+  # Log in, so the credential is cached with the current hash
+  old_hash = add_user('cache-user-2', 'password')
+  assert verify_password('cache-user-2', 'password') == 'cache-user-2'
+  assert cached_hash('cache-user-2', 'password') == old_hash
+
+  # Change the hash method, so the next login replaces the stored hash
+  app_context.config['AUTH_PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:2000'
+  assert verify_password('cache-user-2', 'password') == 'cache-user-2'
+  new_hash = get_password_hash('cache-user-2')
+  assert new_hash.startswith('pbkdf2:sha256:2000$')
+
+  # Verify the entry for the old hash does not match, and is replaced on the next login
+  assert cached_hash('cache-user-2', 'password') == old_hash
+  assert verify_password('cache-user-2', 'password') == 'cache-user-2'
+  assert cached_hash('cache-user-2', 'password') == new_hash
+
+
+def test_credential_cache_skips_unknown_users(app_context):
+
+  # Attempt to log in twice as a user who does not exist
+  for _ in range(2):
+    assert verify_password('cache-unknown-user', 'password') is None
+
+  # Verify nothing was cached as a valid credential
+  assert cached_hash('cache-unknown-user', 'password') is None
+
+
+def test_user_cache_forgets_unknown_users_soon(app_context, monkeypatch):
+  monkeypatch.setattr('app.users.UNKNOWN_USER_TTL', 0.1)
+
+  # Look up a user who does not exist yet, so the miss is cached
+  assert get_password_hash('cache-user-3') is None
+
+  # Add the user behind the cache's back, like "flask add-user" in another process
+  password_hash = hash_password('password')
+  db.session.add(User(username='cache-user-3', password_hash=password_hash))
+  db.session.commit()
+
+  # Verify the user is found once the cached miss expires
+  time.sleep(0.2)
+  assert get_password_hash('cache-user-3') == password_hash
@@ -0,0 +1,130 @@
+"""
+This module contains integration tests for response compression.
+Responses are compressed with the encoding negotiated through the "Accept-Encoding" header.
+Small responses are not compressed, so tests create enough devices for a large list.
+gzip is always available, so these tests only negotiate gzip.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import json
+import pytest
+import requests
+import zlib
+
+from testlib.devices import verify_devices
+
+
+# --------------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------------
+
+@pytest.fixture
+def devices(device_creator, session, thermostat_data):
+  return [device_creator.create(session, {**thermostat_data, 'name': f'Thermostat {i}'})
+          for i in range(12)]
+
+
+# --------------------------------------------------------------------------------
+# Helpers
+# --------------------------------------------------------------------------------
+
+def get_raw(session, url, encoding, params=None, headers=None):
+  # Read the body as sent, without letting requests decode it
+  headers = {**(headers or {}), 'Accept-Encoding': encoding}
+  response = session.get(url, params=params, headers=headers, stream=True)
+  return response, response.raw.read(decode_content=False)
+
+
+def gunzip(body):
+  return json.loads(zlib.decompress(body, 16 + zlib.MAX_WBITS))
+
+
+# --------------------------------------------------------------------------------
+# Tests for Compression
+# --------------------------------------------------------------------------------
+
+def test_devices_get_compressed(base_url, session, devices):
+
+  # Get the list with gzip
+  url = base_url.concat('/devices/')
+  params = {'id__gte': devices[0]['id']}
+  response, body = get_raw(session, url, 'gzip', params)
+
+  # Verify the body is compressed and holds the devices
+  assert response.status_code == 200
+  assert response.headers['Content-Encoding'] == 'gzip'
+  assert 'Accept-Encoding' in response.headers['Vary']
+  assert int(response.headers['Content-Length']) == len(body)
+  verify_devices(gunzip(body)['devices'], devices)
+
+
+def test_devices_get_compressed_from_cache(base_url, session, devices):
+
+  # Get the same list with gzip twice
+  url = base_url.concat('/devices/')
+  params = {'id__gte': devices[0]['id']}
+  status_url = base_url.concat('/status/')
+  _, first_body = get_raw(session, url, 'gzip', params)
+  hits_before = requests.get(status_url).json()['caches']['device_lists']['hits']
+  response, body = get_raw(session, url, 'gzip', params)
+
+  # Verify the second response reused both the cached list and its compressed variant
+  assert response.headers['Content-Encoding'] == 'gzip'
+  assert body == first_body
+  assert requests.get(status_url).json()['caches']['device_lists']['hits'] == hits_before + 2
+
+
+def test_devices_get_streamed_compressed(base_url, session, devices):
+
+  # Get the streamed list with gzip
+  url = base_url.concat('/devices/')
+  params = {'id__gte': devices[0]['id'], 'stream': 'true'}
+  response, body = get_raw(session, url, 'gzip', params)
+
+  # Verify the stream is compressed and holds the devices
+  assert response.status_code == 200
+  assert response.headers['Content-Encoding'] == 'gzip'
+  verify_devices(gunzip(body)['devices'], devices)
+
+
+@pytest.mark.parametrize('encoding', ['identity', 'gzip;q=0', 'unknown'])
+def test_devices_get_uncompressed_without_accepted_encoding(base_url, session, devices, encoding):
+
+  # Get the list without an acceptable encoding
+  url = base_url.concat('/devices/')
+  response, body = get_raw(session, url, encoding, {'id__gte': devices[0]['id']})
+
+  # Verify the body is sent as it is
+  assert response.status_code == 200
+  assert 'Content-Encoding' not in response.headers
+  verify_devices(json.loads(body)['devices'], devices)
+
+
+def test_small_response_uncompressed(base_url, session, devices):
+
+  # Get a single device, which is smaller than the minimum size
+  url = base_url.concat(f'/devices/{devices[0]["id"]}')
+  response, body = get_raw(session, url, 'gzip')
+
+  # Verify the body is sent as it is
+  assert response.status_code == 200
+  assert 'Content-Encoding' not in response.headers
+  assert json.loads(body) == devices[0]
+
+
+def test_compressed_response_has_weak_etag(base_url, session, devices):
+
+  # Get the compressed list
+  url = base_url.concat('/devices/')
+  params = {'id__gte': devices[0]['id']}
+  response, _ = get_raw(session, url, 'gzip', params)
+  etag = response.headers['ETag']
+
+  # Verify the ETag is weak but still matches both variants
+  assert etag.startswith('W/')
+  for encoding in ['gzip', 'identity']:
+    cached_response, _ = get_raw(session, url, encoding, params, {'If-None-Match': etag})
+    assert cached_response.status_code == 304
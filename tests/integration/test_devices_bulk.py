@@ -0,0 +1,174 @@
+"""
+This module contains integration tests for the '/devices/bulk' resource.
+Bulk requests create, patch, or delete many devices at once.
+Each item gets its own result, so one bad item must not affect the others.
+"""
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+NONEXISTENT_ID = 999999999
+
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import json
+import pytest
+
+from testlib.devices import verify_devices
+
+
+# --------------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------------
+
+@pytest.fixture
+def bulk_url(base_url):
+  return base_url.concat('/devices/bulk')
+
+
+@pytest.fixture
+def devices(device_creator, session, thermostat_data, light_data):
+  return [device_creator.create(session, data) for data in [thermostat_data, light_data]]
+
+
+# --------------------------------------------------------------------------------
+# Tests for POST
+# --------------------------------------------------------------------------------
+
+def test_bulk_create_devices(
+  bulk_url, base_url, user, session, device_creator, thermostat_data, light_data):
+
+  # Create
+  response = session.post(bulk_url, json=[thermostat_data, {'name': 'Nameless'}, light_data])
+  results = response.json()['results']
+
+  for result in results:
+    if result['status'] == 200:
+      device_creator.add(session, result['id'])
+
+  # Verify per-item results
+  assert response.status_code == 200
+  assert [result['status'] for result in results] == [200, 400, 200]
+  assert results[1]['error'] == 'bad request'
+  assert 'missing fields' in results[1]['message']
+
+  for result, data in zip([results[0], results[2]], [thermostat_data, light_data]):
+    data['id'] = result['id']
+    data['owner'] = user.username
+    assert result['device'] == data
+
+  # Verify the devices exist
+  get_response = session.get(base_url.concat('/devices/'))
+  verify_devices(get_response.json()['devices'], [thermostat_data, light_data])
+
+
+def test_bulk_create_devices_from_ndjson(
+  bulk_url, session, device_creator, thermostat_data, fridge_data):
+
+  # Create
+  body = '\n'.join(json.dumps(data) for data in [thermostat_data, fridge_data])
+  headers = {'Content-Type': 'application/x-ndjson'}
+  response = session.post(bulk_url, data=body, headers=headers)
+  results = response.json()['results']
+
+  for result in results:
+    device_creator.add(session, result['id'])
+
+  # Verify
+  assert response.status_code == 200
+  assert [result['status'] for result in results] == [200, 200]
+  assert results[1]['device']['name'] == fridge_data['name']
+
+
+@pytest.mark.parametrize('body', [[], {'name': 'Not a list'}])
+def test_bulk_create_with_invalid_body_yields_error(bulk_url, session, body):
+
+  # Attempt create
+  response = session.post(bulk_url, json=body)
+  data = response.json()
+
+  # Verify error
+  assert response.status_code == 400
+  assert data['error'] == 'bad request'
+
+
+# --------------------------------------------------------------------------------
+# Tests for PATCH
+# --------------------------------------------------------------------------------
+
+def test_bulk_patch_devices(bulk_url, session, alt_session, devices, thermostat_patch_data):
+
+  # Patch
+  thermostat_patch_data['id'] = devices[0]['id']
+  items = [
+    thermostat_patch_data,
+    {'id': devices[1]['id'], 'type': 'Not Allowed'},
+    {'id': NONEXISTENT_ID, 'name': 'Nobody'}
+  ]
+  response = session.patch(bulk_url, json=items)
+  results = response.json()['results']
+
+  # Verify per-item results
+  assert response.status_code == 200
+  assert [result['status'] for result in results] == [200, 400, 404]
+  assert results[0]['device']['name'] == thermostat_patch_data['name']
+  assert results[0]['device']['location'] == thermostat_patch_data['location']
+
+  # Verify other users cannot patch the devices
+  alt_response = alt_session.patch(bulk_url, json=[{'id': devices[1]['id'], 'name': 'Mine'}])
+  assert alt_response.json()['results'][0]['status'] == 403
+
+
+# --------------------------------------------------------------------------------
+# Tests for DELETE
+# --------------------------------------------------------------------------------
+
+def test_bulk_delete_devices(bulk_url, base_url, session, alt_session, devices, device_creator):
+
+  # Verify other users cannot delete the devices
+  alt_response = alt_session.delete(bulk_url, json=[devices[0]['id']])
+  assert alt_response.json()['results'][0]['status'] == 403
+
+  # Delete
+  ids = [device['id'] for device in devices]
+  response = session.delete(bulk_url, json=ids + [{'id': NONEXISTENT_ID}])
+  results = response.json()['results']
+
+  for id in ids:
+    device_creator.remove(id)
+
+  # Verify per-item results
+  assert response.status_code == 200
+  assert [result['status'] for result in results] == [200, 200, 404]
+
+  # Verify the devices are gone
+  get_response = session.get(base_url.concat('/devices/'))
+  verify_devices(get_response.json()['devices'], excluding=ids)
+
+
+# --------------------------------------------------------------------------------
+# Tests for Requests Without Writes
+# --------------------------------------------------------------------------------
+
+@pytest.mark.parametrize('method, items', [
+  ('post', ['x']),
+  ('patch', [{'id': NONEXISTENT_ID, 'name': 'Nothing'}]),
+  ('delete', ['x', NONEXISTENT_ID]),
+])
+def test_bulk_without_writes_keeps_list_etag(bulk_url, base_url, session, devices, method, items):
+
+  # Get the device list's ETag
+  etag = session.get(base_url.concat('/devices/')).headers['ETag']
+
+  # Send a bulk request where every item fails
+  response = session.request(method, bulk_url, json=items)
+  assert response.status_code == 200
+  assert all(result['status'] != 200 for result in response.json()['results'])
+
+  # Verify the list did not change
+  headers = {'If-None-Match': etag}
+  assert session.get(base_url.concat('/devices/'), headers=headers).status_code == 304
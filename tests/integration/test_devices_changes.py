@@ -0,0 +1,124 @@
+"""
+This module contains integration tests for the '/devices/changes' resource.
+The change feed returns devices changed after a sequence number, plus the IDs of deleted devices.
+Other devices may change too, so tests start from the latest sequence number and look for their devices.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import pytest
+
+
+# --------------------------------------------------------------------------------
+# Helpers
+# --------------------------------------------------------------------------------
+
+def get_changes(base_url, session, params):
+  response = session.get(base_url.concat('/devices/changes'), params=params)
+  assert response.status_code == 200
+  return response.json()
+
+
+def sync(base_url, session, since=0):
+  # Follow every page, like a client catching up
+  devices, deleted = dict(), set()
+  while True:
+    data = get_changes(base_url, session, {'since': since})
+    for device in data['devices']:
+      devices[device['id']] = device
+      deleted.discard(device['id'])
+    for id in data['deleted']:
+      devices.pop(id, None)
+      deleted.add(id)
+    since = data['since']
+    if not data['more']:
+      return devices, deleted, since
+
+
+# --------------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------------
+
+@pytest.fixture
+def since(base_url, session):
+  return sync(base_url, session)[2]
+
+
+# --------------------------------------------------------------------------------
+# Tests for Changes
+# --------------------------------------------------------------------------------
+
+def test_devices_changes_full_sync(base_url, session, thermostat):
+
+  # Sync from the start
+  devices, _, since = sync(base_url, session)
+
+  # Verify the device is included
+  assert devices[thermostat['id']] == thermostat
+  assert since > 0
+
+
+def test_devices_changes_after_writes(
+  base_url, session, device_creator, since, thermostat_data, light_data, thermostat_patch_data):
+
+  # Create two devices, then patch one and delete the other
+  thermostat = device_creator.create(session, thermostat_data)
+  light = device_creator.create(session, light_data)
+  session.patch(base_url.concat(f'/devices/{thermostat["id"]}'), json=thermostat_patch_data)
+  session.delete(base_url.concat(f'/devices/{light["id"]}'))
+  device_creator.remove(light['id'])
+
+  # Verify only the delta is returned
+  data = get_changes(base_url, session, {'since': since})
+  assert data['devices'] == [{**thermostat, **thermostat_patch_data}]
+  assert data['deleted'] == [light['id']]
+  assert data['since'] > since
+  assert data['more'] is False
+
+
+def test_devices_changes_without_writes(base_url, session, since):
+
+  # Get changes from the latest sequence number
+  data = get_changes(base_url, session, {'since': since})
+
+  # Verify nothing changed
+  assert data == {'devices': [], 'deleted': [], 'since': since, 'more': False}
+
+
+def test_devices_changes_with_pages_and_fields(base_url, session, device_creator, since, thermostat_data):
+
+  # Create two devices
+  ids = [device_creator.create(session, {**thermostat_data})['id'] for _ in range(2)]
+
+  # Get one change at a time
+  first = get_changes(base_url, session, {'since': since, 'limit': 1, 'fields': 'id'})
+  second = get_changes(base_url, session, {'since': first['since'], 'limit': 1, 'fields': 'id'})
+
+  # Verify the pages
+  assert first['devices'] == [{'id': ids[0]}]
+  assert first['more'] is True
+  assert second['devices'] == [{'id': ids[1]}]
+  assert second['more'] is False
+
+
+def test_devices_changes_exclude_other_users(base_url, session, alt_session, device_creator, thermostat_data):
+
+  # Get the other user's latest sequence number, then create a device
+  _, _, since = sync(base_url, alt_session)
+  device_creator.create(session, thermostat_data)
+
+  # Verify the other user sees no changes
+  data = get_changes(base_url, alt_session, {'since': since})
+  assert data['devices'] == []
+
+
+@pytest.mark.parametrize('params', [{'since': -1}, {'since': 'latest'}, {'limit': 0}])
+def test_devices_changes_with_invalid_params_yields_error(base_url, session, params):
+
+  # Attempt to get changes with invalid parameters
+  response = session.get(base_url.concat('/devices/changes'), params=params)
+
+  # Verify error
+  assert response.status_code == 400
@@ -0,0 +1,167 @@
+"""
+This module contains integration tests for conditional device requests.
+Device responses carry ETag headers.
+GET requests with "If-None-Match" should yield 304 responses when nothing changed.
+PUT and PATCH requests with "If-Match" should yield 412 responses when the device changed.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import pytest
+
+
+# --------------------------------------------------------------------------------
+# Tests for If-None-Match
+# --------------------------------------------------------------------------------
+
+def test_device_get_not_modified(base_url, session, thermostat):
+
+  # Get the device and its ETag
+  device_id_url = base_url.concat(f'/devices/{thermostat["id"]}')
+  get_response = session.get(device_id_url)
+  etag = get_response.headers['ETag']
+
+  # Verify an unchanged device is not sent again
+  headers = {'If-None-Match': etag}
+  cached_response = session.get(device_id_url, headers=headers)
+  assert cached_response.status_code == 304
+  assert cached_response.text == ''
+  assert cached_response.headers['ETag'] == etag
+
+
+def test_device_get_modified_after_patch(base_url, session, thermostat, thermostat_patch_data):
+
+  # Get the device and its ETag
+  device_id_url = base_url.concat(f'/devices/{thermostat["id"]}')
+  etag = session.get(device_id_url).headers['ETag']
+
+  # Patch the device
+  patch_response = session.patch(device_id_url, json=thermostat_patch_data)
+  assert patch_response.headers['ETag'] != etag
+
+  # Verify the old ETag no longer matches
+  headers = {'If-None-Match': etag}
+  get_response = session.get(device_id_url, headers=headers)
+  assert get_response.status_code == 200
+  assert get_response.json()['name'] == thermostat_patch_data['name']
+  assert get_response.headers['ETag'] == patch_response.headers['ETag']
+
+
+def test_devices_get_not_modified_until_write(base_url, session, thermostat, light_data, device_creator):
+
+  # Get the device list and its ETag
+  url = base_url.concat('/devices/')
+  etag = session.get(url).headers['ETag']
+
+  # Verify an unchanged list is not sent again
+  headers = {'If-None-Match': etag}
+  assert session.get(url, headers=headers).status_code == 304
+
+  # Verify a new device changes the list
+  light = device_creator.create(session, light_data)
+  get_response = session.get(url, headers=headers)
+  assert get_response.status_code == 200
+  assert light in get_response.json()['devices']
+
+
+def test_devices_get_etag_depends_on_query(base_url, session, thermostat):
+
+  # Get ETags for different queries
+  url = base_url.concat('/devices/')
+  etag = session.get(url).headers['ETag']
+  filtered_etag = session.get(url, params={'type': thermostat['type']}).headers['ETag']
+
+  # Verify they differ
+  assert etag != filtered_etag
+
+
+# --------------------------------------------------------------------------------
+# Tests for If-Match
+# --------------------------------------------------------------------------------
+
+@pytest.mark.parametrize('method', ['PATCH', 'PUT'])
+def test_device_update_with_current_etag(method, base_url, session, thermostat, light_data):
+
+  # Update with the current ETag
+  device_id_url = base_url.concat(f'/devices/{thermostat["id"]}')
+  etag = session.get(device_id_url).headers['ETag']
+  headers = {'If-Match': etag}
+  body = {'name': 'Thermostat'} if method == 'PATCH' else light_data
+  response = session.request(method, device_id_url, json=body, headers=headers)
+
+  # Verify update
+  assert response.status_code == 200
+
+
+@pytest.mark.parametrize('method', ['PATCH', 'PUT'])
+def test_device_update_with_stale_etag_yields_error(
+  method, base_url, session, thermostat, light_data, thermostat_patch_data):
+
+  # Get the ETag, then change the device
+  device_id_url = base_url.concat(f'/devices/{thermostat["id"]}')
+  etag = session.get(device_id_url).headers['ETag']
+  session.patch(device_id_url, json=thermostat_patch_data)
+
+  # Attempt update with the stale ETag
+  headers = {'If-Match': etag}
+  body = {'name': 'Thermostat'} if method == 'PATCH' else light_data
+  response = session.request(method, device_id_url, json=body, headers=headers)
+  data = response.json()
+
+  # Verify error
+  assert response.status_code == 412
+  assert data['error'] == 'precondition failed'
+
+
+@pytest.mark.parametrize('if_match', ['*', 'weak'])
+def test_device_patch_with_any_or_weak_etag(if_match, base_url, session, thermostat):
+
+  # Patch with "*" or the weak form of the current ETag
+  device_id_url = base_url.concat(f'/devices/{thermostat["id"]}')
+  etag = session.get(device_id_url).headers['ETag']
+  headers = {'If-Match': '*' if if_match == '*' else 'W/' + etag}
+  response = session.patch(device_id_url, json={'name': 'Thermostat'}, headers=headers)
+
+  # Verify update and a new ETag
+  assert response.status_code == 200
+  assert response.json()['name'] == 'Thermostat'
+  assert response.headers['ETag'] != etag
+
+
+def test_device_patch_with_other_device_etag_yields_error(base_url, session, thermostat, light_data, device_creator):
+
+  # Attempt a patch with another device's ETag
+  light = device_creator.create(session, light_data)
+  etag = session.get(base_url.concat(f'/devices/{light["id"]}')).headers['ETag']
+  device_id_url = base_url.concat(f'/devices/{thermostat["id"]}')
+  response = session.patch(device_id_url, json={'name': 'Thermostat'}, headers={'If-Match': etag})
+
+  # Verify error
+  assert response.status_code == 412
+
+
+# --------------------------------------------------------------------------------
+# Tests for Error Precedence
+# --------------------------------------------------------------------------------
+
+@pytest.mark.parametrize('method', ['PATCH', 'PUT'])
+def test_device_update_with_invalid_body_for_missing_device_yields_not_found(method, base_url, session):
+
+  # Attempt an update with an invalid body
+  response = session.request(method, base_url.concat('/devices/999999999'), json={'bad': 1})
+
+  # Verify the missing device is reported first
+  assert response.status_code == 404
+
+
+@pytest.mark.parametrize('method', ['PATCH', 'PUT'])
+def test_device_update_with_invalid_body_for_other_users_device_yields_forbidden(
+  method, base_url, alt_session, thermostat):
+
+  # Attempt an update with an invalid body
+  response = alt_session.request(method, base_url.concat(f'/devices/{thermostat["id"]}'), json={'bad': 1})
+
+  # Verify the other user's device is reported first
+  assert response.status_code == 403
@@ -0,0 +1,115 @@
+"""
+This module contains integration tests for the '/devices/events' resource.
+It streams Server-Sent Events for every write to the user's devices.
+Each test opens a stream, writes devices, and then reads the events the writes pushed.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import json
+import pytest
+import requests
+
+
+# --------------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------------
+
+@pytest.fixture
+def open_stream(base_url):
+  responses = list()
+
+  def open_stream(session, headers=None):
+    url = base_url.concat('/devices/events')
+    response = requests.get(url, auth=session.auth, headers=headers, stream=True, timeout=10)
+    responses.append(response)
+    return response
+
+  yield open_stream
+
+  for response in responses:
+    response.close()
+
+
+# --------------------------------------------------------------------------------
+# Helpers
+# --------------------------------------------------------------------------------
+
+def read_events(response, count):
+  events, event = list(), dict()
+
+  for line in response.iter_lines(decode_unicode=True):
+    if line.startswith('event: '):
+      event['event'] = line[len('event: '):]
+    elif line.startswith('data: '):
+      event['data'] = json.loads(line[len('data: '):])
+    elif not line and event:
+      events.append(event)
+      event = dict()
+      if len(events) == count:
+        break
+
+  return events
+
+
+# --------------------------------------------------------------------------------
+# Tests for Events
+# --------------------------------------------------------------------------------
+
+def test_devices_events_stream(base_url, session, open_stream):
+
+  # Open a stream
+  response = open_stream(session, {'Accept-Encoding': 'gzip'})
+
+  # Verify the stream is uncompressed and tells clients when to reconnect
+  assert response.status_code == 200
+  assert response.headers['Content-Type'].startswith('text/event-stream')
+  assert response.headers['Cache-Control'] == 'no-cache'
+  assert 'Content-Encoding' not in response.headers
+  assert next(response.iter_lines(decode_unicode=True)).startswith('retry: ')
+
+
+def test_devices_events_for_writes(
+  base_url, session, device_creator, open_stream, thermostat_data, thermostat_patch_data):
+
+  # Create, patch, and delete a device while a stream is open
+  response = open_stream(session)
+  thermostat = device_creator.create(session, thermostat_data)
+  id = thermostat['id']
+  session.patch(base_url.concat(f'/devices/{id}'), json=thermostat_patch_data)
+  session.delete(base_url.concat(f'/devices/{id}'))
+  device_creator.remove(id)
+
+  # Verify an event for each write
+  assert read_events(response, 3) == [
+    {'event': 'create', 'data': {'ids': [id]}},
+    {'event': 'update', 'data': {'ids': [id]}},
+    {'event': 'delete', 'data': {'ids': [id]}},
+  ]
+
+
+def test_devices_events_for_bulk_writes(base_url, session, device_creator, open_stream, thermostat_data, light_data):
+
+  # Add two devices in one bulk request while a stream is open
+  response = open_stream(session)
+  bulk_response = session.post(base_url.concat('/devices/bulk'), json=[thermostat_data, light_data])
+  ids = [result['id'] for result in bulk_response.json()['results']]
+  for id in ids:
+    device_creator.add(session, id)
+
+  # Verify one event holds both devices
+  assert read_events(response, 1) == [{'event': 'create', 'data': {'ids': ids}}]
+
+
+def test_devices_events_exclude_other_users(
+  base_url, session, alt_session, device_creator, open_stream, thermostat_data, light_data):
+
+  # Create a device for each user while the other user's stream is open
+  response = open_stream(alt_session)
+  device_creator.create(session, thermostat_data)
+  light = device_creator.create(alt_session, light_data)
+
+  # Verify the first event is for the other user's own device
+  assert read_events(response, 1) == [{'event': 'create', 'data': {'ids': [light['id']]}}]
@@ -0,0 +1,80 @@
+"""
+This module contains tests for the limits of '/devices/events' streams: queue overflows and heartbeats.
+The live service waits too long between heartbeats, and its queues are too large to overflow quickly,
+so these tests run the app in process, on an app built with the *Testing* config with smaller limits.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import base64
+import pytest
+
+from app import create_app
+from app.events import event_hub
+from config import config
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+QUEUE_SIZE = 2
+HEARTBEAT = 1
+
+
+# --------------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------------
+
+@pytest.fixture
+def app(monkeypatch):
+  monkeypatch.setattr(config['testing'], 'EVENTS_QUEUE_SIZE', QUEUE_SIZE)
+  monkeypatch.setattr(config['testing'], 'EVENTS_HEARTBEAT', HEARTBEAT)
+  return create_app('testing')
+
+
+@pytest.fixture
+def client(app):
+  return app.test_client()
+
+
+@pytest.fixture
+def headers(app):
+  credentials = f'{app.config["AUTH_USERNAME1"]}:{app.config["AUTH_PASSWORD1"]}'
+  return {'Authorization': 'Basic ' + base64.b64encode(credentials.encode()).decode()}
+
+
+# --------------------------------------------------------------------------------
+# Tests for Limits
+# --------------------------------------------------------------------------------
+
+def test_devices_events_overflow(client, headers, thermostat_data):
+
+  # Open a stream, and write one device more than its queue holds before reading it
+  response = client.get('/devices/events', headers=headers, buffered=False)
+  for i in range(QUEUE_SIZE + 1):
+    assert client.post('/devices/', json={**thermostat_data, 'name': f'Thermostat {i}'}, headers=headers).status_code == 200
+
+  # Verify the stream skips the dropped events, ends with an overflow event, and unsubscribes
+  chunks = [chunk.decode() for chunk in response.response]
+  assert chunks[0].startswith('retry: ')
+  assert chunks[1:] == ['event: overflow\ndata: {}\n\n']
+  assert event_hub.stats() == {'subscribers': 0, 'published': QUEUE_SIZE + 1, 'overflows': 1}
+
+
+def test_devices_events_heartbeat(client, headers):
+
+  # Open a stream, and read past the reconnect delay while nothing is written
+  response = client.get('/devices/events', headers=headers, buffered=False)
+  chunks = iter(response.response)
+  assert next(chunks).decode().startswith('retry: ')
+
+  # Verify a heartbeat arrives, and the stream stays open
+  assert next(chunks).decode() == ': heartbeat\n\n'
+  assert event_hub.stats()['subscribers'] == 1
+
+  # Verify closing the stream unsubscribes
+  response.close()
+  assert event_hub.stats()['subscribers'] == 0
@@ -0,0 +1,91 @@
+"""
+This module contains integration tests for the '/devices/export' resource.
+Exports stream all of the user's devices as CSV or NDJSON, in ID order.
+Other devices may exist, so tests filter exports to the devices they create.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import csv
+import io
+import json
+import pytest
+
+
+# --------------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------------
+
+@pytest.fixture
+def devices(device_creator, session, thermostat_data, light_data, fridge_data):
+  return [device_creator.create(session, data)
+          for data in [thermostat_data, light_data, fridge_data]]
+
+
+# --------------------------------------------------------------------------------
+# Tests for Exports
+# --------------------------------------------------------------------------------
+
+def test_devices_export_csv(base_url, session, devices):
+
+  # Export the new devices
+  url = base_url.concat('/devices/export')
+  response = session.get(url, params={'id__gte': devices[0]['id']})
+  rows = list(csv.DictReader(io.StringIO(response.text)))
+
+  # Verify the CSV rows match the devices
+  assert response.status_code == 200
+  assert 'text/csv' in response.headers['Content-Type']
+  assert 'devices.csv' in response.headers['Content-Disposition']
+  assert rows[:3] == [{key: str(value) for key, value in device.items()} for device in devices]
+
+
+def test_devices_export_ndjson(base_url, session, devices):
+
+  # Export the new devices
+  url = base_url.concat('/devices/export')
+  response = session.get(url, params={'format': 'ndjson', 'id__gte': devices[0]['id']})
+  lines = [json.loads(line) for line in response.text.splitlines()]
+
+  # Verify each line is a device
+  assert response.status_code == 200
+  assert 'application/x-ndjson' in response.headers['Content-Type']
+  assert lines[:3] == devices
+
+
+def test_devices_export_with_filters_and_fields(base_url, session, devices):
+
+  # Export only the thermostat's ID and serial number
+  url = base_url.concat('/devices/export')
+  params = {'serial_number__prefix': 'TB3G', 'id__gte': devices[0]['id'], 'fields': 'id,serial_number'}
+  response = session.get(url, params=params)
+
+  # Verify the CSV has only the matching device and fields
+  assert response.status_code == 200
+  assert response.text.splitlines() == ['id,serial_number', f'{devices[0]["id"]},{devices[0]["serial_number"]}']
+
+
+def test_devices_export_excludes_other_users(base_url, alt_session, devices):
+
+  # Export the other user's devices
+  url = base_url.concat('/devices/export')
+  response = alt_session.get(url, params={'format': 'ndjson', 'id__gte': devices[0]['id']})
+
+  # Verify none of the new devices are included
+  ids = {json.loads(line)['id'] for line in response.text.splitlines()}
+  assert response.status_code == 200
+  assert not ids.intersection(device['id'] for device in devices)
+
+
+@pytest.mark.parametrize('params', [{'format': 'xml'}, {'fields': 'color'}, {'id__gt': 'first'}])
+def test_devices_export_with_invalid_parameters_yields_error(base_url, session, params):
+
+  # Attempt export
+  url = base_url.concat('/devices/export')
+  response = session.get(url, params=params)
+
+  # Verify error
+  assert response.status_code == 400
+  assert response.json()['error'] == 'bad request'
@@ -0,0 +1,121 @@
+"""
+This module contains integration tests for sparse fieldsets.
+The 'fields' query parameter narrows device lists and single devices to the named fields.
+Other devices may exist, so list tests only check the devices they create.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import pytest
+
+
+# --------------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------------
+
+@pytest.fixture
+def devices(device_creator, session, thermostat_data, light_data, fridge_data):
+  return [device_creator.create(session, data)
+          for data in [thermostat_data, light_data, fridge_data]]
+
+
+# --------------------------------------------------------------------------------
+# Helpers
+# --------------------------------------------------------------------------------
+
+def narrow(device, fields):
+  return {field: device[field] for field in fields}
+
+
+# --------------------------------------------------------------------------------
+# Tests for Sparse Fieldsets
+# --------------------------------------------------------------------------------
+
+@pytest.mark.parametrize(
+  'fields',
+  [
+    ['id,name'],
+    ['name, id'],
+    ['id', 'name']
+  ]
+)
+def test_devices_get_with_fields(base_url, session, devices, fields):
+
+  # Get the list, starting at the first new device
+  url = base_url.concat('/devices/')
+  params = [('id__gte', devices[0]['id'])] + [('fields', value) for value in fields]
+  response = session.get(url, params=params)
+  data = response.json()
+
+  # Verify only the requested fields are returned
+  assert response.status_code == 200
+  assert sorted(data['devices'], key=lambda x: x['id'])[:3] == [narrow(d, ['id', 'name']) for d in devices]
+
+
+def test_devices_get_with_fields_without_id(base_url, session, devices):
+
+  # Get pages of serial numbers only
+  url = base_url.concat('/devices/')
+  params = {'fields': 'serial_number', 'limit': 2, 'after': devices[0]['id'] - 1}
+  response = session.get(url, params=params)
+  data = response.json()
+
+  # Verify the page omits IDs but still links to the next page
+  assert response.status_code == 200
+  assert data['devices'] == [narrow(d, ['serial_number']) for d in devices[:2]]
+  assert data['next'] == devices[1]['id']
+
+
+def test_devices_get_streamed_with_fields(base_url, session, devices):
+
+  # Get the streamed list
+  url = base_url.concat('/devices/')
+  params = {'fields': 'id,owner', 'stream': 'true', 'id__gte': devices[0]['id']}
+  response = session.get(url, params=params)
+  data = response.json()
+
+  # Verify only the requested fields are streamed
+  assert response.status_code == 200
+  assert data['devices'][:3] == [narrow(d, ['id', 'owner']) for d in devices]
+
+
+def test_device_id_get_with_fields(base_url, session, devices):
+
+  # Get one device
+  url = base_url.concat(f'/devices/{devices[1]["id"]}')
+  response = session.get(url, params={'fields': 'name,location'})
+
+  # Verify only the requested fields are returned, with the full device's ETag
+  assert response.status_code == 200
+  assert response.json() == narrow(devices[1], ['name', 'location'])
+  assert response.headers['ETag'] == session.get(url).headers['ETag']
+
+  # Verify a matching ETag still yields "304 Not Modified"
+  headers = {'If-None-Match': response.headers['ETag']}
+  response = session.get(url, params={'fields': 'name'}, headers=headers)
+  assert response.status_code == 304
+
+
+def test_device_id_get_with_fields_for_other_user_yields_error(base_url, alt_session, devices):
+
+  # Attempt to get another user's device
+  url = base_url.concat(f'/devices/{devices[0]["id"]}')
+  response = alt_session.get(url, params={'fields': 'name'})
+
+  # Verify error
+  assert response.status_code == 403
+
+
+@pytest.mark.parametrize('fields', ['id,color', 'version', 'password'])
+def test_devices_get_with_invalid_fields_yields_error(base_url, session, devices, fields):
+
+  # Attempt gets
+  for url in [base_url.concat('/devices/'), base_url.concat(f'/devices/{devices[0]["id"]}')]:
+    response = session.get(url, params={'fields': fields})
+    data = response.json()
+
+    # Verify error
+    assert response.status_code == 400
+    assert data['error'] == 'bad request'
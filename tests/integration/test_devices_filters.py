@@ -0,0 +1,115 @@
+"""
+This module contains integration tests for filtered device lists.
+Filters are query parameters for '/devices/', like 'type__in', 'serial_number__prefix', and 'id__gte'.
+Other devices may exist, so tests only check the devices they create.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import pytest
+
+from testlib.devices import verify_devices
+
+
+# --------------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------------
+
+@pytest.fixture
+def devices(device_creator, session, thermostat_data, light_data, fridge_data):
+  return [device_creator.create(session, data)
+          for data in [thermostat_data, light_data, fridge_data]]
+
+
+# --------------------------------------------------------------------------------
+# Helpers
+# --------------------------------------------------------------------------------
+
+def get_filtered(base_url, session, devices, params, expected_indexes):
+  url = base_url.concat('/devices/')
+  response = session.get(url, params=params)
+  data = response.json()
+
+  assert response.status_code == 200
+  expected = [devices[i] for i in expected_indexes]
+  excluding = [device['id'] for i, device in enumerate(devices) if i not in expected_indexes]
+  verify_devices(data['devices'], expected, excluding)
+
+
+# --------------------------------------------------------------------------------
+# Tests for Filters
+# --------------------------------------------------------------------------------
+
+def test_devices_with_repeated_parameter(base_url, session, devices):
+  params = [('location', 'Living Room'), ('location', 'Kitchen')]
+  get_filtered(base_url, session, devices, params, [0, 2])
+
+
+def test_devices_with_in_filter(base_url, session, devices):
+  params = {'type__in': 'Thermostat,Light Switch'}
+  get_filtered(base_url, session, devices, params, [0, 1])
+
+
+def test_devices_with_prefix_filter(base_url, session, devices):
+  params = {'serial_number__prefix': 'TB3G'}
+  get_filtered(base_url, session, devices, params, [0])
+
+
+def test_devices_with_repeated_prefix_filter(base_url, session, devices):
+  params = [('name__prefix', 'Main'), ('name__prefix', 'Family')]
+  get_filtered(base_url, session, devices, params, [0, 2])
+
+
+def test_devices_with_id_range(base_url, session, devices):
+  params = {'id__gte': devices[1]['id'], 'id__lt': devices[2]['id']}
+  get_filtered(base_url, session, devices, params, [1])
+
+
+def test_devices_with_combined_filters(base_url, session, devices):
+  params = {'type__in': 'Thermostat,Refrigerator', 'id__gt': devices[0]['id']}
+  get_filtered(base_url, session, devices, params, [2])
+
+
+def test_devices_with_filters_and_pages(base_url, session, devices):
+
+  # Get one page of two matching devices
+  url = base_url.concat('/devices/')
+  params = {'location__in': 'Living Room,Kitchen', 'id__gte': devices[0]['id'], 'limit': 1}
+  response = session.get(url, params=params)
+  data = response.json()
+
+  # Verify the page skips the unmatched device
+  assert response.status_code == 200
+  assert data['devices'] == [devices[0]]
+
+  response = session.get(url, params={**params, 'after': data['next']})
+  assert response.json()['devices'] == [devices[2]]
+
+
+@pytest.mark.parametrize(
+  'params',
+  [
+    {'owner__in': 'someone'},
+    {'color': 'red', 'color__in': 'red'},
+    {'type__like': 'Thermo'},
+    {'id__prefix': '1'},
+    {'name__gt': 'A'},
+    {'id__gte': 'first'},
+    {'id__in': '1,two'},
+    {'serial_number__prefix': 'X' * 17},
+    {'serial_number': 'X' * 17},
+    [('id__lt', '5'), ('id__lt', '6')]
+  ]
+)
+def test_devices_with_invalid_filter_yields_error(base_url, session, params):
+
+  # Attempt get
+  url = base_url.concat('/devices/')
+  response = session.get(url, params=params)
+  data = response.json()
+
+  # Verify error
+  assert response.status_code == 400
+  assert data['error'] == 'bad request'
@@ -92,6 +92,25 @@ def test_delete_device_from_multiple(base_url, session, devices, device_creator)
   verify_devices(get_data['devices'], devices)
 
 
+def test_patch_device_from_multiple_after_get(
+  base_url, session, devices, thermostat_patch_data):
+
+  # Get all devices, which may cache the list
+  url = base_url.concat('/devices/')
+  verify_devices(session.get(url).json()['devices'], devices)
+
+  # Patch
+  device_id_url = base_url.concat(f'/devices/{devices[0]["id"]}')
+  patch_response = session.patch(device_id_url, json=thermostat_patch_data)
+  assert patch_response.status_code == 200
+  devices[0] = patch_response.json()
+
+  # Verify the list is not stale
+  get_response = session.get(url)
+  assert get_response.status_code == 200
+  verify_devices(get_response.json()['devices'], devices)
+
+
 @pytest.mark.parametrize(
   'parameter, value',
   [
@@ -0,0 +1,100 @@
+"""
+This module contains integration tests for paginated and streamed device lists.
+Pages are requested from '/devices/' with the 'limit' and 'after' query parameters.
+Streamed lists are requested with the 'stream' query parameter.
+Other devices may exist, so tests start paging after the first created device.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import pytest
+
+from testlib.devices import verify_devices
+
+
+# --------------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------------
+
+@pytest.fixture
+def devices(device_creator, session, thermostat_data, light_data, fridge_data):
+  return [device_creator.create(session, data)
+          for data in [thermostat_data, light_data, fridge_data]]
+
+
+# --------------------------------------------------------------------------------
+# Tests for Pagination
+# --------------------------------------------------------------------------------
+
+def test_devices_get_pages(base_url, session, devices):
+
+  # Get pages of one device, starting just before the first new device
+  url = base_url.concat('/devices/')
+  after = devices[0]['id'] - 1
+  pages = list()
+
+  for _ in devices:
+    response = session.get(url, params={'limit': 1, 'after': after})
+    data = response.json()
+
+    assert response.status_code == 200
+    assert len(data['devices']) == 1
+    pages.append(data['devices'][0])
+    after = data['next']
+
+  # Verify pages follow ID order
+  assert pages == devices
+
+
+def test_devices_get_last_page_has_no_next(base_url, session, devices):
+
+  # Get the page after the last new device
+  url = base_url.concat('/devices/')
+  response = session.get(url, params={'limit': 10, 'after': devices[-1]['id']})
+  data = response.json()
+
+  # Verify nothing follows
+  assert response.status_code == 200
+  assert data['devices'] == []
+  assert data['next'] is None
+
+
+@pytest.mark.parametrize(
+  'params',
+  [
+    {'limit': 0},
+    {'limit': 'many'},
+    {'limit': 1000000},
+    {'after': -1}
+  ]
+)
+def test_devices_get_with_invalid_page_yields_error(base_url, session, params):
+
+  # Attempt get
+  url = base_url.concat('/devices/')
+  response = session.get(url, params=params)
+  data = response.json()
+
+  # Verify error
+  assert response.status_code == 400
+  assert data['error'] == 'bad request'
+
+
+# --------------------------------------------------------------------------------
+# Tests for Streaming
+# --------------------------------------------------------------------------------
+
+def test_devices_get_streamed(base_url, session, devices):
+
+  # Get the streamed list
+  url = base_url.concat('/devices/')
+  response = session.get(url, params={'stream': 'true'})
+  data = response.json()
+
+  # Verify the list matches the unstreamed response
+  assert response.status_code == 200
+  assert 'application/json' in response.headers['Content-Type']
+  verify_devices(data['devices'], devices)
+  assert data == session.get(url).json()
@@ -0,0 +1,104 @@
+"""
+This module contains integration tests for reading devices from read replicas.
+GET requests read from a replica, but users who just wrote must read their own writes from the primary.
+The tests are skipped unless the service runs with read replicas.
+Locally, SQLite files can stand in for them (see the README).
+Those replicas only change when they are synced, so stale reads would fail these tests.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import pytest
+import requests
+import time
+
+
+# --------------------------------------------------------------------------------
+# Helpers
+# --------------------------------------------------------------------------------
+
+def get_replica_stats(base_url):
+  return requests.get(base_url.concat('/status/')).json()['replicas']
+
+
+# --------------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------------
+
+@pytest.fixture(autouse=True)
+def replicas(base_url):
+  stats = get_replica_stats(base_url)
+  if stats['replicas'] == 0:
+    pytest.skip('the service has no read replicas (set DB_REPLICA_URLS)')
+  return stats
+
+
+# --------------------------------------------------------------------------------
+# Tests for Routing
+# --------------------------------------------------------------------------------
+
+def test_devices_replicas_route_unpinned_reads(base_url, alt_session, replicas):
+
+  # Wait until earlier writes no longer pin the user to the primary
+  time.sleep(replicas['pin_seconds'])
+
+  # Read devices
+  before = get_replica_stats(base_url)
+  assert alt_session.get(base_url.concat('/devices/')).status_code == 200
+  after = get_replica_stats(base_url)
+
+  # Verify the read went to a replica
+  assert after['replica_reads'] == before['replica_reads'] + 1
+  assert after['primary_reads'] == before['primary_reads']
+
+
+def test_devices_replicas_pin_reads_after_writes(base_url, session, thermostat):
+
+  # Read the device right after creating it
+  before = get_replica_stats(base_url)
+  assert session.get(base_url.concat(f'/devices/{thermostat["id"]}')).status_code == 200
+  after = get_replica_stats(base_url)
+
+  # Verify the read went to the primary
+  assert after['primary_reads'] == before['primary_reads'] + 1
+  assert after['replica_reads'] == before['replica_reads']
+
+
+# --------------------------------------------------------------------------------
+# Tests for Read-Your-Writes
+# --------------------------------------------------------------------------------
+
+def test_devices_replicas_read_created_device(base_url, session, device_creator, thermostat_data):
+
+  # Create a device
+  thermostat = device_creator.create(session, thermostat_data)
+  id = thermostat['id']
+
+  # Verify every GET resource finds it right away
+  assert session.get(base_url.concat(f'/devices/{id}')).json() == thermostat
+  assert session.get(base_url.concat(f'/devices/{id}/report')).status_code == 200
+  devices = session.get(base_url.concat('/devices/')).json()['devices']
+  assert thermostat in devices
+
+
+def test_devices_replicas_read_patched_device(base_url, session, thermostat, thermostat_patch_data):
+
+  # Patch a device
+  device_id_url = base_url.concat(f'/devices/{thermostat["id"]}')
+  session.patch(device_id_url, json=thermostat_patch_data)
+
+  # Verify the patch is read back
+  assert session.get(device_id_url).json() == {**thermostat, **thermostat_patch_data}
+
+
+def test_devices_replicas_read_deleted_device(base_url, session, device_creator, thermostat_data):
+
+  # Create and delete a device
+  id = device_creator.create(session, thermostat_data)['id']
+  session.delete(base_url.concat(f'/devices/{id}'))
+  device_creator.remove(id)
+
+  # Verify the device is gone
+  assert session.get(base_url.concat(f'/devices/{id}')).status_code == 404
@@ -30,3 +30,17 @@ def test_device_report_download(base_url, session, thermostat):
     f"Owner: {thermostat['owner']}\n"
   
   assert get_response.text == expected_report
+
+
+def test_device_report_download_with_non_ascii_device(base_url, session, device_creator, thermostat_data):
+
+  # Create a device with non-ASCII characters
+  device = device_creator.create(session, {**thermostat_data, 'name': 'Thérmo', 'location': 'Küche'})
+
+  # Download
+  get_response = session.get(base_url.concat(f'/devices/{device["id"]}/report'))
+
+  # Verify the report is encoded as UTF-8
+  assert get_response.status_code == 200
+  assert get_response.headers['Content-Type'] == 'text/plain; charset=utf-8'
+  assert 'Name: Thérmo\nLocation: Küche\n' in get_response.content.decode('utf-8')
@@ -0,0 +1,122 @@
+"""
+This module contains tests for batch device reports.
+'/devices/reports' returns a zip archive with one text report per device, named by device ID.
+Other devices may exist, so GET tests filter reports to the devices they create.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import io
+import pytest
+import zipfile
+
+
+# --------------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------------
+
+@pytest.fixture
+def devices(device_creator, session, thermostat_data, light_data, fridge_data):
+  return [device_creator.create(session, data)
+          for data in [thermostat_data, light_data, fridge_data]]
+
+
+# --------------------------------------------------------------------------------
+# Helpers
+# --------------------------------------------------------------------------------
+
+def expected_report(device):
+  return \
+    f"ID: {device['id']}\n" + \
+    f"Name: {device['name']}\n" + \
+    f"Location: {device['location']}\n" + \
+    f"Type: {device['type']}\n" + \
+    f"Model: {device['model']}\n" + \
+    f"Serial Number: {device['serial_number']}\n" + \
+    f"Owner: {device['owner']}\n"
+
+
+def read_reports(response):
+  assert response.status_code == 200
+  assert response.headers['Content-Type'] == 'application/zip'
+  assert response.headers['Content-Disposition'] == 'attachment; filename=reports.zip'
+
+  with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+    return {name: archive.read(name).decode() for name in archive.namelist()}
+
+
+# --------------------------------------------------------------------------------
+# Tests for Batch Reports
+# --------------------------------------------------------------------------------
+
+def test_devices_reports_get_with_filter(base_url, session, devices):
+
+  # Download reports for the new devices
+  url = base_url.concat('/devices/reports')
+  response = session.get(url, params={'id__gte': devices[0]['id'], 'id__lte': devices[-1]['id']})
+  reports = read_reports(response)
+
+  # Verify one report per device
+  assert reports == {f'{device["id"]}.txt': expected_report(device) for device in devices}
+
+
+@pytest.mark.parametrize('as_objects', [False, True])
+def test_devices_reports_post_with_ids(base_url, session, devices, as_objects):
+
+  # Download reports for two devices, listing one twice
+  url = base_url.concat('/devices/reports')
+  ids = [devices[2]['id'], devices[0]['id'], devices[2]['id']]
+  response = session.post(url, json=[{'id': id} for id in ids] if as_objects else ids)
+  reports = read_reports(response)
+
+  # Verify one report per listed device
+  assert reports == {f'{device["id"]}.txt': expected_report(device) for device in [devices[0], devices[2]]}
+
+
+def test_devices_reports_post_with_non_ascii_device(base_url, session, device_creator, thermostat_data):
+
+  # Create devices with and without non-ASCII characters
+  thermostat = device_creator.create(session, {**thermostat_data, 'name': 'Thermo'})
+  accented = device_creator.create(session, {**thermostat_data, 'name': 'Thérmo', 'location': 'Küche'})
+
+  # Download both reports
+  url = base_url.concat('/devices/reports')
+  response = session.post(url, json=[thermostat['id'], accented['id']])
+  reports = read_reports(response)
+
+  # Verify the archive is complete, with the report encoded as UTF-8
+  assert reports == {f'{device["id"]}.txt': expected_report(device) for device in [thermostat, accented]}
+
+
+def test_devices_reports_post_with_other_users_device_yields_error(base_url, alt_session, devices):
+
+  # Attempt to download another user's report
+  url = base_url.concat('/devices/reports')
+  response = alt_session.post(url, json=[devices[0]['id']])
+
+  # Verify error
+  assert response.status_code == 403
+  assert response.json()['error'] == 'forbidden'
+
+
+def test_devices_reports_post_with_unknown_device_yields_error(base_url, session, devices):
+
+  # Attempt to download a missing device's report
+  url = base_url.concat('/devices/reports')
+  response = session.post(url, json=[devices[0]['id'], 999999999])
+
+  # Verify error
+  assert response.status_code == 404
+
+
+@pytest.mark.parametrize('body', [[], ['one'], {'id': 1}])
+def test_devices_reports_post_with_invalid_body_yields_error(base_url, session, body):
+
+  # Attempt download
+  url = base_url.concat('/devices/reports')
+  response = session.post(url, json=body)
+
+  # Verify error
+  assert response.status_code == 400
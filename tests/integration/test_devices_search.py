@@ -0,0 +1,123 @@
+"""
+This module contains integration tests for the '/devices/search' resource.
+Searches find the user's devices whose values contain every term, best matches first.
+Other devices may exist, so tests search for a marker that only their devices contain.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import pytest
+import uuid
+
+
+# --------------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------------
+
+@pytest.fixture
+def marker():
+  return 'zq' + uuid.uuid4().hex[:10]
+
+
+@pytest.fixture
+def devices(device_creator, session, thermostat_data, light_data, fridge_data, marker):
+  return [
+    device_creator.create(session, {**thermostat_data, 'location': f'Hall {marker}'}),
+    device_creator.create(session, {**light_data, 'name': f'Porch {marker.upper()} Light'}),
+    device_creator.create(session, {**fridge_data, 'serial_number': marker}),
+  ]
+
+
+# --------------------------------------------------------------------------------
+# Helpers
+# --------------------------------------------------------------------------------
+
+def search(base_url, session, params):
+  return session.get(base_url.concat('/devices/search'), params=params)
+
+
+# --------------------------------------------------------------------------------
+# Tests for Search
+# --------------------------------------------------------------------------------
+
+def test_devices_search_ranks_name_matches_first(base_url, session, devices, marker):
+
+  # Search for the marker in lowercase
+  response = search(base_url, session, {'q': marker})
+  data = response.json()
+
+  # Verify all matches, with the name match first and no next page
+  assert response.status_code == 200
+  assert data['devices'][0] == devices[1]
+  assert sorted(device['id'] for device in data['devices']) == [device['id'] for device in devices]
+  assert data['next'] is None
+
+
+def test_devices_search_matches_every_term(base_url, session, devices, marker):
+
+  # Search for the marker and part of a model name
+  response = search(base_url, session, {'q': f'{marker} THERMO'})
+
+  # Verify only the thermostat matches
+  assert response.status_code == 200
+  assert response.json()['devices'] == [devices[0]]
+
+
+def test_devices_search_with_pages_and_fields(base_url, session, devices, marker):
+
+  # Search one device at a time
+  first = search(base_url, session, {'q': marker, 'limit': 1, 'fields': 'id,name'}).json()
+  second = search(base_url, session, {'q': marker, 'limit': 1, 'offset': first['next']}).json()
+
+  # Verify the pages
+  assert first['devices'] == [{'id': devices[1]['id'], 'name': devices[1]['name']}]
+  assert first['next'] == 1
+  assert len(second['devices']) == 1
+  assert second['devices'][0]['id'] != devices[1]['id']
+  assert second['next'] == 2
+
+
+def test_devices_search_follows_writes(base_url, session, device_creator, devices, marker, thermostat_data):
+
+  # Search first, so the writes below update an index that is already in use
+  assert len(search(base_url, session, {'q': marker}).json()['devices']) == 3
+
+  # Rename one device, delete another, and create a third
+  device_url = base_url.concat(f'/devices/{devices[1]["id"]}')
+  session.patch(device_url, json={'name': 'Porch Light'})
+  session.delete(base_url.concat(f'/devices/{devices[2]["id"]}'))
+  device_creator.remove(devices[2]['id'])
+  created = device_creator.create(session, {**thermostat_data, 'name': f'Attic {marker}'})
+
+  # Verify the search sees all three writes
+  response = search(base_url, session, {'q': marker})
+  assert response.json()['devices'] == [created, devices[0]]
+
+
+def test_devices_search_excludes_other_users(base_url, alt_session, devices, marker):
+
+  # Search as another user
+  response = search(base_url, alt_session, {'q': marker})
+
+  # Verify no devices are found
+  assert response.status_code == 200
+  assert response.json()['devices'] == []
+
+
+@pytest.mark.parametrize('params', [
+  {},
+  {'q': '  '},
+  {'q': 'ab'},
+  {'q': 'thermostat', 'limit': 0},
+  {'q': 'thermostat', 'offset': -1},
+  {'q': 'thermostat', 'fields': 'color'},
+])
+def test_devices_search_with_invalid_params_yields_error(base_url, session, params):
+
+  # Attempt a search with invalid parameters
+  response = search(base_url, session, params)
+
+  # Verify error
+  assert response.status_code == 400
@@ -0,0 +1,132 @@
+"""
+This module contains integration tests for the '/devices/stats' resource.
+Stats count the user's devices, grouped by type, location, and model.
+Other devices may exist, so tests create devices with a unique type and look for its groups.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import pytest
+import uuid
+
+
+# --------------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------------
+
+@pytest.fixture
+def device_type():
+  return 'Type ' + uuid.uuid4().hex[:10]
+
+
+@pytest.fixture
+def devices(device_creator, session, thermostat_data, device_type):
+  locations = ['Kitchen', 'Kitchen', 'Garage']
+  return [device_creator.create(session, {**thermostat_data, 'type': device_type, 'location': location})
+          for location in locations]
+
+
+# --------------------------------------------------------------------------------
+# Helpers
+# --------------------------------------------------------------------------------
+
+def get_stats(base_url, session, params=None):
+  response = session.get(base_url.concat('/devices/stats'), params=params)
+  assert response.status_code == 200
+  return response.json()
+
+
+def find_groups(stats, device_type):
+  return [group for group in stats['groups'] if group.get('type') == device_type]
+
+
+# --------------------------------------------------------------------------------
+# Tests for Stats
+# --------------------------------------------------------------------------------
+
+def test_devices_stats_by_type(base_url, session, device_type, device_creator, thermostat_data):
+
+  # Get stats before and after adding devices
+  before = get_stats(base_url, session)
+  for _ in range(2):
+    device_creator.create(session, {**thermostat_data, 'type': device_type})
+  after = get_stats(base_url, session)
+
+  # Verify the new type's count and the total
+  assert find_groups(after, device_type) == [{'type': device_type, 'count': 2}]
+  assert after['total'] == before['total'] + 2
+
+
+def test_devices_stats_by_type_and_location(base_url, session, devices, device_type):
+
+  # Get stats by type and location
+  stats = get_stats(base_url, session, {'group_by': 'location,type'})
+
+  # Verify the groups, largest first
+  assert find_groups(stats, device_type) == [
+    {'type': device_type, 'location': 'Kitchen', 'count': 2},
+    {'type': device_type, 'location': 'Garage', 'count': 1},
+  ]
+
+
+def test_devices_stats_follow_writes(base_url, session, device_creator, devices, device_type):
+
+  # Move one device and delete another
+  session.patch(base_url.concat(f'/devices/{devices[0]["id"]}'), json={'location': 'Garage'})
+  session.delete(base_url.concat(f'/devices/{devices[2]["id"]}'))
+  device_creator.remove(devices[2]['id'])
+
+  # Verify the counts changed
+  stats = get_stats(base_url, session, {'group_by': 'type,location'})
+  assert find_groups(stats, device_type) == [
+    {'type': device_type, 'location': 'Garage', 'count': 1},
+    {'type': device_type, 'location': 'Kitchen', 'count': 1},
+  ]
+
+
+def test_devices_stats_with_filters(base_url, session, devices, device_type):
+
+  # Get stats for only the new type
+  stats = get_stats(base_url, session, {'type': device_type, 'group_by': 'location'})
+
+  # Verify only the new devices are counted
+  assert stats == {
+    'total': 3,
+    'groups': [{'location': 'Kitchen', 'count': 2}, {'location': 'Garage', 'count': 1}]
+  }
+
+
+def test_devices_stats_exclude_other_users(base_url, alt_session, devices, device_type):
+
+  # Get stats as another user
+  stats = get_stats(base_url, alt_session)
+
+  # Verify the new devices are not counted
+  assert find_groups(stats, device_type) == []
+
+
+def test_devices_stats_not_modified_until_write(base_url, session, devices, device_creator, thermostat_data):
+
+  # Get the stats and their ETag
+  url = base_url.concat('/devices/stats')
+  etag = session.get(url).headers['ETag']
+
+  # Verify unchanged stats are not sent again
+  headers = {'If-None-Match': etag}
+  assert session.get(url, headers=headers).status_code == 304
+
+  # Verify a new device changes the stats
+  device_creator.create(session, thermostat_data)
+  assert session.get(url, headers=headers).status_code == 200
+
+
+@pytest.mark.parametrize('group_by', ['', 'name', 'type,owner'])
+def test_devices_stats_with_invalid_group_by_yields_error(base_url, session, group_by):
+
+  # Attempt to get stats with invalid groups
+  response = session.get(base_url.concat('/devices/stats'), params={'group_by': group_by})
+
+  # Verify error
+  assert response.status_code == 400
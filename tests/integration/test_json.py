@@ -0,0 +1,65 @@
+"""
+This module contains tests for the orjson JSON provider.
+Its responses must match the default provider's byte for byte,
+so these tests serialize the same values with both providers, in process, on an app built with the *Testing* config.
+The tests are skipped unless orjson is installed.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import pytest
+
+from app import create_app
+from app.json import OrjsonProvider
+
+from flask.json.provider import DefaultJSONProvider
+
+pytest.importorskip('orjson')
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+PAYLOADS = [
+  {'floats': [0.1, 1.5, -0.0, 123456789.123, 1e16, 1.5e300, 1e-5, 2.5e-7, 5e-324]},
+  {'special': [float('nan'), float('inf'), float('-inf'), None]},
+  {'keys': {0.5: 'half', 1e16: 'big', float('nan'): 'nan'}},
+  {'text': ['Wohnzimmer Thermostat', 'Küche', 'サーモスタット', '😀', 'no 1e5 here']},
+  {'z': {'y': [{'b': 2, 'a': 1}], 'x': None}, 'a': {'c': {'e': 1e-5, 'd': 'Straße'}}},
+  {'integers': [0, -1, 2 ** 63, 2 ** 64, -2 ** 70]},
+  [1, 'two', 3.0, [True, False, None]]
+]
+
+
+# --------------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------------
+
+@pytest.fixture(scope='module')
+def app():
+  return create_app('testing')
+
+
+@pytest.fixture
+def providers(app):
+  with app.app_context():
+    yield DefaultJSONProvider(app), OrjsonProvider(app)
+
+
+# --------------------------------------------------------------------------------
+# Tests for Parity
+# --------------------------------------------------------------------------------
+
+@pytest.mark.parametrize('payload', PAYLOADS)
+def test_json_providers_dump_the_same(providers, payload):
+  default, orjson = providers
+  assert orjson.dumps(payload) == default.dumps(payload, separators=(',', ':'))
+
+
+@pytest.mark.parametrize('payload', PAYLOADS)
+def test_json_providers_respond_the_same(providers, payload):
+  default, orjson = providers
+  assert orjson.response(payload).get_data() == default.response(payload).get_data()
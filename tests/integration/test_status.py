@@ -27,6 +27,56 @@ def test_status_get(base_url):
   assert data['uptime'] > 0
 
 
+def test_status_get_token_cache_hits(base_url, auth_token):
+
+  # Use the same token twice
+  url = base_url.concat('/status/')
+  devices_url = base_url.concat('/devices/')
+  headers = {'Authorization': f'Bearer {auth_token}'}
+  hits_before = requests.get(url).json()['caches']['tokens']['hits']
+
+  for _ in range(2):
+    assert requests.get(devices_url, headers=headers).status_code == 200
+
+  # Verify at least the second use was a cache hit
+  data = requests.get(url).json()
+  assert data['caches']['tokens']['hits'] > hits_before
+  assert 0 < data['caches']['tokens']['hit_rate'] <= 1
+
+
+def test_status_user_cache_hits(base_url, session):
+
+  # Use Basic auth twice, so the user's password hash is loaded at most once
+  url = base_url.concat('/status/')
+  hits_before = requests.get(url).json()['caches']['users']['hits']
+
+  for _ in range(2):
+    assert session.get(base_url.concat('/devices/')).status_code == 200
+
+  # Verify at least the second login found the user in the cache
+  assert requests.get(url).json()['caches']['users']['hits'] > hits_before
+
+
+def test_status_metrics_get(base_url, session):
+
+  # Make a timed request
+  assert session.get(base_url.concat('/devices/')).status_code == 200
+
+  # Get metrics
+  url = base_url.concat('/status/metrics')
+  response = requests.get(url)
+  if response.status_code == 404:
+    pytest.skip('the service does not record metrics (set METRICS_ENABLED=true)')
+  
+  # Verify Prometheus text format
+  assert response.status_code == 200
+  assert response.headers['Content-Type'].startswith('text/plain')
+  assert '# TYPE registry_request_duration_seconds histogram' in response.text
+  assert 'registry_request_duration_seconds_count{endpoint="devices.devices_get",method="GET",status="200"}' in response.text
+  assert 'registry_auth_duration_seconds_count{scheme="basic"}' in response.text
+  assert 'registry_db_query_duration_seconds_count{operation="SELECT"}' in response.text
+
+
 # --------------------------------------------------------------------------------
 # Tests for HEAD
 # --------------------------------------------------------------------------------
@@ -49,11 +99,11 @@ def test_status_head(base_url):
   for header in response.headers:
     assert header in get_response.headers
 
-    if header == 'Content-Length':
+    if header.lower() == 'content-length':
       head_length = int(response.headers[header])
       get_length = int(get_response.headers[header])
       assert abs(head_length - get_length) <= 4
-    elif header != 'Date':
+    elif header.lower() != 'date':
       assert response.headers[header] == get_response.headers[header]
 
 
@@ -0,0 +1,122 @@
+"""
+This module contains tests for upgrading a database created by the first version of the app.
+That version only had the 'devices' table, without the columns, indexes, and tables added since.
+Each test runs the app in fresh processes on its own SQLite file, like an operator would,
+so it does not depend on the live service.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import json
+import os
+import pytest
+import sqlite3
+import subprocess
+import sys
+
+
+# --------------------------------------------------------------------------------
+# "Constants"
+# --------------------------------------------------------------------------------
+
+BASELINE_DDL = '''
+CREATE TABLE devices (
+  id INTEGER NOT NULL,
+  name VARCHAR(64),
+  location VARCHAR(64),
+  type VARCHAR(64),
+  model VARCHAR(64),
+  serial_number VARCHAR(16),
+  owner VARCHAR(64),
+  PRIMARY KEY (id)
+)
+'''
+
+BASELINE_DEVICE = {
+  'id': 1,
+  'name': 'Main Thermostat',
+  'location': 'Living Room',
+  'type': 'Thermostat',
+  'model': 'ThermoBest 3G',
+  'serial_number': 'TB3G-12345',
+  'owner': 'pythonista'
+}
+
+# Starts the app and lists the first config user's devices
+LIST_DEVICES_SCRIPT = '''
+import base64, json
+from app import create_app
+app = create_app('testing')
+config = app.config
+credentials = base64.b64encode(f"{config['AUTH_USERNAME1']}:{config['AUTH_PASSWORD1']}".encode()).decode()
+response = app.test_client().get('/devices/', headers={'Authorization': 'Basic ' + credentials})
+print(json.dumps(response.get_json()))
+'''
+
+
+# --------------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------------
+
+@pytest.fixture
+def baseline_db(tmp_path):
+  path = tmp_path / 'baseline.sqlite'
+  with sqlite3.connect(path) as connection:
+    connection.execute(BASELINE_DDL)
+    columns = ', '.join(BASELINE_DEVICE)
+    connection.execute(f'INSERT INTO devices ({columns}) VALUES (?, ?, ?, ?, ?, ?, ?)', list(BASELINE_DEVICE.values()))
+  return path
+
+
+@pytest.fixture
+def run(baseline_db):
+  env = {
+    **os.environ,
+    'FLASK_APP': 'registry',
+    'FLASK_CONFIG': 'testing',
+    'TEST_DATABASE_URL': f'sqlite:///{baseline_db}',
+    'DB_CREATE_SCHEMA': 'auto'
+  }
+
+  def run(*args, **overrides):
+    return subprocess.run([sys.executable, *args], env={**env, **overrides}, capture_output=True, text=True, timeout=60)
+
+  return run
+
+
+# --------------------------------------------------------------------------------
+# Tests for Upgrades
+# --------------------------------------------------------------------------------
+
+def test_baseline_database_needs_upgrade(run):
+
+  # Attempt to start the app on the baseline database
+  result = run('-c', LIST_DEVICES_SCRIPT)
+
+  # Verify startup fails and points to the upgrade
+  assert result.returncode != 0
+  assert 'devices.version' in result.stderr
+  assert 'flask upgrade-db' in result.stderr
+
+
+def test_baseline_database_starts_without_schema_checks(run):
+
+  # Start the app on the baseline database, without checking the schema
+  result = run('-c', 'from app import create_app; create_app("testing")', DB_CREATE_SCHEMA='never')
+
+  # Verify startup skips the user cache, since there is no 'users' table yet
+  assert result.returncode == 0, result.stderr
+
+
+def test_baseline_database_upgrade(run):
+
+  # Upgrade the baseline database
+  result = run('-m', 'flask', 'upgrade-db')
+  assert result.returncode == 0, result.stderr
+
+  # Verify the app starts and serves the existing device
+  result = run('-c', LIST_DEVICES_SCRIPT)
+  assert result.returncode == 0, result.stderr
+  assert json.loads(result.stdout)['devices'] == [BASELINE_DEVICE]